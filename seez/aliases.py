@@ -15,3 +15,6 @@ ModelName = NewType("ModelName", str)
 
 SubModelPk = NewType("SubModelPk", UUID)
 SubModelName = NewType("SubModelName", str)
+
+# Id of an entity in the imported feed
+SourceId = NewType("SourceId", str)
@@ -1,35 +1,93 @@
-from typing import Any
+from typing import Any, Callable, List
 
 from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import Response
+from haps import Container
+from starlette.requests import Request
 
+from seez import settings
+from seez.api.compression import CompressionMiddleware
+from seez.api.responses import (
+    ClosingStreamingResponse,
+    DTOResponse,
+    ExportFormat,
+    compact_listing,
+    csv_chunks,
+    etag_matches,
+    ndjson_chunks,
+)
 from seez.domain.commands.add_car import AddCar
+from seez.domain.commands.add_cars_batch import AddCarsBatch
+from seez.domain.commands.export_cars import ExportCars
 from seez.domain.commands.get_cars_paged import GetCarsPaged
+from seez.domain.commands.get_catalog_cache_stats import GetCatalogCacheStats
+from seez.domain.commands.get_catalog_version import GetCatalogVersion
 from seez.domain.commands.get_makes import GetAllMakes
 from seez.domain.commands.get_models import GetAllModels
 from seez.domain.commands.get_submodels import GetAllSubModels
-from seez.domain.dto import AddCarDTO
-from seez.domain.exceptions import MakeDoesNotExist
+from seez.domain.dto import AddCarDTO, CarDTO
+from seez.domain.exceptions import InvalidCursor, InvalidFields, MakeDoesNotExist
+from seez.infrastructure.async_session import AsyncEngine
+from seez.infrastructure.dto import DTO
 
 app = FastAPI()
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+)
 
 
-@app.get("/car/")
-def list_cars(
+@app.on_event("shutdown")
+async def close_database() -> None:
+    await Container().get_object(AsyncEngine).close()
+
+
+@app.get("/car/", response_class=DTOResponse)
+async def list_cars(
     page_number: int = Query(1, title="Page number", ge=1),
     page_size: int = Query(20, title="Page number", ge=1),
     price_min: int = Query(None, title="Price min", ge=0),
     price_max: int = Query(None, title="Price min", ge=0),
     mileage_min: int = Query(None, title="Price min", ge=0),
     mileage_max: int = Query(None, title="Price min", ge=0),
+    cursor: str = Query(None, title="Cursor"),
+    compact: bool = Query(False, title="Compact"),
+    fields: str = Query(None, title="Fields", description="Comma separated"),
 ) -> Any:
-    return GetCarsPaged(
-        page_number=page_number,
-        page_size=page_size,
-        price_min=price_min,
-        price_max=price_max,
-        mileage_min=mileage_min,
-        mileage_max=mileage_max,
-    ).handle()
+    try:
+        cars = await GetCarsPaged(
+            page_number=page_number,
+            page_size=page_size,
+            cursor=cursor,
+            price_min=price_min,
+            price_max=price_max,
+            mileage_min=mileage_min,
+            mileage_max=mileage_max,
+            fields=(
+                None if fields is None else [name for name in fields.split(",") if name]
+            ),
+        ).handle()
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    except InvalidFields as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return DTOResponse(compact_listing(cars) if compact else cars)
+
+
+@app.get("/car/export/")
+async def export_cars(
+    format: ExportFormat = Query(ExportFormat.NDJSON, title="Format")
+) -> Any:
+    batches = ExportCars().handle()
+    if format == ExportFormat.CSV:
+        return ClosingStreamingResponse(
+            csv_chunks(CarDTO, batches), media_type="text/csv"
+        )
+    return ClosingStreamingResponse(
+        ndjson_chunks(batches), media_type="application/x-ndjson"
+    )
 
 
 @app.post("/car/")
@@ -40,16 +98,44 @@ def add_car(add_car: AddCarDTO) -> None:
         raise HTTPException(status_code=400, detail="This Make does not exist")
 
 
-@app.get("/make/")
-def list_makes() -> Any:
-    return GetAllMakes().handle()
+@app.post("/car/batch/")
+def add_cars_batch(add_cars: List[AddCarDTO]) -> Any:
+    return AddCarsBatch(add_car_dtos=add_cars).handle()
+
+
+@app.get("/make/", response_class=DTOResponse)
+def list_makes(request: Request) -> Any:
+    return catalog_response(request, "makes", GetAllMakes().handle)
+
+
+@app.get("/model/", response_class=DTOResponse)
+def list_models(request: Request, compact: bool = Query(False, title="Compact")) -> Any:
+    return catalog_response(request, "models", GetAllModels().handle, compact)
+
+
+@app.get("/submodel/", response_class=DTOResponse)
+def list_submodels(
+    request: Request, compact: bool = Query(False, title="Compact")
+) -> Any:
+    return catalog_response(request, "submodels", GetAllSubModels().handle, compact)
 
 
-@app.get("/model/")
-def list_models() -> Any:
-    return GetAllModels().handle()
+def catalog_response(
+    request: Request, name: str, load: Callable[[], DTO], compact: bool = False
+) -> Response:
+    """
+    Tags catalog responses with the catalog version, so that clients holding the
+    current one get a 304 without the catalog being loaded.
+    """
+    version = GetCatalogVersion().handle()
+    etag = f'"{name}-{version}-compact"' if compact else f'"{name}-{version}"'
+    headers = {"ETag": etag, "Cache-Control": f"max-age={settings.CATALOG_MAX_AGE}"}
+    if etag_matches(etag, request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    dto = load()
+    return DTOResponse(compact_listing(dto) if compact else dto, headers=headers)
 
 
-@app.get("/submodel/")
-def list_submodels() -> Any:
-    return GetAllSubModels().handle()
+@app.get("/catalog/cache/")
+async def catalog_cache_stats() -> Any:
+    return GetCatalogCacheStats().handle()
@@ -0,0 +1,211 @@
+import zlib
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Optional, Set
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class Encoder(ABC):
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        """Compresses a chunk, returning everything needed to decode it so far"""
+        pass
+
+    @abstractmethod
+    def finish(self) -> bytes:
+        pass
+
+
+class GzipEncoder(Encoder):
+    def __init__(self, level: int) -> None:
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliEncoder(Encoder):
+    def __init__(self, quality: int) -> None:
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        compressed: bytes = self._compressor.process(data) + self._compressor.flush()
+        return compressed
+
+    def finish(self) -> bytes:
+        compressed: bytes = self._compressor.finish()
+        return compressed
+
+
+def choose_encoding(
+    accept_encoding: str, encodings: Dict[str, Callable[[], Encoder]]
+) -> Optional[str]:
+    """
+    Picks the encoding which `Accept-Encoding` prefers, or which comes first in
+    `encodings` when it doesn't prefer any. Encodings with `q=0` are never picked.
+    """
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        weight = 1.0
+        if params.strip().startswith("q="):
+            try:
+                weight = float(params.strip()[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for name in encodings:
+        weight = weights.get(name, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = name, weight
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses of at least `minimum_size` bytes with brotli or gzip, as
+    negotiated with `Accept-Encoding`. Streamed responses are compressed chunk by
+    chunk, and every chunk is flushed, so clients can decode it right away.
+    ETags of compressed responses get the encoding appended, e.g. `"makes-8-br"`, so
+    they stay strong validators of the bytes sent; `If-None-Match` is matched by the
+    app against its own tags, with the encoding stripped again.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings: Dict[str, Callable[[], Encoder]] = {
+            "br": lambda: BrotliEncoder(brotli_quality),
+            "gzip": lambda: GzipEncoder(gzip_level),
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            accept_encoding = Headers(scope=scope).get("Accept-Encoding", "")
+            encoding = choose_encoding(accept_encoding, self.encodings)
+            if encoding is not None:
+                responder = CompressionResponder(
+                    self.app, self.minimum_size, encoding, self.encodings[encoding]
+                )
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class CompressionResponder:
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int,
+        encoding: str,
+        create_encoder: Callable[[], Encoder],
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encoding = encoding
+        self.create_encoder = create_encoder
+        self.send: Send = unattached_send
+        self.initial_message: Message = {}
+        self.encoder: Optional[Encoder] = None
+        self.started = False
+        # Tags of the app which the request revalidates in this encoding
+        self.revalidated_etags: Set[str] = set()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(self._decoded_scope(scope), receive, self.send_compressed)
+
+    def _decoded_scope(self, scope: Scope) -> Scope:
+        """Strips this encoding from the tags listed in `If-None-Match`"""
+        if_none_match = Headers(scope=scope).get("If-None-Match")
+        if if_none_match is None:
+            return scope
+
+        suffix = f'-{self.encoding}"'
+        tags = []
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag.endswith(suffix):
+                tag = tag[: -len(suffix)] + '"'
+                self.revalidated_etags.add(tag[2:] if tag.startswith("W/") else tag)
+            tags.append(tag)
+        scope = dict(scope, headers=list(scope["headers"]))
+        MutableHeaders(scope=scope)["If-None-Match"] = ", ".join(tags)
+        return scope
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Headers depend on whether the body gets compressed
+            self.initial_message = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.started:
+            if self.encoder is not None:
+                message = self._compressed(body, more_body)
+            await self.send(message)
+            return
+
+        self.started = True
+        headers = MutableHeaders(raw=self.initial_message["headers"])
+        if "Content-Encoding" in headers:
+            await self.send(self.initial_message)
+            await self.send(message)
+            return
+        if self.initial_message["status"] == 304:
+            # Validates what the client holds, compressed only if it was revalidated so
+            etag = headers.get("ETag", "")
+            if (etag[2:] if etag.startswith("W/") else etag) in self.revalidated_etags:
+                self._set_encoded_headers(headers)
+            await self.send(self.initial_message)
+            await self.send(message)
+            return
+        if len(body) < self.minimum_size and not more_body:
+            await self.send(self.initial_message)
+            await self.send(message)
+            return
+
+        self.encoder = self.create_encoder()
+        self._set_encoded_headers(headers)
+        message = self._compressed(body, more_body)
+        headers["Content-Encoding"] = self.encoding
+        if more_body:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(len(message["body"]))
+        await self.send(self.initial_message)
+        await self.send(message)
+
+    def _set_encoded_headers(self, headers: MutableHeaders) -> None:
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("ETag")
+        if etag is not None and etag.endswith('"'):
+            headers["ETag"] = f'{etag[:-1]}-{self.encoding}"'
+
+    def _compressed(self, body: bytes, more_body: bool) -> Message:
+        assert self.encoder is not None
+        data = self.encoder.compress(body)
+        if not more_body:
+            data += self.encoder.finish()
+        return {"type": "http.response.body", "body": data, "more_body": more_body}
+
+
+async def unattached_send(message: Message) -> None:
+    raise RuntimeError("send awaitable not set")
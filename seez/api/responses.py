@@ -0,0 +1,173 @@
+import asyncio
+import csv
+import inspect
+import io
+from datetime import datetime
+from enum import Enum
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Type,
+)
+
+import orjson
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.types import Receive, Scope, Send
+
+from seez.infrastructure.dto import DTO
+
+
+class DTOResponse(JSONResponse):
+    """
+    Renders DTOs straight to JSON bytes with orjson, which encodes UUIDs, datetimes
+    and enums itself. Routes return it instead of the DTO, so FastAPI skips
+    `jsonable_encoder`. The output is the same as that of `JSONResponse`.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_fields)
+
+
+# Fields of listed DTOs holding names which repeat across the list
+COMPACT_FIELDS = ("make", "model", "submodel")
+
+
+def compact_listing(dto: DTO, fields: Sequence[str] = COMPACT_FIELDS) -> Dict[str, Any]:
+    """
+    Compact form of a DTO listing `values`: their `fields` hold indexes into lists
+    of distinct names, which are sent once under `names`.
+    """
+    items = dto.__dict__["values"]
+    # Values of sparse listings are typed by their fields only
+    item_class = type(items[0]) if items else dto.__fields__["values"].type_
+    indexes: Dict[str, Dict[str, int]] = {
+        field: {} for field in fields if field in item_class.__fields__
+    }
+    values = []
+    for item in items:
+        value = dict(item.__dict__)
+        for field, field_indexes in indexes.items():
+            value[field] = field_indexes.setdefault(value[field], len(field_indexes))
+        values.append(value)
+    names = {field: list(field_indexes) for field, field_indexes in indexes.items()}
+    return {**dto.__dict__, "values": values, "names": names}
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """Tells whether an `If-None-Match` header lists the ETag, compared weakly"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in [
+        tag[2:] if tag.startswith("W/") else tag for tag in tags
+    ]
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    Stops streaming when the client disconnects, and closes the body iterator, so
+    that what it holds (a transaction reading a cursor) is released right away.
+    Starlette's keeps iterating to the end, as servers drop sends after a disconnect.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        disconnected = asyncio.Event()
+
+        async def listen_for_disconnect() -> None:
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+
+        listener = asyncio.ensure_future(listen_for_disconnect())
+        try:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": self.status_code,
+                    "headers": self.raw_headers,
+                }
+            )
+            async for chunk in self.body_iterator:
+                # Checked between chunks, so that a batch is never cut off halfway
+                if disconnected.is_set():
+                    break
+                if isinstance(chunk, str):
+                    chunk = chunk.encode(self.charset)
+                await send(
+                    {"type": "http.response.body", "body": chunk, "more_body": True}
+                )
+            else:
+                await send(
+                    {"type": "http.response.body", "body": b"", "more_body": False}
+                )
+        finally:
+            listener.cancel()
+            if inspect.isasyncgen(self.body_iterator):
+                await self.body_iterator.aclose()
+
+        if self.background is not None:
+            await self.background()
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+async def ndjson_chunks(
+    batches: AsyncGenerator[Sequence[DTO], None],
+) -> AsyncIterator[bytes]:
+    """Encodes each batch of DTOs as a chunk of JSON lines"""
+    try:
+        async for dtos in batches:
+            yield b"".join([orjson.dumps(dto, default=_fields) + b"\n" for dto in dtos])
+    finally:
+        # Closed along with the chunks, rather than whenever it's garbage collected
+        await batches.aclose()
+
+
+async def csv_chunks(
+    dto_class: Type[DTO], batches: AsyncGenerator[Sequence[DTO], None]
+) -> AsyncIterator[bytes]:
+    """
+    Encodes each batch of DTOs as a chunk of CSV rows, after a header of field names.
+    Values are written as in JSON, with empty strings for nulls.
+    """
+    names = list(dto_class.__fields__)
+    try:
+        yield _csv_rows([names])
+        async for dtos in batches:
+            yield _csv_rows(
+                [[_csv_value(dto.__dict__[name]) for name in names] for dto in dtos]
+            )
+    finally:
+        await batches.aclose()
+
+
+def _fields(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        # Nested DTOs come back here, field values are encoded by orjson
+        return value.__dict__
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def _csv_rows(rows: List[List[Any]]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
@@ -0,0 +1,9 @@
+import timeit
+from typing import Any, Callable
+
+
+def measure(label: str, func: Callable[[], Any], repeat: int = 5) -> float:
+    """Prints and returns the best time (in seconds) of `repeat` calls of `func`"""
+    best = min(timeit.repeat(func, number=1, repeat=repeat))
+    print(f"{label:<40} {best * 1000:10.2f} ms")
+    return best
@@ -0,0 +1,52 @@
+"""
+Building cars listing DTOs with validation (the pydantic constructor) compared to
+`DTO.trusted`, which `from_model` uses.
+
+    python -m seez.benchmarks.dto
+"""
+
+from typing import List
+
+from seez.benchmarks import measure
+from seez.benchmarks.serialization import car_listings
+from seez.domain.dto import CarDTO, CarListDTO
+from seez.domain.models import CarListing
+
+
+def validated(cars: List[CarListing]) -> CarListDTO:
+    car_dtos = [
+        CarDTO(
+            pk=car.pk,
+            year=car.year,
+            mileage=car.mileage,
+            price=car.price,
+            exterior_color=car.exterior_color,
+            created_at=car.created_at,
+            updated_at=car.updated_at,
+            body_type=car.body_type,
+            transmission=car.transmission,
+            fuel_type=car.fuel_type,
+            submodel=car.submodel_name,
+            model=car.model_name,
+            make=car.make_name,
+        )
+        for car in cars
+    ]
+    return CarListDTO(values=car_dtos)
+
+
+def main() -> None:
+    for size in (1000, 10000):
+        cars = car_listings(size)
+        print(f"{size} cars")
+        validated_time = measure(
+            "CarListDTO(values=[CarDTO(...)])", lambda: validated(cars)
+        )
+        trusted_time = measure(
+            "CarListDTO.from_model", lambda: CarListDTO.from_model(cars)
+        )
+        print(f"speedup: {validated_time / trusted_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
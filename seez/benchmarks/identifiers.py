@@ -0,0 +1,57 @@
+"""
+Inserts of random (uuid4) and time ordered (uuid7) primary keys into a table
+of the database from DATABASE_URL, with the resulting primary key index size.
+
+    python -m seez.benchmarks.identifiers [rows]
+"""
+
+import sys
+import time
+from typing import Any, Callable
+from uuid import UUID, uuid4
+
+from psycopg2.extras import execute_values
+from sqlalchemy import create_engine
+
+from seez import settings
+from seez.infrastructure.identifiers import uuid7
+
+BATCH_SIZE = 1000
+
+
+def insert_keys(cursor: Any, name: str, generate: Callable[[], UUID], rows: int) -> None:
+    table = f"benchmark_{name}"
+    cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    cursor.execute(f"CREATE TABLE {table} (pk uuid PRIMARY KEY, payload text)")
+
+    start = time.perf_counter()
+    for offset in range(0, rows, BATCH_SIZE):
+        values = [
+            (str(generate()), "x" * 100) for _ in range(min(BATCH_SIZE, rows - offset))
+        ]
+        execute_values(cursor, f"INSERT INTO {table} VALUES %s", values)
+    elapsed = time.perf_counter() - start
+
+    cursor.execute(f"SELECT pg_relation_size('{table}_pkey')")
+    index_size = cursor.fetchone()[0]
+    cursor.execute(f"DROP TABLE {table}")
+    print(
+        f"{name:<10} {rows / elapsed:12.0f} rows/s "
+        f"{index_size / (1 << 20):10.1f} MB primary key index"
+    )
+
+
+def main(rows: int) -> None:
+    print(f"{rows} rows in batches of {BATCH_SIZE}")
+    connection = create_engine(settings.DATABASE_URL).raw_connection()
+    try:
+        cursor = connection.cursor()
+        insert_keys(cursor, "uuid4", uuid4, rows)
+        insert_keys(cursor, "uuid7", uuid7, rows)
+        connection.commit()
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
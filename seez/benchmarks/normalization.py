@@ -0,0 +1,49 @@
+"""
+Enum normalization of import_data compared to building the mapping on every call,
+on a feed file.
+
+    python -m seez.benchmarks.normalization [/app/data/cars.csv]
+"""
+
+import csv
+import sys
+from typing import Optional
+
+from seez.benchmarks import measure
+from seez.domain.models import Car
+from seez.domain.normalization import BODY_TYPES, normalize
+
+
+def str_to_body_type(s: str) -> Optional[Car.BodyType]:
+    """The mapping import_data used before the lookup tables"""
+    m = {
+        "coupe": Car.BodyType.COUPE,
+        "sedan": Car.BodyType.SEDAN,
+        "suv": Car.BodyType.SUV,
+        "hatchback": Car.BodyType.HATCHBACK,
+        "convertible": Car.BodyType.CONVERTIBLE,
+        "van": Car.BodyType.VAN,
+        "sports": Car.BodyType.SPORTS,
+        "truck": Car.BodyType.TRUCK,
+        "wagon": Car.BodyType.WAGON,
+        "luxury": Car.BodyType.LUXURY,
+    }
+    return m.get(s.lower())
+
+
+def main(path: str) -> None:
+    with open(path, newline="") as f:
+        values = [line["body_type"] for line in csv.DictReader(f)]
+    print(f"{len(values)} body types from {path}")
+
+    dict_per_call_time = measure(
+        "mapping built per call", lambda: [str_to_body_type(value) for value in values]
+    )
+    normalize_time = measure(
+        "normalize", lambda: [normalize(BODY_TYPES, value) for value in values]
+    )
+    print(f"speedup: {dict_per_call_time / normalize_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "/app/data/cars.csv")
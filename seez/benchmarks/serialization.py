@@ -0,0 +1,56 @@
+"""
+Rendering of cars listings by FastAPI (`jsonable_encoder` and `JSONResponse`)
+compared to `DTOResponse`.
+
+    python -m seez.benchmarks.serialization
+"""
+
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from seez.aliases import Color, MakeName, Mileage, ModelName, Price, SubModelName, Year
+from seez.api.responses import DTOResponse
+from seez.benchmarks import measure
+from seez.domain.dto import CarListDTO
+from seez.domain.models import Car, CarListing
+
+
+def car_listings(size: int) -> List[CarListing]:
+    now = datetime.utcnow()
+    return [
+        CarListing(
+            pk=Car.next_pk(),
+            year=Year(2000 + i % 20),
+            mileage=Mileage(i * 10),
+            price=Price(1000 + i),
+            exterior_color=Color("Black"),
+            created_at=now - timedelta(seconds=i),
+            updated_at=now - timedelta(seconds=i),
+            body_type=Car.BodyType.SEDAN,
+            transmission=Car.Transmission.AUTOMATIC,
+            fuel_type=Car.FuelType.PETROL,
+            submodel_name=SubModelName("2.0 TDI"),
+            model_name=ModelName("A4"),
+            make_name=MakeName("Audi"),
+        )
+        for i in range(size)
+    ]
+
+
+def main() -> None:
+    for size in (1000, 10000):
+        dto = CarListDTO.from_model(car_listings(size))
+        print(f"{size} cars")
+        json_response_time = measure(
+            "jsonable_encoder + JSONResponse",
+            lambda: JSONResponse(jsonable_encoder(dto)),
+        )
+        dto_response_time = measure("DTOResponse", lambda: DTOResponse(dto))
+        print(f"speedup: {json_response_time / dto_response_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
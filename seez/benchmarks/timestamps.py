@@ -0,0 +1,35 @@
+"""
+Timestamp parsing of import_data compared to dateutil, on a feed file.
+
+    python -m seez.benchmarks.timestamps [/app/data/cars.csv]
+"""
+
+import csv
+import sys
+
+from dateutil import parser
+
+from seez.benchmarks import measure
+from seez.infrastructure.timestamps import parse_timestamp
+
+
+def main(path: str) -> None:
+    with open(path, newline="") as f:
+        values = [
+            line[field]
+            for line in csv.DictReader(f)
+            for field in ("created_at", "updated_at")
+        ]
+    print(f"{len(values)} timestamps from {path}")
+
+    dateutil_time = measure(
+        "dateutil.parser.parse", lambda: [parser.parse(value) for value in values]
+    )
+    parse_timestamp_time = measure(
+        "parse_timestamp", lambda: [parse_timestamp(value) for value in values]
+    )
+    print(f"speedup: {dateutil_time / parse_timestamp_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "/app/data/cars.csv")
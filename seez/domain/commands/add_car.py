@@ -1,11 +1,17 @@
+from typing import Tuple
+
 from haps import Inject
 
+from seez.aliases import SubModelPk
 from seez.domain.dto import AddCarDTO
 from seez.domain.models import Car, Make, Model, SubModel
+from seez.infrastructure.cache import CatalogCache, SubModelPkCache
 from seez.infrastructure.command import BaseCommand
 from seez.infrastructure.session import transactional
 from seez.ports.repositories import (
+    CarListingRepository,
     CarRepository,
+    CatalogVersionRepository,
     MakeRepository,
     ModelRepository,
     SubModelRepository,
@@ -14,28 +20,28 @@ from seez.ports.repositories import (
 
 class AddCar(BaseCommand):
     car_repository: CarRepository = Inject()
+    car_listing_repository: CarListingRepository = Inject()
     make_repository: MakeRepository = Inject()
     model_repository: ModelRepository = Inject()
     submodel_repository: SubModelRepository = Inject()
+    catalog_version_repository: CatalogVersionRepository = Inject()
+    catalog_cache: CatalogCache = Inject()
+    submodel_pk_cache: SubModelPkCache = Inject()
 
     add_car_dto: AddCarDTO
 
     @transactional
     def handle(self) -> None:
-        make = self.make_repository.get_by_name(self.add_car_dto.make)
-
-        submodel = self.submodel_repository.get_by_name_model_and_make(
-            name=self.add_car_dto.submodel,
-            model=self.add_car_dto.model,
-            make=self.add_car_dto.make,
-        )
-        if submodel is None:
-            submodel = self._create_new_submodel(make)
+        # Read before the submodel, so that it's never cached under a later version
+        version = self.catalog_cache.get_version(self.catalog_version_repository.get)
+        submodel_pk = self.submodel_pk_cache.get_pk(self._submodel_key(), version)
+        if submodel_pk is None:
+            submodel_pk = self._get_submodel_pk(version)
 
         car = Car.create_new(
             year=self.add_car_dto.year,
             mileage=self.add_car_dto.mileage,
-            submodel_pk=submodel.pk,
+            submodel_pk=submodel_pk,
             price=self.add_car_dto.price,
             exterior_color=self.add_car_dto.exterior_color,
             body_type=self.add_car_dto.body_type,
@@ -43,6 +49,29 @@ class AddCar(BaseCommand):
             fuel_type=self.add_car_dto.fuel_type,
         )
         self.car_repository.add(car)
+        self.car_listing_repository.refresh([car.pk])
+
+    def _submodel_key(self) -> Tuple[str, str, str]:
+        return (
+            self.add_car_dto.make.lower(),
+            self.add_car_dto.model.lower(),
+            self.add_car_dto.submodel.lower(),
+        )
+
+    def _get_submodel_pk(self, version: int) -> SubModelPk:
+        make = self.make_repository.get_by_name(self.add_car_dto.make)
+
+        submodel = self.submodel_repository.get_by_name_model_and_make(
+            name=self.add_car_dto.submodel,
+            model=self.add_car_dto.model,
+            make=self.add_car_dto.make,
+        )
+        if submodel is None:
+            # Not cached until a later lookup finds it, in case this transaction fails
+            return self._create_new_submodel(make).pk
+
+        self.submodel_pk_cache.set_pk(self._submodel_key(), version, submodel.pk)
+        return submodel.pk
 
     def _create_new_submodel(self, make: Make) -> SubModel:
         model = self.model_repository.get_by_name_and_make(
@@ -55,4 +84,6 @@ class AddCar(BaseCommand):
 
         submodel = SubModel.create_new(name=self.add_car_dto.submodel, model_pk=model.pk)
         self.submodel_repository.add(submodel)
+        self.catalog_version_repository.bump()
+        self.catalog_cache.expire()
         return submodel
@@ -0,0 +1,170 @@
+from typing import Dict, List, Tuple
+
+from haps import Inject
+
+from seez.aliases import SubModelPk
+from seez.domain.dto import AddCarDTO, AddCarResultDTO, AddCarsBatchResultDTO
+from seez.domain.exceptions import MakeDoesNotExist
+from seez.domain.models import Car, Make, Model, SubModel
+from seez.infrastructure.cache import CatalogCache, SubModelPkCache
+from seez.infrastructure.command import BaseCommand
+from seez.infrastructure.session import transactional
+from seez.ports.repositories import (
+    CarListingRepository,
+    CarRepository,
+    CatalogVersionRepository,
+    MakeRepository,
+    ModelRepository,
+    SubModelRepository,
+)
+
+ModelKey = Tuple[str, str]
+SubModelKey = Tuple[str, str, str]
+
+
+def model_key(add_car_dto: AddCarDTO) -> ModelKey:
+    return add_car_dto.make.lower(), add_car_dto.model.lower()
+
+
+def submodel_key(add_car_dto: AddCarDTO) -> SubModelKey:
+    return (
+        add_car_dto.make.lower(),
+        add_car_dto.model.lower(),
+        add_car_dto.submodel.lower(),
+    )
+
+
+class AddCarsBatch(BaseCommand):
+    """
+    Adds many cars in one transaction. Names of the whole batch are resolved with
+    one query per level and missing models and submodels are created in bulk.
+    Cars of unknown makes are skipped and reported in the result.
+    """
+
+    car_repository: CarRepository = Inject()
+    car_listing_repository: CarListingRepository = Inject()
+    make_repository: MakeRepository = Inject()
+    model_repository: ModelRepository = Inject()
+    submodel_repository: SubModelRepository = Inject()
+    catalog_version_repository: CatalogVersionRepository = Inject()
+    catalog_cache: CatalogCache = Inject()
+    submodel_pk_cache: SubModelPkCache = Inject()
+
+    add_car_dtos: List[AddCarDTO]
+
+    @transactional
+    def handle(self) -> AddCarsBatchResultDTO:
+        submodel_pks = self._get_submodel_pks()
+
+        cars = []
+        results = []
+        for add_car_dto in self.add_car_dtos:
+            submodel_pk = submodel_pks.get(submodel_key(add_car_dto))
+            if submodel_pk is None:
+                results.append(AddCarResultDTO(error=MakeDoesNotExist.description))
+                continue
+
+            car = Car.create_new(
+                year=add_car_dto.year,
+                mileage=add_car_dto.mileage,
+                submodel_pk=submodel_pk,
+                price=add_car_dto.price,
+                exterior_color=add_car_dto.exterior_color,
+                body_type=add_car_dto.body_type,
+                transmission=add_car_dto.transmission,
+                fuel_type=add_car_dto.fuel_type,
+            )
+            cars.append(car)
+            results.append(AddCarResultDTO(pk=car.pk))
+
+        if cars:
+            self.car_repository.add_batch(cars)
+            self.car_listing_repository.refresh([car.pk for car in cars])
+        return AddCarsBatchResultDTO(values=results)
+
+    def _get_submodel_pks(self) -> Dict[SubModelKey, SubModelPk]:
+        # Read before submodels, so that they are never cached under a later version
+        version = self.catalog_cache.get_version(self.catalog_version_repository.get)
+        submodel_pks: Dict[SubModelKey, SubModelPk] = {}
+        not_cached = []
+        for add_car_dto in self.add_car_dtos:
+            key = submodel_key(add_car_dto)
+            submodel_pk = self.submodel_pk_cache.get_pk(key, version)
+            if submodel_pk is None:
+                not_cached.append(add_car_dto)
+            else:
+                submodel_pks[key] = submodel_pk
+
+        if not_cached:
+            submodels = self._get_or_create_submodels(not_cached, version)
+            for key, submodel in submodels.items():
+                submodel_pks[key] = submodel.pk
+        return submodel_pks
+
+    def _get_makes(self, add_car_dtos: List[AddCarDTO]) -> Dict[str, Make]:
+        names = list({add_car_dto.make for add_car_dto in add_car_dtos})
+        makes = self.make_repository.get_by_names(names)
+        return {make.name.lower(): make for make in makes}
+
+    def _get_or_create_models(
+        self, add_car_dtos: List[AddCarDTO]
+    ) -> Dict[ModelKey, Model]:
+        makes = self._get_makes(add_car_dtos)
+        make_names = {make.pk: make_name for make_name, make in makes.items()}
+
+        wanted: Dict[ModelKey, Model] = {}
+        for add_car_dto in add_car_dtos:
+            make = makes.get(add_car_dto.make.lower())
+            key = model_key(add_car_dto)
+            if make is not None and key not in wanted:
+                wanted[key] = Model.create_new(name=add_car_dto.model, make_pk=make.pk)
+
+        existing = self.model_repository.get_by_names_and_make_pks(
+            [(model.name, model.make_pk) for model in wanted.values()]
+        )
+        models = {
+            (make_names[model.make_pk], model.name.lower()): model for model in existing
+        }
+
+        new_models = [model for key, model in wanted.items() if key not in models]
+        if new_models:
+            self.model_repository.add_batch(new_models)
+        for model in new_models:
+            models[(make_names[model.make_pk], model.name.lower())] = model
+        return models
+
+    def _get_or_create_submodels(
+        self, add_car_dtos: List[AddCarDTO], version: int
+    ) -> Dict[SubModelKey, SubModel]:
+        models = self._get_or_create_models(add_car_dtos)
+        model_keys = {model.pk: key for key, model in models.items()}
+
+        wanted: Dict[SubModelKey, SubModel] = {}
+        for add_car_dto in add_car_dtos:
+            model = models.get(model_key(add_car_dto))
+            key = submodel_key(add_car_dto)
+            if model is not None and key not in wanted:
+                wanted[key] = SubModel.create_new(
+                    name=add_car_dto.submodel, model_pk=model.pk
+                )
+
+        existing = self.submodel_repository.get_by_names_and_model_pks(
+            [(submodel.name, submodel.model_pk) for submodel in wanted.values()]
+        )
+        submodels = {}
+        for submodel in existing:
+            key = (*model_keys[submodel.model_pk], submodel.name.lower())
+            submodels[key] = submodel
+            self.submodel_pk_cache.set_pk(key, version, submodel.pk)
+
+        new_submodels = [
+            submodel for key, submodel in wanted.items() if key not in submodels
+        ]
+        if new_submodels:
+            # New models always come with new submodels
+            self.submodel_repository.add_batch(new_submodels)
+            self.catalog_version_repository.bump()
+            self.catalog_cache.expire()
+        for submodel in new_submodels:
+            submodels[(*model_keys[submodel.model_pk], submodel.name.lower())] = submodel
+        return submodels
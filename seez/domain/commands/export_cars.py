@@ -0,0 +1,19 @@
+from typing import AsyncGenerator, List
+
+from haps import Inject
+
+from seez.domain.dto import CarDTO
+from seez.infrastructure.async_session import async_transactional
+from seez.infrastructure.command import BaseCommand
+from seez.ports.repositories import AsyncCarListingRepository
+
+
+class ExportCars(BaseCommand):
+    car_listing_repository: AsyncCarListingRepository = Inject()
+
+    batch_size: int = 1000
+
+    @async_transactional(readonly=True)
+    async def handle(self) -> AsyncGenerator[List[CarDTO], None]:
+        async for cars in self.car_listing_repository.stream_active(self.batch_size):
+            yield [CarDTO.from_model(car) for car in cars]
@@ -1,32 +1,70 @@
-from typing import Optional
+from typing import Optional, Sequence, Union
 
 from haps import Inject
 
-from seez.domain.dto import CarListDTO
+from seez.domain.cursors import CarCursor
+from seez.domain.dto import (
+    CAR_LISTING_ATTRIBUTES,
+    CarListDTO,
+    SparseCarListDTO,
+    car_fields,
+)
+from seez.infrastructure.async_session import async_transactional
 from seez.infrastructure.command import BaseCommand
-from seez.infrastructure.session import transactional
-from seez.ports.repositories import CarRepository
+from seez.ports.repositories import AsyncCarListingRepository
 
 
 class GetCarsPaged(BaseCommand):
-    car_repository: CarRepository = Inject()
+    car_listing_repository: AsyncCarListingRepository = Inject()
 
     page_number: int = 1
     page_size: int = 1
+    cursor: Optional[str] = None
 
     price_min: Optional[int] = None
     price_max: Optional[int] = None
     mileage_min: Optional[int] = None
     mileage_max: Optional[int] = None
 
-    @transactional
-    def handle(self) -> CarListDTO:
-        cars = self.car_repository.get_active_paged(
-            page_number=self.page_number,
-            page_size=self.page_size,
-            price_min=self.price_min,
-            price_max=self.price_max,
-            mileage_min=self.mileage_min,
-            mileage_max=self.mileage_max,
-        )
-        return CarListDTO.from_model(cars)
+    # Names of CarDTO fields, only these are read and listed when given
+    fields: Optional[Sequence[str]] = None
+
+    @async_transactional(readonly=True)
+    async def handle(self) -> Union[CarListDTO, SparseCarListDTO]:
+        fields = None if self.fields is None else car_fields(self.fields)
+        columns = None
+        if fields is not None:
+            # Listing order columns are always read, for the next cursor
+            columns = ["pk", "updated_at"] + [
+                CAR_LISTING_ATTRIBUTES.get(name, name)
+                for name in fields
+                if name not in ("pk", "updated_at")
+            ]
+
+        if self.cursor is None:
+            cars = await self.car_listing_repository.get_active_paged(
+                page_number=self.page_number,
+                page_size=self.page_size,
+                price_min=self.price_min,
+                price_max=self.price_max,
+                mileage_min=self.mileage_min,
+                mileage_max=self.mileage_max,
+                columns=columns,
+            )
+        else:
+            cars = await self.car_listing_repository.get_active_after(
+                cursor=CarCursor.decode(self.cursor),
+                page_size=self.page_size,
+                price_min=self.price_min,
+                price_max=self.price_max,
+                mileage_min=self.mileage_min,
+                mileage_max=self.mileage_max,
+                columns=columns,
+            )
+
+        next_cursor = None
+        if cars and len(cars) == self.page_size:
+            next_cursor = CarCursor.from_car(cars[-1]).encode()
+        if fields is not None:
+            return SparseCarListDTO.from_model(cars, fields, next_cursor=next_cursor)
+        return CarListDTO.from_model(cars, next_cursor=next_cursor)
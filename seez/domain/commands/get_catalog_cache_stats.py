@@ -0,0 +1,12 @@
+from haps import Inject
+
+from seez.domain.dto import CacheStatsDTO
+from seez.infrastructure.cache import CatalogCache
+from seez.infrastructure.command import BaseCommand
+
+
+class GetCatalogCacheStats(BaseCommand):
+    catalog_cache: CatalogCache = Inject()
+
+    def handle(self) -> CacheStatsDTO:
+        return CacheStatsDTO.from_cache(self.catalog_cache)
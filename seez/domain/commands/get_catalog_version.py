@@ -0,0 +1,15 @@
+from haps import Inject
+
+from seez.infrastructure.cache import CatalogCache
+from seez.infrastructure.command import BaseCommand
+from seez.infrastructure.session import transactional
+from seez.ports.repositories import CatalogVersionRepository
+
+
+class GetCatalogVersion(BaseCommand):
+    catalog_version_repository: CatalogVersionRepository = Inject()
+    catalog_cache: CatalogCache = Inject()
+
+    @transactional(readonly=True)
+    def handle(self) -> int:
+        return self.catalog_cache.get_version(self.catalog_version_repository.get)
@@ -1,15 +1,23 @@
 from haps import Inject
 
 from seez.domain.dto import MakeListDTO
+from seez.infrastructure.cache import CatalogCache
 from seez.infrastructure.command import BaseCommand
 from seez.infrastructure.session import transactional
-from seez.ports.repositories import MakeRepository
+from seez.ports.repositories import CatalogVersionRepository, MakeRepository
 
 
 class GetAllMakes(BaseCommand):
     make_repository: MakeRepository = Inject()
+    catalog_version_repository: CatalogVersionRepository = Inject()
+    catalog_cache: CatalogCache = Inject()
 
-    @transactional
+    @transactional(readonly=True)
     def handle(self) -> MakeListDTO:
+        return self.catalog_cache.get_or_load(
+            "makes", self.catalog_version_repository.get, self._get_makes
+        )
+
+    def _get_makes(self) -> MakeListDTO:
         makes = self.make_repository.get_all_active()
         return MakeListDTO.from_model(makes)
@@ -1,15 +1,23 @@
 from haps import Inject
 
 from seez.domain.dto import ModelListDTO
+from seez.infrastructure.cache import CatalogCache
 from seez.infrastructure.command import BaseCommand
 from seez.infrastructure.session import transactional
-from seez.ports.repositories import ModelRepository
+from seez.ports.repositories import CatalogVersionRepository, ModelRepository
 
 
 class GetAllModels(BaseCommand):
     model_repository: ModelRepository = Inject()
+    catalog_version_repository: CatalogVersionRepository = Inject()
+    catalog_cache: CatalogCache = Inject()
 
-    @transactional
+    @transactional(readonly=True)
     def handle(self) -> ModelListDTO:
+        return self.catalog_cache.get_or_load(
+            "models", self.catalog_version_repository.get, self._get_models
+        )
+
+    def _get_models(self) -> ModelListDTO:
         models = self.model_repository.get_all_active()
         return ModelListDTO.from_model(models)
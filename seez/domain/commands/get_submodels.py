@@ -1,15 +1,23 @@
 from haps import Inject
 
 from seez.domain.dto import SubModelListDTO
+from seez.infrastructure.cache import CatalogCache
 from seez.infrastructure.command import BaseCommand
 from seez.infrastructure.session import transactional
-from seez.ports.repositories import SubModelRepository
+from seez.ports.repositories import CatalogVersionRepository, SubModelRepository
 
 
 class GetAllSubModels(BaseCommand):
     submodel_repository: SubModelRepository = Inject()
+    catalog_version_repository: CatalogVersionRepository = Inject()
+    catalog_cache: CatalogCache = Inject()
 
-    @transactional
+    @transactional(readonly=True)
     def handle(self) -> SubModelListDTO:
+        return self.catalog_cache.get_or_load(
+            "submodels", self.catalog_version_repository.get, self._get_submodels
+        )
+
+    def _get_submodels(self) -> SubModelListDTO:
         submodels = self.submodel_repository.get_all_active()
         return SubModelListDTO.from_model(submodels)
@@ -0,0 +1,38 @@
+import base64
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Union
+from uuid import UUID
+
+from seez.aliases import CarPk
+from seez.domain.exceptions import InvalidCursor
+from seez.domain.models import Car, CarListing
+
+
+@dataclass(frozen=True)
+class CarCursor:
+    """
+    Position in the active cars listing. Cars are listed by `updated_at`
+    and `pk` descending, so the cursor points right after the given pair.
+    """
+
+    updated_at: datetime
+    pk: CarPk
+
+    @classmethod
+    def from_car(cls, car: Union[Car, CarListing]) -> "CarCursor":
+        return cls(updated_at=car.updated_at, pk=car.pk)
+
+    @classmethod
+    def decode(cls, value: str) -> "CarCursor":
+        try:
+            padding = "=" * (-len(value) % 4)
+            raw = base64.urlsafe_b64decode(value + padding).decode()
+            updated_at, pk = raw.split("|")
+            return cls(updated_at=datetime.fromisoformat(updated_at), pk=CarPk(UUID(pk)))
+        except ValueError:
+            raise InvalidCursor
+
+    def encode(self) -> str:
+        raw = f"{self.updated_at.isoformat()}|{self.pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
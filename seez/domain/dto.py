@@ -1,5 +1,9 @@
 from datetime import datetime
-from typing import List, Optional
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type, Union
+
+from pydantic import create_model, validator
+from pydantic.fields import ModelField
 
 from seez.aliases import (
     CarPk,
@@ -14,7 +18,10 @@ from seez.aliases import (
     SubModelPk,
     Year,
 )
-from seez.domain.models import Car, Make, Model, SubModel
+from seez.domain.exceptions import InvalidFields
+from seez.domain.models import Car, CarListing, Make, Model, SubModel
+from seez.domain.normalization import TABLES, normalize
+from seez.infrastructure.cache import VersionedCache
 from seez.infrastructure.dto import DTO
 
 
@@ -34,8 +41,8 @@ class CarDTO(DTO):
     make: MakeName
 
     @classmethod
-    def from_model(cls, car: Car) -> "CarDTO":
-        return cls(
+    def from_model(cls, car: Union[Car, CarListing]) -> "CarDTO":
+        return cls.trusted(
             pk=car.pk,
             year=car.year,
             mileage=car.mileage,
@@ -54,13 +61,67 @@ class CarDTO(DTO):
 
 class CarListDTO(DTO):
     values: List[CarDTO]
+    next_cursor: Optional[str] = None
 
     @classmethod
-    def from_model(cls, cars: List[Car]) -> "CarListDTO":
+    def from_model(
+        cls, cars: Sequence[Union[Car, CarListing]], next_cursor: Optional[str] = None
+    ) -> "CarListDTO":
         car_dtos = []
         for car in cars:
             car_dtos.append(CarDTO.from_model(car))
-        return cls(values=car_dtos)
+        return cls.trusted(values=car_dtos, next_cursor=next_cursor)
+
+
+# Listing attributes of `CarDTO` fields named differently
+CAR_LISTING_ATTRIBUTES: Dict[str, str] = {
+    "submodel": "submodel_name",
+    "model": "model_name",
+    "make": "make_name",
+}
+
+
+def car_fields(fields: Sequence[str]) -> Tuple[str, ...]:
+    """Validates names of `CarDTO` fields, returning them in the order of `CarDTO`"""
+    unknown = set(fields) - CarDTO.__fields__.keys()
+    if unknown:
+        raise InvalidFields(f"Unknown fields: {', '.join(sorted(unknown))}")
+    if not fields:
+        raise InvalidFields("No fields")
+    return tuple(name for name in CarDTO.__fields__ if name in fields)
+
+
+@lru_cache(maxsize=None)
+def sparse_car_dto(fields: Tuple[str, ...]) -> Type[DTO]:
+    """`CarDTO` with only the given fields, as returned by `car_fields`"""
+    definitions: Dict[str, Any] = {
+        name: (
+            CarDTO.__annotations__[name],
+            ... if CarDTO.__fields__[name].required else None,
+        )
+        for name in fields
+    }
+    return create_model("SparseCarDTO", __base__=DTO, **definitions)
+
+
+class SparseCarListDTO(DTO):
+    values: List[DTO]
+    next_cursor: Optional[str] = None
+
+    @classmethod
+    def from_model(
+        cls,
+        cars: Sequence[CarListing],
+        fields: Tuple[str, ...],
+        next_cursor: Optional[str] = None,
+    ) -> "SparseCarListDTO":
+        dto_class = sparse_car_dto(fields)
+        attributes = [(name, CAR_LISTING_ATTRIBUTES.get(name, name)) for name in fields]
+        car_dtos = []
+        for car in cars:
+            values = {name: getattr(car, attribute) for name, attribute in attributes}
+            car_dtos.append(dto_class.trusted(**values))
+        return cls.trusted(values=car_dtos, next_cursor=next_cursor)
 
 
 class MakeDTO(DTO):
@@ -71,7 +132,7 @@ class MakeDTO(DTO):
 
     @classmethod
     def from_model(cls, make: Make) -> "MakeDTO":
-        return cls(
+        return cls.trusted(
             pk=make.pk,
             name=make.name,
             created_at=make.created_at,
@@ -87,7 +148,7 @@ class MakeListDTO(DTO):
         make_dtos = []
         for make in makes:
             make_dtos.append(MakeDTO.from_model(make))
-        return cls(values=make_dtos)
+        return cls.trusted(values=make_dtos)
 
 
 class ModelDTO(DTO):
@@ -99,7 +160,7 @@ class ModelDTO(DTO):
 
     @classmethod
     def from_model(cls, model: Model) -> "ModelDTO":
-        return cls(
+        return cls.trusted(
             pk=model.pk,
             name=model.name,
             make=model.make.name,
@@ -116,7 +177,7 @@ class ModelListDTO(DTO):
         model_dtos = []
         for model in models:
             model_dtos.append(ModelDTO.from_model(model))
-        return cls(values=model_dtos)
+        return cls.trusted(values=model_dtos)
 
 
 class SubModelDTO(DTO):
@@ -129,7 +190,7 @@ class SubModelDTO(DTO):
 
     @classmethod
     def from_model(cls, submodel: SubModel) -> "SubModelDTO":
-        return cls(
+        return cls.trusted(
             pk=submodel.pk,
             name=submodel.name,
             make=submodel.model.make.name,
@@ -147,7 +208,7 @@ class SubModelListDTO(DTO):
         submodel_dtos = []
         for submodel in submodels:
             submodel_dtos.append(SubModelDTO.from_model(submodel))
-        return cls(values=submodel_dtos)
+        return cls.trusted(values=submodel_dtos)
 
 
 class AddCarDTO(DTO):
@@ -161,3 +222,28 @@ class AddCarDTO(DTO):
     submodel: SubModelName
     model: ModelName
     make: MakeName
+
+    @validator("body_type", "transmission", "fuel_type", pre=True)
+    def normalize_enum(cls, value: Any, field: ModelField) -> Any:
+        # Unknown values are left for the enum validation to reject
+        if isinstance(value, str):
+            return normalize(TABLES[field.type_], value) or value
+        return value
+
+
+class AddCarResultDTO(DTO):
+    pk: Optional[CarPk] = None
+    error: Optional[str] = None
+
+
+class AddCarsBatchResultDTO(DTO):
+    values: List[AddCarResultDTO]
+
+
+class CacheStatsDTO(DTO):
+    hits: int
+    misses: int
+
+    @classmethod
+    def from_cache(cls, cache: VersionedCache) -> "CacheStatsDTO":
+        return cls(hits=cache.hits, misses=cache.misses)
@@ -1,4 +1,4 @@
-from seez.infrastructure.exceptions import DoesNotExistError
+from seez.infrastructure.exceptions import DoesNotExistError, SeezError
 
 
 class CarDoesNotExist(DoesNotExistError):
@@ -15,3 +15,11 @@ class SubModelDoesNotExist(DoesNotExistError):
 
 class MakeDoesNotExist(DoesNotExistError):
     description = "Make does not exist"
+
+
+class InvalidCursor(SeezError):
+    description = "Invalid cursor"
+
+
+class InvalidFields(SeezError):
+    description = "Invalid fields"
@@ -2,7 +2,6 @@ from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
 from typing import Optional
-from uuid import uuid4
 
 from seez.aliases import (
     CarPk,
@@ -13,10 +12,12 @@ from seez.aliases import (
     ModelName,
     ModelPk,
     Price,
+    SourceId,
     SubModelName,
     SubModelPk,
     Year,
 )
+from seez.infrastructure.identifiers import uuid7
 from seez.infrastructure.models import AggregateRoot
 
 
@@ -32,6 +33,7 @@ class Car(AggregateRoot):
     updated_at: datetime
 
     submodel_pk: SubModelPk
+    source_id: Optional[SourceId]
 
     _body_type: Optional["Car.BodyType"]
     _transmission: Optional["Car.Transmission"]
@@ -83,6 +85,7 @@ class Car(AggregateRoot):
         body_type: Optional[BodyType],
         transmission: Optional[Transmission],
         fuel_type: Optional[FuelType],
+        source_id: Optional[SourceId] = None,
     ):
         self.pk = pk
         self.active = active
@@ -96,10 +99,11 @@ class Car(AggregateRoot):
         self._body_type = body_type
         self._transmission = transmission
         self._fuel_type = fuel_type
+        self.source_id = source_id
 
     @classmethod
     def next_pk(cls) -> CarPk:
-        return CarPk(uuid4())
+        return CarPk(uuid7())
 
     @classmethod
     def create_new(
@@ -153,6 +157,28 @@ class Car(AggregateRoot):
         return self._submodel.model.make.name
 
 
+@dataclass
+class CarListing:
+    """
+    Active car as listed by the API, along with its submodel, model and make
+    names. Read model kept in sync with cars and the catalog on writes.
+    """
+
+    pk: CarPk
+    year: Year
+    mileage: Optional[Mileage]
+    price: Optional[Price]
+    exterior_color: Optional[Color]
+    created_at: datetime
+    updated_at: datetime
+    body_type: Optional[Car.BodyType]
+    transmission: Optional[Car.Transmission]
+    fuel_type: Optional[Car.FuelType]
+    submodel_name: SubModelName
+    model_name: ModelName
+    make_name: MakeName
+
+
 @dataclass(unsafe_hash=False, eq=False)
 class Make(AggregateRoot):
     pk: MakePk
@@ -160,10 +186,11 @@ class Make(AggregateRoot):
     active: bool
     created_at: datetime
     updated_at: datetime
+    source_id: Optional[SourceId] = None
 
     @classmethod
     def next_pk(cls) -> MakePk:
-        return MakePk(uuid4())
+        return MakePk(uuid7())
 
     @classmethod
     def create_new(cls, name: MakeName) -> "Make":
@@ -184,6 +211,7 @@ class Model(AggregateRoot):
     make_pk: MakePk
     created_at: datetime
     updated_at: datetime
+    source_id: Optional[SourceId]
 
     _make: Make
 
@@ -195,6 +223,7 @@ class Model(AggregateRoot):
         make_pk: MakePk,
         created_at: datetime,
         updated_at: datetime,
+        source_id: Optional[SourceId] = None,
     ) -> None:
         self.pk = pk
         self.name = name
@@ -202,6 +231,7 @@ class Model(AggregateRoot):
         self.make_pk = make_pk
         self.created_at = created_at
         self.updated_at = updated_at
+        self.source_id = source_id
 
     @classmethod
     def create_new(cls, name: ModelName, make_pk: MakePk) -> "Model":
@@ -216,7 +246,7 @@ class Model(AggregateRoot):
 
     @classmethod
     def next_pk(cls) -> ModelPk:
-        return ModelPk(uuid4())
+        return ModelPk(uuid7())
 
     @property
     def make(self) -> Make:
@@ -231,6 +261,7 @@ class SubModel(AggregateRoot):
     model_pk: ModelPk
     created_at: datetime
     updated_at: datetime
+    source_id: Optional[SourceId]
 
     _model: Model
 
@@ -242,6 +273,7 @@ class SubModel(AggregateRoot):
         model_pk: ModelPk,
         created_at: datetime,
         updated_at: datetime,
+        source_id: Optional[SourceId] = None,
     ) -> None:
         self.pk = pk
         self.name = name
@@ -249,6 +281,7 @@ class SubModel(AggregateRoot):
         self.model_pk = model_pk
         self.created_at = created_at
         self.updated_at = updated_at
+        self.source_id = source_id
 
     @classmethod
     def create_new(cls, name: SubModelName, model_pk: ModelPk) -> "SubModel":
@@ -263,7 +296,7 @@ class SubModel(AggregateRoot):
 
     @classmethod
     def next_pk(cls) -> SubModelPk:
-        return SubModelPk(uuid4())
+        return SubModelPk(uuid7())
 
     @property
     def model(self) -> Model:
@@ -0,0 +1,42 @@
+"""
+Lookup tables mapping raw strings of the feed and the API to car enums.
+Tables are built once, so normalizing a value costs one or two dict lookups.
+"""
+
+from enum import Enum
+from typing import Any, Dict, Optional, Type, TypeVar
+
+from seez.domain.models import Car
+
+E = TypeVar("E", bound=Enum)
+
+
+def lookup_table(enum: Type[E]) -> Dict[str, E]:
+    """
+    Maps names of members in upper, lower and capitalized case (as in the feed),
+    so that most values are found without being cleaned first.
+    """
+    table = {}
+    for member in enum:
+        for key in (member.name, member.name.lower(), member.name.capitalize()):
+            table[key] = member
+    return table
+
+
+BODY_TYPES = lookup_table(Car.BodyType)
+TRANSMISSIONS = lookup_table(Car.Transmission)
+FUEL_TYPES = lookup_table(Car.FuelType)
+
+TABLES: Dict[Type[Enum], Dict[str, Any]] = {
+    Car.BodyType: BODY_TYPES,
+    Car.Transmission: TRANSMISSIONS,
+    Car.FuelType: FUEL_TYPES,
+}
+
+
+def normalize(table: Dict[str, E], value: str) -> Optional[E]:
+    """Returns the member for value regardless of its case and surrounding spaces"""
+    member = table.get(value)
+    if member is None:
+        member = table.get(value.strip().lower())
+    return member
@@ -0,0 +1,214 @@
+import asyncio
+import inspect
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from functools import partial, wraps
+from itertools import count
+from typing import Any, AsyncContextManager, AsyncIterator, Dict, List, Mapping, Optional
+
+from aiopg.sa import Engine as AiopgSaEngine
+from aiopg.sa import SAConnection
+from aiopg.sa import create_engine as create_aiopg_engine
+from haps import SINGLETON_SCOPE, Container, base, egg, scope
+from sqlalchemy.sql.base import Executable
+from sqlalchemy.sql.selectable import Select
+
+from seez import settings
+from seez.infrastructure.postgres.cursors import (
+    DeclareCursor,
+    close_cursor,
+    fetch_from_cursor,
+)
+from seez.infrastructure.scopes import TRANSACTIONAL_SCOPE
+from seez.infrastructure.session import READ_ONLY
+
+ASYNC_CONNECTION = "__async_connection"
+
+_cursor_numbers = count()
+
+
+@base
+class AsyncConnection(ABC):
+    """Connection of the current async transaction, running SQLAlchemy Core statements"""
+
+    @abstractmethod
+    async def fetch_all(self, statement: Executable) -> List[Mapping[str, Any]]:
+        pass
+
+    @abstractmethod
+    async def fetch_val(self, statement: Executable) -> Any:
+        pass
+
+    @abstractmethod
+    async def execute(self, statement: Executable) -> None:
+        pass
+
+    async def stream(
+        self, statement: Select, batch_size: int
+    ) -> AsyncIterator[List[Mapping[str, Any]]]:
+        """
+        Reads rows of the statement in batches through a server-side cursor,
+        which keeps memory use flat however many rows there are.
+        """
+        name = f"stream_{next(_cursor_numbers)}"
+        await self.execute(DeclareCursor(name, statement))
+        fetch = fetch_from_cursor(name, statement, batch_size)
+        while True:
+            rows = await self.fetch_all(fetch)
+            if rows:
+                yield rows
+            if len(rows) < batch_size:
+                break
+        await self.execute(close_cursor(name))
+
+
+@base
+class AsyncEngine(ABC):
+    @abstractmethod
+    def transaction(self, readonly: bool) -> AsyncContextManager[AsyncConnection]:
+        pass
+
+    @abstractmethod
+    async def close(self) -> None:
+        pass
+
+
+class AiopgConnection(AsyncConnection):
+    def __init__(self, connection: SAConnection) -> None:
+        self._connection = connection
+
+    async def fetch_all(self, statement: Executable) -> List[Mapping[str, Any]]:
+        result = await self._connection.execute(statement)
+        return list(await result.fetchall())
+
+    async def fetch_val(self, statement: Executable) -> Any:
+        return await self._connection.scalar(statement)
+
+    async def execute(self, statement: Executable) -> None:
+        await self._connection.execute(statement)
+
+
+class AiopgEngine(AsyncEngine):
+    """
+    Pools of aiopg connections, one to the database and one to the replica when it
+    is set. Pools belong to the event loop they were created in, so they are created
+    on first use, e.g. in a forked worker, and again when the loop changes.
+    """
+
+    def __init__(self, url: str, replica_url: Optional[str] = None) -> None:
+        self.url = url
+        self.replica_url = replica_url or url
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._engines: Dict[str, AiopgSaEngine] = {}
+
+    @asynccontextmanager
+    async def transaction(self, readonly: bool) -> AsyncIterator[AsyncConnection]:
+        engine = await self._get_engine(self.replica_url if readonly else self.url)
+        async with engine.acquire() as connection:
+            transaction = await connection.begin()
+            try:
+                if readonly:
+                    await connection.execute("SET TRANSACTION READ ONLY")
+                yield AiopgConnection(connection)
+                if not readonly:
+                    await transaction.commit()
+            finally:
+                if transaction.is_active:
+                    await transaction.rollback()
+
+    async def close(self) -> None:
+        engines, self._engines = list(self._engines.values()), {}
+        for engine in engines:
+            engine.close()
+            await engine.wait_closed()
+
+    async def _get_engine(self, url: str) -> AiopgSaEngine:
+        loop = asyncio.get_event_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._engines = {}
+
+        assert self._lock is not None
+        async with self._lock:
+            if url not in self._engines:
+                self._engines[url] = await self._create_engine(url)
+        return self._engines[url]
+
+    async def _create_engine(self, url: str) -> AiopgSaEngine:
+        connect_args: Dict[str, Any] = {}
+        if settings.DATABASE_STATEMENT_TIMEOUT:
+            connect_args["options"] = (
+                f"-c statement_timeout={settings.DATABASE_STATEMENT_TIMEOUT}"
+            )
+
+        engine: AiopgSaEngine = await create_aiopg_engine(
+            url,
+            echo=settings.DEBUG,
+            minsize=1,
+            maxsize=settings.ASYNC_DATABASE_POOL_SIZE,
+            timeout=settings.DATABASE_POOL_TIMEOUT,
+            pool_recycle=settings.DATABASE_POOL_RECYCLE,
+            **connect_args,
+        )
+        return engine
+
+
+@egg
+@scope(SINGLETON_SCOPE)
+def aiopg_engine() -> AsyncEngine:
+    return AiopgEngine(settings.DATABASE_URL, settings.DATABASE_REPLICA_URL)
+
+
+@egg
+@scope(TRANSACTIONAL_SCOPE)
+def async_connection_factory() -> AsyncConnection:
+    transactional_scope = Container().scopes[TRANSACTIONAL_SCOPE]  # noqa
+    connection: AsyncConnection = transactional_scope.scope[ASYNC_CONNECTION]
+    return connection
+
+
+def async_transactional(func: Any = None, *, readonly: bool = False) -> Any:
+    """
+    `transactional` for coroutines: the decorated coroutine runs in a new
+    transactional scope with a connection of the `AsyncEngine`, which is
+    committed afterwards, or rolled back with `readonly=True`. Async generators
+    keep the transaction open until they are exhausted or closed.
+    """
+    if func is None:
+        return partial(async_transactional, readonly=readonly)
+
+    if inspect.isasyncgenfunction(func):
+
+        @wraps(func)
+        async def generator_wrapper(*args: Any, **kwargs: Any) -> Any:
+            transactional_scope = Container().scopes[TRANSACTIONAL_SCOPE]  # noqa
+
+            with transactional_scope.scope:
+                transactional_scope.scope[READ_ONLY] = readonly
+                engine = Container().get_object(AsyncEngine)
+                async with engine.transaction(readonly) as connection:
+                    transactional_scope.scope[ASYNC_CONNECTION] = connection
+                    items = func(*args, **kwargs)
+                    try:
+                        async for item in items:
+                            yield item
+                    finally:
+                        # Cleans up while the connection is still there
+                        await items.aclose()
+
+        return generator_wrapper
+
+    @wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        transactional_scope = Container().scopes[TRANSACTIONAL_SCOPE]  # noqa
+
+        with transactional_scope.scope:
+            transactional_scope.scope[READ_ONLY] = readonly
+            engine = Container().get_object(AsyncEngine)
+            async with engine.transaction(readonly) as connection:
+                transactional_scope.scope[ASYNC_CONNECTION] = connection
+                return await func(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,131 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, TypeVar, cast
+
+from haps import SINGLETON_SCOPE, base, egg, scope
+
+from seez import settings
+
+T = TypeVar("T")
+
+
+class VersionedCache:
+    """
+    In-process cache of values built from data guarded by a version counter.
+    The current version is loaded at most once per `ttl` seconds, so changes
+    made by other processes are picked up with at most that delay.
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._values: Dict[str, Tuple[int, Any]] = {}
+        self._version: Optional[int] = None
+        self._version_loaded_at = 0.0
+
+    def get_or_load(
+        self, key: str, load_version: Callable[[], int], load: Callable[[], T]
+    ) -> T:
+        version = self.get_version(load_version)
+        with self._lock:
+            cached = self._values.get(key)
+            if cached is not None and cached[0] == version:
+                self.hits += 1
+                return cast(T, cached[1])
+            self.misses += 1
+
+        value = load()
+        with self._lock:
+            self._values[key] = (version, value)
+        return value
+
+    def expire(self) -> None:
+        """Makes the next lookup load the current version"""
+        with self._lock:
+            self._version = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values = {}
+            self._version = None
+            self.hits = 0
+            self.misses = 0
+
+    def get_version(self, load_version: Callable[[], int]) -> int:
+        """Returns the current version, loaded at most once per `ttl` seconds"""
+        now = monotonic()
+        with self._lock:
+            if self._version is not None and now - self._version_loaded_at < self.ttl:
+                return self._version
+
+        version = load_version()
+        with self._lock:
+            self._version = version
+            self._version_loaded_at = now
+        return version
+
+
+class LRUCache:
+    """In-process mapping which forgets the least recently used keys above `maxsize`"""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._lock = Lock()
+        self._values: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            try:
+                self._values.move_to_end(key)
+            except KeyError:
+                return None
+            return self._values[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            if len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+@base
+class CatalogCache(VersionedCache):
+    pass
+
+
+@egg
+@scope(SINGLETON_SCOPE)
+def catalog_cache() -> CatalogCache:
+    return CatalogCache(ttl=settings.CATALOG_CACHE_TTL)
+
+
+@base
+class SubModelPkCache(LRUCache):
+    """
+    Pks of existing submodels by lowercase (make, model, submodel) names. Imports
+    may rename or move submodels, so pks are kept along with the catalog version
+    they were read at, and are misses at any other version.
+    """
+
+    def get_pk(self, key: Hashable, version: int) -> Optional[Any]:
+        cached = self.get(key)
+        if cached is None or cached[0] != version:
+            return None
+        return cached[1]
+
+    def set_pk(self, key: Hashable, version: int, pk: Any) -> None:
+        self.set(key, (version, pk))
+
+
+@egg
+@scope(SINGLETON_SCOPE)
+def submodel_pk_cache() -> SubModelPkCache:
+    return SubModelPkCache(maxsize=settings.SUBMODEL_PK_CACHE_SIZE)
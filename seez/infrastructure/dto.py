@@ -1,5 +1,33 @@
+from copy import deepcopy
+from functools import lru_cache
+from typing import Any, Dict, Type, TypeVar
+
 from pydantic import BaseModel
 
+T = TypeVar("T", bound="DTO")
+
 
 class DTO(BaseModel):
-    pass
+    @classmethod
+    def trusted(cls: Type[T], **values: Any) -> T:
+        """
+        Builds the DTO without validation, from values which already have the field
+        types, e.g. read from typed columns. Unlike `construct` it keeps fields in
+        their declared order, which is the order of keys in JSON.
+        """
+        defaults = _defaults(cls)
+        # Merged into the defaults, so that values take the place of their fields
+        fields = {**defaults, **values}
+        if len(values) < len(defaults):
+            for name in defaults.keys() - values.keys():
+                fields[name] = deepcopy(defaults[name])
+
+        dto = cls.__new__(cls)
+        object.__setattr__(dto, "__dict__", fields)
+        object.__setattr__(dto, "__fields_set__", set(values))
+        return dto
+
+
+@lru_cache(maxsize=None)
+def _defaults(cls: Type[DTO]) -> Dict[str, Any]:
+    return {name: field.default for name, field in cls.__fields__.items()}
@@ -0,0 +1,191 @@
+import csv
+import gzip
+import io
+import json
+import os
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from itertools import chain
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, cast
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+
+import zstandard
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# Suffixes of compressed files tried after the plain file name
+COMPRESSED_SUFFIXES = ("", ".gz", ".zst")
+
+
+class FeedReader(ABC):
+    """Reads rows of a feed file as dicts of strings keyed by column names"""
+
+    def parse_header(self, line: str) -> Optional[List[str]]:
+        """Column names given by the first line, or None when it's already a row"""
+        return None
+
+    @abstractmethod
+    def read_rows(
+        self, lines: Iterable[str], fieldnames: Optional[List[str]]
+    ) -> Iterator[Dict[str, str]]:
+        pass
+
+
+class CsvReader(FeedReader):
+    def parse_header(self, line: str) -> Optional[List[str]]:
+        return next(csv.reader([line]))
+
+    def read_rows(
+        self, lines: Iterable[str], fieldnames: Optional[List[str]]
+    ) -> Iterator[Dict[str, str]]:
+        return csv.DictReader(lines, fieldnames=fieldnames)
+
+
+class NdjsonReader(FeedReader):
+    """
+    Reads a JSON object per line. Values are turned into their CSV text, so rows
+    of both formats are parsed the same way.
+    """
+
+    def read_rows(
+        self, lines: Iterable[str], fieldnames: Optional[List[str]]
+    ) -> Iterator[Dict[str, str]]:
+        for line in lines:
+            if line.strip():
+                row = json.loads(line)
+                yield {key: to_text(value) for key, value in row.items()}
+
+
+def to_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return str(value)
+
+
+READERS: Dict[str, FeedReader] = {"csv": CsvReader(), "ndjson": NdjsonReader()}
+
+
+def read_feed(
+    f: BinaryIO, reader: FeedReader, offset: int = 0
+) -> Iterator[Tuple[Dict[str, str], int]]:
+    """
+    Reads rows of a file opened in binary mode, starting at byte `offset` (or right
+    after the header), along with the byte offset right after each row.
+    """
+    first_line = f.readline()
+    fieldnames = reader.parse_header(first_line.decode())
+    # Without a header, the first line is read again as a row
+    position = 0 if fieldnames is None else len(first_line)
+    unread = [first_line] if fieldnames is None else []
+    if offset > position:
+        _skip(f, offset - position - sum(len(line) for line in unread))
+        position = offset
+        unread = []
+
+    def lines() -> Iterator[str]:
+        nonlocal position
+        for line in chain(unread, f):
+            position += len(line)
+            yield line.decode()
+
+    for row in reader.read_rows(lines(), fieldnames):
+        yield row, position
+
+
+def byte_ranges(
+    path: str, size: int, start: int = 0, header: bool = True
+) -> Iterator[Tuple[int, int]]:
+    """
+    Splits a plain file from `start` (or right after the header) into (start, end)
+    byte ranges of about `size` bytes, each ending at a line end. Values must not
+    contain line breaks.
+    """
+    with open(path, "rb") as f:
+        if header:
+            f.readline()
+        start = max(start, f.tell())
+        file_size = os.fstat(f.fileno()).st_size
+        while start < file_size:
+            f.seek(start + size)
+            f.readline()
+            end = min(f.tell(), file_size)
+            yield start, end
+            start = end
+
+
+def _skip(f: BinaryIO, size: int) -> None:
+    if f.seekable():
+        f.seek(size, io.SEEK_CUR)
+        return
+    while size > 0:
+        data = f.read(min(size, 1 << 20))
+        if not data:
+            break
+        size -= len(data)
+
+
+def locate_feed(location: str, file_name: str) -> Optional[str]:
+    """
+    Finds `file_name`, possibly compressed, in a directory given as a path
+    or a `file://`, `http://` or `https://` URI.
+    """
+    url = urlsplit(location)
+    for suffix in COMPRESSED_SUFFIXES:
+        if url.scheme in ("", "file"):
+            path = os.path.join(url.path, file_name + suffix)
+            if os.path.exists(path):
+                return path
+        else:
+            candidate = location.rstrip("/") + "/" + file_name + suffix
+            try:
+                urlopen(candidate).close()
+            except HTTPError as e:
+                if e.code != 404:
+                    raise
+            else:
+                return candidate
+    return None
+
+
+def is_local(location: str) -> bool:
+    return urlsplit(location).scheme in ("", "file")
+
+
+@contextmanager
+def open_feed(location: str) -> Iterator[BinaryIO]:
+    """
+    Opens a file located by `locate_feed` for reading in binary mode.
+    Gzip and zstd compressed files are detected and decompressed on the fly.
+    """
+    if is_local(location):
+        raw = open(urlsplit(location).path, "rb")
+    else:
+        raw = io.BufferedReader(urlopen(location))
+    try:
+        yield decompressed(raw)
+    finally:
+        raw.close()
+
+
+def decompressed(raw: io.BufferedReader) -> BinaryIO:
+    magic = raw.peek(len(ZSTD_MAGIC))
+    if magic.startswith(GZIP_MAGIC):
+        return cast(BinaryIO, gzip.GzipFile(fileobj=raw))
+    if magic.startswith(ZSTD_MAGIC):
+        reader = zstandard.ZstdDecompressor().stream_reader(raw)
+        return cast(BinaryIO, io.BufferedReader(reader))
+    return cast(BinaryIO, raw)
+
+
+def is_plain_file(location: str) -> bool:
+    """Tells whether the feed is a local uncompressed file, which can be read in parts"""
+    if not is_local(location):
+        return False
+    with open(urlsplit(location).path, "rb") as f:
+        magic = f.read(len(ZSTD_MAGIC))
+    return not magic.startswith((GZIP_MAGIC, ZSTD_MAGIC))
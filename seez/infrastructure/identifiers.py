@@ -0,0 +1,43 @@
+import os
+import time
+from threading import Lock
+from uuid import UUID
+
+_COUNTER_BITS = 12
+_COUNTER_MAX = (1 << _COUNTER_BITS) - 1
+
+_lock = Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7() -> UUID:
+    """
+    Time-ordered UUID (version 7): 48 bits of unix time in milliseconds, a 12 bit
+    counter and 62 random bits. Keys generated later sort after earlier ones, so
+    they are appended to the right of primary key indexes instead of being spread
+    over all of their pages. Within a millisecond the counter keeps keys of one
+    process increasing; when it overflows the time is moved a millisecond forward.
+    """
+    global _last_ms, _counter
+
+    random = int.from_bytes(os.urandom(10), "big")
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms = ms
+            # Starts low in the range, leaving room for keys of the same millisecond
+            _counter = random >> (80 - _COUNTER_BITS + 1)
+        elif _counter < _COUNTER_MAX:
+            _counter += 1
+        else:
+            _last_ms += 1
+            _counter = 0
+        ms, counter = _last_ms, _counter
+
+    value = (ms & 0xFFFFFFFFFFFF) << 80
+    value |= 0x7 << 76
+    value |= counter << 64
+    value |= 0b10 << 62
+    value |= random & 0x3FFFFFFFFFFFFFFF
+    return UUID(int=value)
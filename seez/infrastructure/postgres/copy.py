@@ -0,0 +1,148 @@
+import io
+from contextlib import closing
+from datetime import datetime, tzinfo
+from enum import Enum
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from dateutil import tz
+from sqlalchemy import Table
+from sqlalchemy.orm import Session
+
+from seez.infrastructure.repositories import MergeResult
+
+_ESCAPES = str.maketrans({"\\": "\\\\", "\n": "\\n", "\r": "\\r", "\t": "\\t"})
+
+
+class CopyReader(io.TextIOBase):
+    """File-like object which lets COPY read lines as they are produced"""
+
+    def __init__(self, lines: Iterator[str]) -> None:
+        self._lines = lines
+        self._buffer = ""
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: Optional[int] = -1) -> str:
+        if size is None or size < 0:
+            data = self._buffer + "".join(self._lines)
+            self._buffer = ""
+            return data
+
+        chunks = [self._buffer]
+        length = len(self._buffer)
+        for line in self._lines:
+            chunks.append(line)
+            length += len(line)
+            if length >= size:
+                break
+        data = "".join(chunks)
+        self._buffer = data[size:]
+        return data[:size]
+
+
+def format_value(value: Any, timezone: tzinfo) -> str:
+    """
+    Formats value in COPY text format. Aware datetimes are converted to the session
+    time zone, just like psycopg2 parameters are when written to `timestamp` columns.
+    """
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone).replace(tzinfo=None)
+        return str(value.isoformat(" "))
+    return str(value).translate(_ESCAPES)
+
+
+def format_row(values: List[Any], timezone: tzinfo) -> str:
+    return "\t".join([format_value(value, timezone) for value in values]) + "\n"
+
+
+def copy_rows(
+    session: Session, table: Table, rows: Iterable[Dict[str, Any]], staging: bool = False
+) -> None:
+    """
+    Streams rows (dicts keyed by column names) into the table with `COPY FROM STDIN`.
+    With `staging` rows are copied into a temporary table (which is not WAL-logged)
+    first and moved to the table with a single `INSERT ... SELECT`.
+    """
+    with closing(session.connection().connection.cursor()) as cursor:
+        if not staging:
+            _copy(cursor, table, table.name, rows)
+            return
+
+        staging_table = _copy_to_staging_table(cursor, table, rows)
+        columns = ", ".join(_column_names(table))
+        cursor.execute(
+            f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {staging_table}"
+        )
+        cursor.execute(f"DROP TABLE {staging_table}")
+
+
+def merge_rows(
+    session: Session, table: Table, rows: Iterable[Dict[str, Any]]
+) -> MergeResult:
+    """
+    Upserts rows by `source_id` through a staging table. Existing rows are updated
+    only when their `updated_at` moved forward or `active` changed. Imported rows
+    (with a `source_id`) which are missing from `rows` are deactivated.
+    """
+    column_names = _column_names(table)
+    columns = ", ".join(column_names)
+    updates = ", ".join(
+        f"{name} = EXCLUDED.{name}"
+        for name in column_names
+        if name not in ("pk", "source_id")
+    )
+    with closing(session.connection().connection.cursor()) as cursor:
+        staging_table = _copy_to_staging_table(cursor, table, rows)
+        cursor.execute(f"ANALYZE {staging_table}")
+
+        cursor.execute(
+            f"INSERT INTO {table.name} AS current ({columns}) "
+            f"SELECT {columns} FROM {staging_table} "
+            f"ON CONFLICT (source_id) DO UPDATE SET {updates} "
+            "WHERE current.updated_at < EXCLUDED.updated_at "
+            "OR current.active <> EXCLUDED.active"
+        )
+        upserted = cursor.rowcount
+
+        cursor.execute(
+            f"UPDATE {table.name} SET active = false "
+            "WHERE active AND source_id IS NOT NULL AND NOT EXISTS ("
+            f"SELECT 1 FROM {staging_table} "
+            f"WHERE {staging_table}.source_id = {table.name}.source_id)"
+        )
+        deactivated = cursor.rowcount
+
+        cursor.execute(f"DROP TABLE {staging_table}")
+    return MergeResult(upserted=upserted, deactivated=deactivated)
+
+
+def _column_names(table: Table) -> List[str]:
+    return [column.name for column in table.columns]
+
+
+def _copy_to_staging_table(
+    cursor: Any, table: Table, rows: Iterable[Dict[str, Any]]
+) -> str:
+    staging_table = f"staging_{table.name}"
+    cursor.execute(
+        f"CREATE TEMPORARY TABLE {staging_table} (LIKE {table.name} INCLUDING DEFAULTS)"
+    )
+    _copy(cursor, table, staging_table, rows)
+    return staging_table
+
+
+def _copy(cursor: Any, table: Table, target: str, rows: Iterable[Dict[str, Any]]) -> None:
+    cursor.execute("SHOW TimeZone")
+    timezone = tz.gettz(cursor.fetchone()[0])
+    column_names = _column_names(table)
+    lines = (format_row([row[name] for name in column_names], timezone) for row in rows)
+    columns = ", ".join(column_names)
+    cursor.copy_expert(f"COPY {target} ({columns}) FROM STDIN", CopyReader(lines))
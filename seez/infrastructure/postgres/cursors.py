@@ -0,0 +1,34 @@
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.base import Executable
+from sqlalchemy.sql.elements import ClauseElement, TextClause
+from sqlalchemy.sql.selectable import Select
+
+
+class DeclareCursor(Executable, ClauseElement):
+    """
+    `DECLARE ... CURSOR FOR` a select. Rows of a server-side cursor are read in
+    batches with `fetch_from_cursor` until the end of the transaction, so they don't
+    have to fit in memory. Unlike psycopg2 named cursors it works on async connections.
+    """
+
+    def __init__(self, name: str, select: Select) -> None:
+        self.name = name
+        self.select = select
+
+
+@compiles(DeclareCursor)
+def _compile_declare_cursor(element: DeclareCursor, compiler: Any, **kw: Any) -> str:
+    select = compiler.process(element.select, **kw)
+    return f"DECLARE {element.name} NO SCROLL CURSOR FOR {select}"
+
+
+def fetch_from_cursor(name: str, select: Select, size: int) -> TextClause:
+    # Typed like the columns of the select, so that rows are read the same way
+    return text(f"FETCH {size} FROM {name}").columns(*select.c)
+
+
+def close_cursor(name: str) -> TextClause:
+    return text(f"CLOSE {name}")
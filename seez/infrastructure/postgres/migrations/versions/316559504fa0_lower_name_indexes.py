@@ -0,0 +1,33 @@
+"""lower(name) indexes
+
+Revision ID: 316559504fa0
+Revises: 65395b693bd4
+Create Date: 2026-10-18 11:02:17.530941
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "316559504fa0"
+down_revision = "65395b693bd4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_make_lower_name", "make", [sa.text("lower(name)")])
+    op.create_index(
+        "ix_model_make_pk_lower_name", "model", ["make_pk", sa.text("lower(name)")]
+    )
+    op.create_index(
+        "ix_submodel_model_pk_lower_name",
+        "submodel",
+        ["model_pk", sa.text("lower(name)")],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_submodel_model_pk_lower_name", table_name="submodel")
+    op.drop_index("ix_model_make_pk_lower_name", table_name="model")
+    op.drop_index("ix_make_lower_name", table_name="make")
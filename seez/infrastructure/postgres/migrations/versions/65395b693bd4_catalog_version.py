@@ -0,0 +1,30 @@
+"""catalog version
+
+Revision ID: 65395b693bd4
+Revises: a2421508b2d8
+Create Date: 2026-10-18 10:12:41.208315
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "65395b693bd4"
+down_revision = "a2421508b2d8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    catalog_version = op.create_table(
+        "catalog_version",
+        sa.Column("pk", sa.Integer(), nullable=False),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("pk"),
+    )
+    op.bulk_insert(catalog_version, [{"pk": 1, "version": 0}])
+
+
+def downgrade():
+    op.drop_table("catalog_version")
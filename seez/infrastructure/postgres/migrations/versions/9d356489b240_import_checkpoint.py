@@ -0,0 +1,31 @@
+"""import checkpoint
+
+Revision ID: 9d356489b240
+Revises: f6c56a19a3a0
+Create Date: 2026-10-18 16:09:33.090490
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9d356489b240"
+down_revision = "f6c56a19a3a0"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "import_checkpoint",
+        sa.Column("file_name", sa.Text(), nullable=False),
+        sa.Column("byte_offset", sa.BigInteger(), nullable=False),
+        sa.Column("row_number", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("file_name"),
+    )
+
+
+def downgrade():
+    op.drop_table("import_checkpoint")
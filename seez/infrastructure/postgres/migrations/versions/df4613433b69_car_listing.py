@@ -0,0 +1,83 @@
+"""car listing
+
+Revision ID: df4613433b69
+Revises: 9d356489b240
+Create Date: 2026-10-18 16:24:41.671747
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "df4613433b69"
+down_revision = "9d356489b240"
+branch_labels = None
+depends_on = None
+
+# Cars are listed newest first, optionally within price and mileage ranges
+INDEXES = (
+    ("ix_car_listing_updated_at_pk", ["updated_at DESC", "pk DESC"]),
+    ("ix_car_listing_price", ["price"]),
+    ("ix_car_listing_mileage", ["mileage"]),
+)
+
+
+def upgrade():
+    op.create_table(
+        "car_listing",
+        sa.Column("pk", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("year", sa.Integer(), nullable=False),
+        sa.Column("mileage", sa.Integer(), nullable=True),
+        sa.Column("price", sa.Integer(), nullable=True),
+        sa.Column("exterior_color", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        # Enum types are shared with the car table
+        sa.Column(
+            "body_type",
+            postgresql.ENUM(name="bodytype", create_type=False),
+            nullable=True,
+        ),
+        sa.Column(
+            "transmission",
+            postgresql.ENUM(name="transmission", create_type=False),
+            nullable=True,
+        ),
+        sa.Column(
+            "fuel_type",
+            postgresql.ENUM(name="fueltype", create_type=False),
+            nullable=True,
+        ),
+        sa.Column("submodel_name", sa.Text(), nullable=True),
+        sa.Column("model_name", sa.Text(), nullable=False),
+        sa.Column("make_name", sa.Text(), nullable=False),
+        sa.PrimaryKeyConstraint("pk"),
+    )
+    op.execute(
+        "INSERT INTO car_listing "
+        "SELECT car.pk, car.year, car.mileage, car.price, car.exterior_color, "
+        "car.created_at, car.updated_at, car.body_type, car.transmission, "
+        "car.fuel_type, submodel.name, model.name, make.name "
+        "FROM car "
+        "JOIN submodel ON submodel.pk = car.submodel_pk "
+        "JOIN model ON model.pk = submodel.model_pk "
+        "JOIN make ON make.pk = model.make_pk "
+        "WHERE car.active IS true"
+    )
+    # Built concurrently once the table is filled, so cars can be listed meanwhile
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(
+                name,
+                "car_listing",
+                [sa.text(column) for column in columns],
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade():
+    for name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name="car_listing")
+    op.drop_table("car_listing")
@@ -0,0 +1,29 @@
+"""source ids
+
+Revision ID: f6c56a19a3a0
+Revises: 316559504fa0
+Create Date: 2026-10-18 13:41:09.112377
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "f6c56a19a3a0"
+down_revision = "316559504fa0"
+branch_labels = None
+depends_on = None
+
+TABLES = ("make", "model", "submodel", "car")
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column("source_id", sa.Text(), nullable=True))
+        op.create_unique_constraint(f"{table}_source_id_key", table, ["source_id"])
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_constraint(f"{table}_source_id_key", table, type_="unique")
+        op.drop_column(table, "source_id")
@@ -1,5 +1,20 @@
 from abc import ABC, abstractmethod
-from typing import Any, List
+from typing import Any, List, NamedTuple
+
+
+class MergeResult(NamedTuple):
+    """Number of rows inserted or updated and deactivated by a merge"""
+
+    upserted: int
+    deactivated: int
+
+
+class ImportCheckpoint(NamedTuple):
+    """Byte offset and number of rows of an import file committed so far"""
+
+    file_name: str
+    byte_offset: int
+    row_number: int
 
 
 class ReadOnlyRepository(ABC):
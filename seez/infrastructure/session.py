@@ -1,13 +1,21 @@
-from functools import wraps
-from typing import Any, cast
-
-from haps import Container, base, egg, inject, scope
-from sqlalchemy.engine import create_engine
+import os
+from functools import partial, wraps
+from typing import Any, Dict, cast
+from weakref import WeakSet
+
+from haps import SINGLETON_SCOPE, Container, base, egg, inject, scope
+from scopectx import NotInContextException
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine, create_engine
 from sqlalchemy.orm import Session as SqlSession
 from sqlalchemy.orm import sessionmaker as SqlSessionMaker
 
 from seez import settings
-from seez.infrastructure.scopes import THREAD_SCOPE, TRANSACTIONAL_SCOPE
+from seez.infrastructure.scopes import TRANSACTIONAL_SCOPE
+
+_ENGINES: "WeakSet[Engine]" = WeakSet()
+
+READ_ONLY = "__read_only"
 
 
 @base
@@ -20,33 +28,127 @@ class SessionMaker(SqlSessionMaker):
     pass
 
 
+@base
+class ReadOnlySessionMaker(SqlSessionMaker):
+    pass
+
+
+def create_database_engine(url: str) -> Engine:
+    """
+    Creates an engine configured from settings. There should be only one
+    engine per database in a process, so its pool is shared by all threads.
+    """
+    connect_args: Dict[str, Any] = {}
+    if settings.DATABASE_STATEMENT_TIMEOUT:
+        connect_args["options"] = (
+            f"-c statement_timeout={settings.DATABASE_STATEMENT_TIMEOUT}"
+        )
+
+    engine = create_engine(
+        url,
+        echo=settings.DEBUG,
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE,
+        pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+    _ENGINES.add(engine)
+    return engine
+
+
+def reset_engines_after_fork() -> None:
+    """
+    Gives a forked process (e.g. a gunicorn worker) fresh pools.
+    Connections opened before the fork belong to the parent process,
+    so they are dropped without being closed.
+    """
+    for engine in _ENGINES:
+        engine.pool = engine.pool.recreate()
+
+
+os.register_at_fork(after_in_child=reset_engines_after_fork)
+
+
 @egg
-@scope(THREAD_SCOPE)
+@scope(SINGLETON_SCOPE)
 def sql_alchemy_session_maker() -> SessionMaker:
-    engine = create_engine(settings.DATABASE_URL, echo=settings.DEBUG)
+    engine = create_database_engine(settings.DATABASE_URL)
     session_maker = SqlSessionMaker(expire_on_commit=False, bind=engine)
 
     return cast(SessionMaker, session_maker)
 
 
+@egg
+@scope(SINGLETON_SCOPE)
+@inject
+def sql_alchemy_read_only_session_maker(
+    session_maker: SessionMaker,
+) -> ReadOnlySessionMaker:
+    if settings.DATABASE_REPLICA_URL:
+        engine = create_database_engine(settings.DATABASE_REPLICA_URL)
+    else:
+        engine = session_maker.kw["bind"]
+    read_only_session_maker = SqlSessionMaker(
+        expire_on_commit=False, autoflush=False, bind=engine
+    )
+
+    return cast(ReadOnlySessionMaker, read_only_session_maker)
+
+
 @egg
 @scope(TRANSACTIONAL_SCOPE)
 @inject
-def sql_alchemy_session_factory(session_maker: SessionMaker) -> Session:
-    return cast(Session, session_maker())
+def sql_alchemy_session_factory(
+    session_maker: SessionMaker, read_only_session_maker: ReadOnlySessionMaker
+) -> Session:
+    if not is_read_only_transaction():
+        return cast(Session, session_maker())
+
+    session = read_only_session_maker()
+    event.listen(session, "after_begin", _set_transaction_read_only)
+    return cast(Session, session)
+
+
+def _set_transaction_read_only(
+    session: SqlSession, transaction: Any, connection: Connection
+) -> None:
+    connection.execute("SET TRANSACTION READ ONLY")
+
+
+def is_read_only_transaction() -> bool:
+    transactional_scope = Container().scopes[TRANSACTIONAL_SCOPE]  # noqa
+    try:
+        return bool(transactional_scope.scope[READ_ONLY])
+    except (KeyError, NotInContextException):
+        return False
+
 
+def transactional(func: Any = None, *, readonly: bool = False) -> Any:
+    """
+    Runs decorated function in a new transactional scope and commits the session
+    afterwards. Use `@transactional(readonly=True)` for queries: the transaction is
+    READ ONLY, may go to the replica, never autoflushes and is rolled back.
+    """
+    if func is None:
+        return partial(transactional, readonly=readonly)
 
-def transactional(func: Any) -> Any:
     @wraps(func)
     def wrapper(*args: Any, **kwargs: Any) -> Any:
         transactional_scope = Container().scopes[TRANSACTIONAL_SCOPE]  # noqa
 
         with transactional_scope.scope:
+            transactional_scope.scope[READ_ONLY] = readonly
             session = Container().get_object(Session)
+            if readonly:
+                session.autoflush = False
 
             try:
                 ret = func(*args, **kwargs)
-                session.commit()
+                if not readonly:
+                    session.commit()
+                # Closing the session rolls back what was not committed
                 session.close()
             except Exception:
                 session.close()
@@ -0,0 +1,55 @@
+from datetime import datetime
+from functools import lru_cache
+
+from dateutil import parser
+
+
+def parse_timestamp(value: str) -> datetime:
+    """
+    Parses a timestamp into a naive datetime of its wall time, dropping any UTC
+    offset the way Postgres does for `timestamp` columns. Postgres text format
+    (`2018-11-28 00:07:55.609081+01`) is parsed directly, anything else goes
+    through dateutil.
+    """
+    try:
+        return _parse_postgres_timestamp(value)
+    except (ValueError, IndexError):
+        return _parse_any_timestamp(value)
+
+
+def _parse_postgres_timestamp(value: str) -> datetime:
+    # The offset is only validated, as it isn't stored
+    if value[-3] == ":":
+        offset_start = len(value) - 6
+        offset = value[-5:-3] + value[-2:]
+    else:
+        offset_start = len(value) - 3
+        offset = value[-2:]
+    if value[offset_start] not in "+-" or not offset.isdigit():
+        raise ValueError(value)
+    if value[4] != "-" or value[7] != "-" or value[10] != " ":
+        raise ValueError(value)
+    if value[13] != ":" or value[16] != ":":
+        raise ValueError(value)
+
+    microsecond = 0
+    if offset_start > 19:
+        if value[19] != "." or offset_start > 26:
+            raise ValueError(value)
+        microsecond = int(value[20:offset_start].ljust(6, "0"))
+
+    return datetime(
+        int(value[0:4]),
+        int(value[5:7]),
+        int(value[8:10]),
+        int(value[11:13]),
+        int(value[14:16]),
+        int(value[17:19]),
+        microsecond,
+    )
+
+
+@lru_cache(maxsize=1024)
+def _parse_any_timestamp(value: str) -> datetime:
+    parsed: datetime = parser.parse(value)
+    return parsed.replace(tzinfo=None)
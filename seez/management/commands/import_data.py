@@ -1,131 +1,402 @@
-import csv
-from typing import Any, Dict, Optional
+import argparse
+import io
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from enum import Enum
+from itertools import islice
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
 
-from dateutil import parser
 from haps import Inject
+from psycopg2.errors import UniqueViolation
+from sqlalchemy.exc import IntegrityError
 from tqdm import tqdm
 
+from seez.aliases import MakePk, ModelPk, SourceId, SubModelPk
 from seez.domain.models import Car, Make, Model, SubModel
-from seez.infrastructure.session import transactional
+from seez.domain.normalization import BODY_TYPES, FUEL_TYPES, TRANSMISSIONS, normalize
+from seez.infrastructure.feeds import (
+    READERS,
+    byte_ranges,
+    is_plain_file,
+    locate_feed,
+    open_feed,
+    read_feed,
+)
+from seez.infrastructure.models import AggregateRoot
+from seez.infrastructure.repositories import ImportCheckpoint
+from seez.infrastructure.session import Session, transactional
+from seez.infrastructure.timestamps import parse_timestamp
 from seez.management.commands import ManagementCommand
+from seez.management.exceptions import (
+    FeedAlreadyImported,
+    FeedNotFound,
+    ResumeNotSupported,
+)
 from seez.ports.repositories import (
+    CarListingRepository,
     CarRepository,
+    CatalogVersionRepository,
+    ImportCheckpointRepository,
     MakeRepository,
     ModelRepository,
     SubModelRepository,
 )
 
+T = TypeVar("T")
+
+# Parsed rows with the byte offset of the file right after them
+Batch = Tuple[List[Dict[str, Any]], int]
+
+# Size of a part of the cars file parsed by a single worker task
+RANGE_SIZE = 1 << 20
+
+
+def chunked(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def is_imported_row_conflict(error: Exception) -> bool:
+    """
+    Tells whether a write failed on a row imported before, which has the same
+    source id (or make name) as one of the written rows
+    """
+    violation = getattr(error, "orig", error)
+    if not isinstance(violation, UniqueViolation):
+        return False
+    constraint = violation.diag.constraint_name or ""
+    return constraint.endswith("_source_id_key") or constraint == "make_name_key"
+
+
+_worker_command: Optional["Command"] = None
+
+
+def _init_worker(submodel_pks: Dict[SourceId, SubModelPk]) -> None:
+    global _worker_command
+    _worker_command = Command()
+    _worker_command.submodel_pks = submodel_pks
+
+
+def _parse_cars_range(
+    path: str, format: str, fieldnames: Optional[List[str]], start: int, end: int
+) -> List[Dict[str, Any]]:
+    assert _worker_command is not None
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start).decode()
+    rows = READERS[format].read_rows(io.StringIO(data, newline=""), fieldnames)
+    return [_worker_command._parse_cars_line(row) for row in rows]
+
+
+class ImportMode(str, Enum):
+    ORM = "orm"
+    COPY = "copy"
+    MERGE = "merge"
+
 
 class Command(ManagementCommand):
+    description = "Imports makes, models, submodels and cars from CSV files"
+
+    session: Session = Inject()
     car_repository: CarRepository = Inject()
+    car_listing_repository: CarListingRepository = Inject()
     make_repository: MakeRepository = Inject()
     model_repository: ModelRepository = Inject()
     submodel_repository: SubModelRepository = Inject()
+    catalog_version_repository: CatalogVersionRepository = Inject()
+    import_checkpoint_repository: ImportCheckpointRepository = Inject()
 
     path: str = "/app/data/"
+    format: str = "csv"
+    mode: ImportMode = ImportMode.ORM
+    staging: bool = False
+    chunk_size: int = 10000
+    workers: int = 1
+    resume: bool = False
+
+    def define_args(self, parser: argparse.ArgumentParser) -> None:
+        parser.add_argument(
+            "--path",
+            default=self.path,
+            help=(
+                "directory, file:// or http(s):// URI of makes, models, submodels "
+                "and cars files, which may be gzip or zstd compressed (.gz, .zst)"
+            ),
+        )
+        parser.add_argument(
+            "--format", choices=list(READERS), default=self.format, help="format of files"
+        )
+        parser.add_argument(
+            "--mode",
+            choices=[mode.value for mode in ImportMode],
+            default=self.mode.value,
+            help=(
+                "orm builds entities, copy streams rows with COPY FROM STDIN, "
+                "merge updates rows imported before, adds new and deactivates missing"
+            ),
+        )
+        parser.add_argument(
+            "--staging",
+            action="store_true",
+            help="copy mode only: COPY into a temporary table, then INSERT ... SELECT",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=self.chunk_size,
+            help="orm and copy modes: number of rows written and committed at once",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=self.workers,
+            help="number of processes parsing cars",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="orm and copy modes: continue after the last committed chunk",
+        )
+
+    def init(self, args: List[Any]) -> None:
+        super().init(args)
+        assert self.args is not None
+        self.path = self.args.path
+        self.format = self.args.format
+        self.mode = ImportMode(self.args.mode)
+        self.staging = self.args.staging
+        self.chunk_size = self.args.chunk_size
+        self.workers = self.args.workers
+        self.resume = self.args.resume
+        if self.resume and self.mode == ImportMode.MERGE:
+            raise ResumeNotSupported(self.mode.value)
 
     @transactional
     def handle(self) -> None:
-        self.makes: Dict[str, Make] = {}
-        self.models: Dict[str, Model] = {}
-        self.submodels: Dict[str, SubModel] = {}
-        self.cars: Dict[str, Car] = {}
-
-        self._parse_makes()
-        self._parse_models()
-        self._parse_submodels()
-        self._parse_cars()
-
-    def _parse_makes(self) -> None:
-        with open(self.path + "makes.csv", newline="") as f:
-            read = csv.DictReader(f)
-            self.stdout.write("Importing Makes")
-            for line in tqdm(read):
-                self._parse_make_line(line)
-
-        makes_to_create = list(self.makes.values())
-        self.make_repository.add_batch(makes_to_create)
-
-    def _parse_make_line(self, line: Dict[str, Any]) -> None:
-        id = line["id"]
-        name = line["name"]
-        active = True if line["active"].lower() == "t" else False
-        created_at = parser.parse(line["created_at"])
-        updated_at = parser.parse(line["updated_at"])
-        make = Make(
-            pk=Make.next_pk(),
-            name=name,
-            active=active,
-            created_at=created_at,
-            updated_at=updated_at,
+        self.make_pks: Dict[SourceId, MakePk] = {}
+        self.model_pks: Dict[SourceId, ModelPk] = {}
+        self.submodel_pks: Dict[SourceId, SubModelPk] = {}
+        if not self.resume:
+            self.import_checkpoint_repository.clear()
+        # Makes, models and submodels imported before keep their pks
+        reload_pks = self.mode == ImportMode.MERGE or self.resume
+
+        self.stdout.write("Importing Makes")
+        self._import("makes", self._parse_make_line, self.make_repository, Make)
+        if reload_pks:
+            self.make_pks = self.make_repository.get_pks_by_source_id()
+
+        self.stdout.write("Importing Models")
+        self._import("models", self._parse_model_line, self.model_repository, Model)
+        if reload_pks:
+            self.model_pks = self.model_repository.get_pks_by_source_id()
+
+        self.stdout.write("Importing SubModels")
+        self._import(
+            "submodels",
+            self._parse_submodel_line,
+            self.submodel_repository,
+            SubModel,
         )
-        self.makes[id] = make
+        if reload_pks:
+            self.submodel_pks = self.submodel_repository.get_pks_by_source_id()
+
+        self.stdout.write("Importing Cars")
+        self._import(
+            "cars",
+            self._parse_cars_line,
+            self.car_repository,
+            Car,
+            workers=self.workers,
+            listed=True,
+        )
+
+        if self.mode == ImportMode.MERGE:
+            # Other modes list cars chunk by chunk
+            self.stdout.write("Refreshing cars listing")
+            self.car_listing_repository.refresh()
+        self.catalog_version_repository.bump()
+
+    def _import(
+        self,
+        name: str,
+        parse_line: Callable[[Dict[str, Any]], Dict[str, Any]],
+        repository: Any,
+        entity: Callable[..., AggregateRoot],
+        workers: int = 1,
+        listed: bool = False,
+    ) -> None:
+        """
+        Streams the file as rows keyed by column names, so only pks of makes, models
+        and submodels are kept in memory. Merge mode sends the whole file through
+        a single COPY. Other modes write and commit rows chunk by chunk, saving
+        a checkpoint along with each chunk, and stop with `FeedAlreadyImported`
+        on rows imported before. Rows of `listed` entities (cars) are refreshed
+        in the listing before their chunk is committed, so that what's committed
+        is listed even if the import stops halfway.
+        """
+        file_name = f"{name}.{self.format}"
+        location = locate_feed(self.path, file_name)
+        if location is None:
+            raise FeedNotFound(file_name, self.path)
 
-    def _parse_models(self) -> None:
-        with open(self.path + "models.csv", newline="") as f:
-            read = csv.DictReader(f)
-            self.stdout.write("Importing Models")
-            for line in tqdm(read):
-                self._parse_model_line(line)
+        reader = READERS[self.format]
+        if self.mode == ImportMode.MERGE:
+            with open_feed(location) as f:
+                read = tqdm(read_feed(f, reader))
+                result = repository.merge_batch(parse_line(row) for row, _ in read)
+            self.stdout.write(
+                f"{result.upserted} added or updated, {result.deactivated} deactivated"
+            )
+            return
 
-        models_to_create = list(self.models.values())
-        self.model_repository.add_batch(models_to_create)
+        checkpoint = self._get_checkpoint(file_name)
+        if workers > 1 and not is_plain_file(location):
+            self.stdout.write("Parsing in one process, workers need a local plain file")
+            workers = 1
+        if workers > 1:
+            batches = self._parse_cars_in_workers(
+                location, workers, checkpoint.byte_offset
+            )
+        else:
+            batches = self._parse_in_chunks(location, parse_line, checkpoint.byte_offset)
 
-    def _parse_model_line(self, line: Dict[str, Any]) -> None:
+        with tqdm(initial=checkpoint.row_number) as progress:
+            for rows, byte_offset in batches:
+                try:
+                    if self.mode == ImportMode.COPY:
+                        repository.copy_batch(rows, staging=self.staging)
+                    else:
+                        repository.add_batch([entity(**row) for row in rows])
+                except (IntegrityError, UniqueViolation) as error:
+                    if is_imported_row_conflict(error):
+                        raise FeedAlreadyImported(file_name) from error
+                    raise
+                if listed:
+                    self.car_listing_repository.refresh([row["pk"] for row in rows])
+                checkpoint = ImportCheckpoint(
+                    file_name, byte_offset, checkpoint.row_number + len(rows)
+                )
+                self.import_checkpoint_repository.save(checkpoint)
+                self.session.commit()
+                progress.update(len(rows))
+
+    def _get_checkpoint(self, file_name: str) -> ImportCheckpoint:
+        if self.resume:
+            checkpoint = self.import_checkpoint_repository.get(file_name)
+            if checkpoint is not None:
+                self.stdout.write(f"Resuming after row {checkpoint.row_number}")
+                return checkpoint
+        return ImportCheckpoint(file_name, byte_offset=0, row_number=0)
+
+    def _parse_in_chunks(
+        self,
+        location: str,
+        parse_line: Callable[[Dict[str, Any]], Dict[str, Any]],
+        byte_offset: int,
+    ) -> Iterator[Batch]:
+        reader = READERS[self.format]
+        with open_feed(location) as f:
+            for chunk in chunked(read_feed(f, reader, byte_offset), self.chunk_size):
+                yield [parse_line(row) for row, _ in chunk], chunk[-1][1]
+
+    def _parse_cars_in_workers(
+        self, path: str, workers: int, byte_offset: int
+    ) -> Iterator[Batch]:
+        """
+        Parses byte ranges of the cars file in a process pool. Ranges are yielded
+        in file order, with at most two per worker parsed ahead of the writer.
+        """
+        with open(path, "rb") as f:
+            fieldnames = READERS[self.format].parse_header(f.readline().decode())
+
+        with ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=(self.submodel_pks,)
+        ) as executor:
+            pending: Deque[Tuple["Future[List[Dict[str, Any]]]", int]] = deque()
+            ranges = byte_ranges(path, RANGE_SIZE, byte_offset, fieldnames is not None)
+            for start, end in ranges:
+                future = executor.submit(
+                    _parse_cars_range, path, self.format, fieldnames, start, end
+                )
+                pending.append((future, end))
+                if len(pending) > workers * 2:
+                    future, end = pending.popleft()
+                    yield future.result(), end
+            while pending:
+                future, end = pending.popleft()
+                yield future.result(), end
+
+    def _parse_make_line(self, line: Dict[str, Any]) -> Dict[str, Any]:
         id = line["id"]
         name = line["name"]
         active = True if line["active"].lower() == "t" else False
-        make_id = line["make_id"]
-        created_at = line["created_at"]
-        updated_at = line["updated_at"]
-        model = Model(
-            pk=Model.next_pk(),
-            name=name,
-            active=active,
-            make_pk=self.makes[make_id].pk,
-            created_at=created_at,
-            updated_at=updated_at,
-        )
-        self.models[id] = model
-
-    def _parse_submodels(self) -> None:
-        with open(self.path + "submodels.csv", newline="") as f:
-            read = csv.DictReader(f)
-            self.stdout.write("Importing SubModels")
-            for line in tqdm(read):
-                self._parse_submodel_line(line)
+        created_at = parse_timestamp(line["created_at"])
+        updated_at = parse_timestamp(line["updated_at"])
+        pk = Make.next_pk()
+        self.make_pks[id] = pk
+        return {
+            "pk": pk,
+            "name": name,
+            "active": active,
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "source_id": id,
+        }
 
-        submodels_to_create = list(self.submodels.values())
-        self.submodel_repository.add_batch(submodels_to_create)
+    def _parse_model_line(self, line: Dict[str, Any]) -> Dict[str, Any]:
+        id = line["id"]
+        name = line["name"]
+        active = True if line["active"].lower() == "t" else False
+        make_id = line["make_id"]
+        created_at = parse_timestamp(line["created_at"])
+        updated_at = parse_timestamp(line["updated_at"])
+        pk = Model.next_pk()
+        self.model_pks[id] = pk
+        return {
+            "pk": pk,
+            "name": name,
+            "active": active,
+            "make_pk": self.make_pks[make_id],
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "source_id": id,
+        }
 
-    def _parse_submodel_line(self, line: Dict[str, Any]) -> None:
+    def _parse_submodel_line(self, line: Dict[str, Any]) -> Dict[str, Any]:
         id = line["id"]
         name = line["name"]
         active = True if line["active"].lower() == "t" else False
         model_id = line["model_id"]
-        created_at = line["created_at"]
-        updated_at = line["updated_at"]
-        submodel = SubModel(
-            pk=SubModel.next_pk(),
-            name=name,
-            active=active,
-            model_pk=self.models[model_id].pk,
-            created_at=created_at,
-            updated_at=updated_at,
-        )
-        self.submodels[id] = submodel
-
-    def _parse_cars(self) -> None:
-        with open(self.path + "cars.csv", newline="") as f:
-            read = csv.DictReader(f)
-            self.stdout.write("Importing SubModels")
-            for line in tqdm(read):
-                self._parse_cars_line(line)
-
-        cars_to_create = list(self.cars.values())
-        self.car_repository.add_batch(cars_to_create)
+        created_at = parse_timestamp(line["created_at"])
+        updated_at = parse_timestamp(line["updated_at"])
+        pk = SubModel.next_pk()
+        self.submodel_pks[id] = pk
+        return {
+            "pk": pk,
+            "name": name,
+            "active": active,
+            "model_pk": self.model_pks[model_id],
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "source_id": id,
+        }
 
-    def _parse_cars_line(self, line: Dict[str, Any]) -> None:
+    def _parse_cars_line(self, line: Dict[str, Any]) -> Dict[str, Any]:
         id = line["id"]
         active = True if line["active"].lower() == "t" else False
         year = line["year"]
@@ -144,67 +415,25 @@ class Command(ManagementCommand):
         except ValueError:
             price = None
         exterior_color = line["exterior_color"]
-        created_at = line["created_at"]
-        updated_at = line["updated_at"]
+        created_at = parse_timestamp(line["created_at"])
+        updated_at = parse_timestamp(line["updated_at"])
         submodel_id = line["submodel_id"]
-        body_type_str = line["body_type"]
-        body_type = self._str_to_body_type(body_type_str)
-
-        transmission_str = line["transmission"]
-        transmission = self._str_to_transmission(transmission_str)
-
-        fuel_type_str = line["fuel_type"]
-        fuel_type = self._str_to_fuel_type(fuel_type_str)
-
-        car = Car(
-            pk=Car.next_pk(),
-            active=active,
-            year=year,
-            mileage=mileage,
-            price=price,
-            exterior_color=exterior_color,
-            created_at=created_at,
-            updated_at=updated_at,
-            submodel_pk=self.submodels[submodel_id].pk,
-            body_type=body_type,
-            transmission=transmission,
-            fuel_type=fuel_type,
-        )
-        self.cars[id] = car
-
-    def _str_to_body_type(self, s: str) -> Car.BodyType:
-        m = {
-            "coupe": Car.BodyType.COUPE,
-            "sedan": Car.BodyType.SEDAN,
-            "suv": Car.BodyType.SUV,
-            "hatchback": Car.BodyType.HATCHBACK,
-            "convertible": Car.BodyType.CONVERTIBLE,
-            "van": Car.BodyType.VAN,
-            "sports": Car.BodyType.SPORTS,
-            "truck": Car.BodyType.TRUCK,
-            "wagon": Car.BodyType.WAGON,
-            "luxury": Car.BodyType.LUXURY,
-        }
-        s = s.lower()
-        body_type = m.get(s)
-        return body_type
-
-    def _str_to_transmission(self, s: str) -> Car.Transmission:
-        m = {
-            "automatic": Car.Transmission.AUTOMATIC,
-            "manual": Car.Transmission.MANUAL,
-        }
-        s = s.lower()
-        transmission = m.get(s)
-        return transmission
-
-    def _str_to_fuel_type(self, s: str) -> Car.FuelType:
-        m = {
-            "petrol": Car.FuelType.PETROL,
-            "hybrid": Car.FuelType.HYBRID,
-            "diesel": Car.FuelType.DIESEL,
-            "electricity": Car.FuelType.ELECTRICITY,
+        body_type = normalize(BODY_TYPES, line["body_type"])
+        transmission = normalize(TRANSMISSIONS, line["transmission"])
+        fuel_type = normalize(FUEL_TYPES, line["fuel_type"])
+
+        return {
+            "pk": Car.next_pk(),
+            "active": active,
+            "year": year,
+            "mileage": mileage,
+            "price": price,
+            "exterior_color": exterior_color,
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "submodel_pk": self.submodel_pks[submodel_id],
+            "body_type": body_type,
+            "transmission": transmission,
+            "fuel_type": fuel_type,
+            "source_id": id,
         }
-        s = s.lower()
-        fuel_type = m.get(s)
-        return fuel_type
@@ -1,2 +1,17 @@
 class BaseCommandException(Exception):
     msg_template: str
+
+
+class ResumeNotSupported(BaseCommandException):
+    msg_template = "--resume is not supported in {} mode"
+
+
+class FeedNotFound(BaseCommandException):
+    msg_template = "{} not found in {}"
+
+
+class FeedAlreadyImported(BaseCommandException):
+    msg_template = (
+        "{} was imported already, continue an interrupted import with --resume "
+        "or update the imported rows with --mode merge"
+    )
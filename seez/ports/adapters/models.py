@@ -1,10 +1,22 @@
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, Enum, ForeignKey, Integer, Table, Text
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Index,
+    Integer,
+    Table,
+    Text,
+    func,
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import mapper, relationship
 
-from seez.domain.models import Car, Make, Model, SubModel
+from seez.domain.models import Car, CarListing, Make, Model, SubModel
 from seez.infrastructure.postgres import METADATA
 
 CAR_TABLE = Table(
@@ -28,6 +40,7 @@ CAR_TABLE = Table(
     Column("body_type", Enum(Car.BodyType), key="_body_type", nullable=True),
     Column("transmission", Enum(Car.Transmission), key="_transmission", nullable=True),
     Column("fuel_type", Enum(Car.FuelType), key="_fuel_type", nullable=True),
+    Column("source_id", Text, nullable=True, unique=True),
 )
 
 MAKE_TABLE = Table(
@@ -38,6 +51,7 @@ MAKE_TABLE = Table(
     Column("active", Boolean, nullable=False, default=True, index=True),
     Column("created_at", DateTime, nullable=False, default=datetime.utcnow),
     Column("updated_at", DateTime, nullable=False, default=datetime.utcnow),
+    Column("source_id", Text, nullable=True, unique=True),
 )
 
 MODEL_TABLE = Table(
@@ -51,6 +65,7 @@ MODEL_TABLE = Table(
     ),
     Column("created_at", DateTime, nullable=False, default=datetime.utcnow),
     Column("updated_at", DateTime, nullable=False, default=datetime.utcnow),
+    Column("source_id", Text, nullable=True, unique=True),
 )
 
 SUBMODEL_TABLE = Table(
@@ -64,9 +79,68 @@ SUBMODEL_TABLE = Table(
     ),
     Column("created_at", DateTime, nullable=False, default=datetime.utcnow),
     Column("updated_at", DateTime, nullable=False, default=datetime.utcnow),
+    Column("source_id", Text, nullable=True, unique=True),
+)
+
+# Names are looked up case insensitively
+Index("ix_make_lower_name", func.lower(MAKE_TABLE.c.name))
+Index(
+    "ix_model_make_pk_lower_name", MODEL_TABLE.c.make_pk, func.lower(MODEL_TABLE.c.name)
+)
+Index(
+    "ix_submodel_model_pk_lower_name",
+    SUBMODEL_TABLE.c.model_pk,
+    func.lower(SUBMODEL_TABLE.c.name),
+)
+
+# Denormalized active cars with their names, which serves the listing from one table
+CAR_LISTING_TABLE = Table(
+    "car_listing",
+    METADATA,
+    Column("pk", UUID(as_uuid=True), primary_key=True),
+    Column("year", Integer, nullable=False),
+    Column("mileage", Integer, nullable=True),
+    Column("price", Integer, nullable=True),
+    Column("exterior_color", Text, nullable=True),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+    Column("body_type", Enum(Car.BodyType), nullable=True),
+    Column("transmission", Enum(Car.Transmission), nullable=True),
+    Column("fuel_type", Enum(Car.FuelType), nullable=True),
+    Column("submodel_name", Text, nullable=True),
+    Column("model_name", Text, nullable=False),
+    Column("make_name", Text, nullable=False),
+)
+
+# Cars are listed newest first, optionally within price and mileage ranges
+Index(
+    "ix_car_listing_updated_at_pk",
+    CAR_LISTING_TABLE.c.updated_at.desc(),
+    CAR_LISTING_TABLE.c.pk.desc(),
+)
+Index("ix_car_listing_price", CAR_LISTING_TABLE.c.price)
+Index("ix_car_listing_mileage", CAR_LISTING_TABLE.c.mileage)
+
+# Single row table, bumped whenever makes, models or submodels change
+CATALOG_VERSION_TABLE = Table(
+    "catalog_version",
+    METADATA,
+    Column("pk", Integer, primary_key=True),
+    Column("version", BigInteger, nullable=False, default=0),
+)
+
+# Position up to which each file of the last import was committed
+IMPORT_CHECKPOINT_TABLE = Table(
+    "import_checkpoint",
+    METADATA,
+    Column("file_name", Text, primary_key=True),
+    Column("byte_offset", BigInteger, nullable=False),
+    Column("row_number", BigInteger, nullable=False),
+    Column("updated_at", DateTime, nullable=False, default=datetime.utcnow),
 )
 
 mapper(Car, CAR_TABLE, properties={"_submodel": relationship(SubModel)})
 mapper(Make, MAKE_TABLE)
 mapper(Model, MODEL_TABLE, properties={"_make": relationship(Make)})
 mapper(SubModel, SUBMODEL_TABLE, properties={"_model": relationship(Model)})
+mapper(CarListing, CAR_LISTING_TABLE)
@@ -1,9 +1,23 @@
-from typing import Any, Dict, List, Optional, cast
+from datetime import datetime
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 from haps import Inject, egg
-from sqlalchemy import desc, func
-from sqlalchemy.sql.operators import is_
-from sqlalchemy_filters import apply_filters, apply_pagination
+from sqlalchemy import and_, desc, exists, func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Query
+from sqlalchemy.orm.instrumentation import manager_of_class
+from sqlalchemy.sql.operators import is_, isnot
+from sqlalchemy_filters import apply_filters
 
 from seez.aliases import (
     CarPk,
@@ -11,19 +25,37 @@ from seez.aliases import (
     MakePk,
     ModelName,
     ModelPk,
+    SourceId,
     SubModelName,
     SubModelPk,
 )
+from seez.domain.cursors import CarCursor
 from seez.domain.exceptions import (
     CarDoesNotExist,
     MakeDoesNotExist,
     ModelDoesNotExist,
     SubModelDoesNotExist,
 )
-from seez.domain.models import Car, Make, Model, SubModel
+from seez.domain.models import Car, CarListing, Make, Model, SubModel
+from seez.infrastructure.async_session import AsyncConnection
+from seez.infrastructure.postgres.copy import copy_rows, merge_rows
+from seez.infrastructure.repositories import ImportCheckpoint, MergeResult
 from seez.infrastructure.session import Session
+from seez.ports.adapters.models import (
+    CAR_LISTING_TABLE,
+    CAR_TABLE,
+    CATALOG_VERSION_TABLE,
+    IMPORT_CHECKPOINT_TABLE,
+    MAKE_TABLE,
+    MODEL_TABLE,
+    SUBMODEL_TABLE,
+)
 from seez.ports.repositories import (
+    AsyncCarListingRepository,
+    CarListingRepository,
     CarRepository,
+    CatalogVersionRepository,
+    ImportCheckpointRepository,
     MakeRepository,
     ModelRepository,
     SubModelRepository,
@@ -31,6 +63,84 @@ from seez.ports.repositories import (
 )
 
 
+def prepare_filters(
+    price_min: Optional[int],
+    price_max: Optional[int],
+    mileage_min: Optional[int],
+    mileage_max: Optional[int],
+) -> List[Dict[Any, Any]]:
+    filter_spec = []
+    if price_min is not None:
+        filter_spec.append({"field": "price", "op": ">=", "value": price_min})
+    if price_max is not None:
+        filter_spec.append({"field": "price", "op": "<=", "value": price_max})
+    if mileage_min is not None:
+        filter_spec.append({"field": "mileage", "op": ">=", "value": mileage_min})
+    if mileage_max is not None:
+        filter_spec.append({"field": "mileage", "op": "<=", "value": mileage_max})
+    return filter_spec
+
+
+def listing_query(
+    query: Query,
+    price_min: Optional[int],
+    price_max: Optional[int],
+    mileage_min: Optional[int],
+    mileage_max: Optional[int],
+) -> Query:
+    query = query.order_by(desc(CarListing.updated_at), desc(CarListing.pk))
+    filter_spec = prepare_filters(price_min, price_max, mileage_min, mileage_max)
+    return apply_filters(query, filter_spec, do_auto_join=False)
+
+
+def listing_page_query(
+    query: Query,
+    page_number: int,
+    page_size: int,
+    price_min: Optional[int],
+    price_max: Optional[int],
+    mileage_min: Optional[int],
+    mileage_max: Optional[int],
+) -> Query:
+    query = listing_query(query, price_min, price_max, mileage_min, mileage_max)
+    return query.offset((page_number - 1) * page_size).limit(page_size)
+
+
+def listing_after_query(
+    query: Query,
+    cursor: Optional[CarCursor],
+    page_size: int,
+    price_min: Optional[int],
+    price_max: Optional[int],
+    mileage_min: Optional[int],
+    mileage_max: Optional[int],
+) -> Query:
+    query = listing_query(query, price_min, price_max, mileage_min, mileage_max)
+    if cursor is not None:
+        query = query.filter(
+            tuple_(CarListing.updated_at, CarListing.pk) < (cursor.updated_at, cursor.pk)
+        )
+    return query.limit(page_size)
+
+
+def listing_columns_query(columns: Optional[Sequence[str]]) -> Query:
+    """Query of whole listings, or of only the given columns of them"""
+    if columns is None:
+        return Query(CarListing)
+    return Query([getattr(CarListing, column) for column in columns])
+
+
+def listing_from_row(row: Mapping[str, Any]) -> CarListing:
+    """
+    Builds a listing the way the ORM loads rows, with values put straight into the
+    instance dict. Going through `__init__` fires an attribute event per column,
+    which takes longer than reading the row.
+    """
+    car: CarListing = manager_of_class(CarListing).new_instance()
+    car.__dict__.update(row)
+    return car
+
+
 @egg
 class SqlAlchemyCarRepository(CarRepository):
     session: Session = Inject()
@@ -42,7 +152,81 @@ class SqlAlchemyCarRepository(CarRepository):
     def get_all(self) -> List[Car]:
         return list(self.session.query(Car).all())
 
-    def get_active_paged(
+    def add(self, car: Car) -> None:
+        self.session.add(car)
+        self.session.flush()
+
+    def add_batch(self, cars: List[Car]) -> None:
+        self.session.bulk_save_objects(cars)
+
+    def copy_batch(self, rows: Iterable[Dict[str, Any]], staging: bool = False) -> None:
+        copy_rows(self.session, CAR_TABLE, rows, staging)
+
+    def merge_batch(self, rows: Iterable[Dict[str, Any]]) -> MergeResult:
+        return merge_rows(self.session, CAR_TABLE, rows)
+
+
+@egg
+class SqlAlchemyCarListingRepository(CarListingRepository):
+    session: Session = Inject()
+
+    def refresh(self, pks: Optional[List[CarPk]] = None) -> None:
+        if pks is not None and not pks:
+            return
+
+        car = CAR_TABLE.c
+        listed = (
+            select(
+                [
+                    car.pk,
+                    car.year,
+                    car.mileage,
+                    car.price,
+                    car.exterior_color,
+                    car.created_at,
+                    car.updated_at,
+                    car._body_type,
+                    car._transmission,
+                    car._fuel_type,
+                    SUBMODEL_TABLE.c.name,
+                    MODEL_TABLE.c.name,
+                    MAKE_TABLE.c.name,
+                ]
+            )
+            .select_from(
+                CAR_TABLE.join(SUBMODEL_TABLE).join(MODEL_TABLE).join(MAKE_TABLE)
+            )
+            .where(is_(car.active, True))
+        )
+        stale = CAR_LISTING_TABLE.delete().where(
+            ~exists().where(and_(car.pk == CAR_LISTING_TABLE.c.pk, is_(car.active, True)))
+        )
+        if pks is not None:
+            listed = listed.where(car.pk.in_(pks))
+            stale = stale.where(CAR_LISTING_TABLE.c.pk.in_(pks))
+
+        upsert = insert(CAR_LISTING_TABLE).from_select(
+            [column.name for column in CAR_LISTING_TABLE.columns], listed
+        )
+        # Rows which did not change are left alone, so that they are not rewritten
+        columns = [
+            column for column in CAR_LISTING_TABLE.columns if not column.primary_key
+        ]
+        excluded = [upsert.excluded[column.name] for column in columns]
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[CAR_LISTING_TABLE.c.pk],
+            set_=dict(zip([column.name for column in columns], excluded)),
+            where=tuple_(*columns).is_distinct_from(tuple_(*excluded)),
+        )
+        self.session.execute(upsert)
+        self.session.execute(stale)
+
+
+@egg
+class AsyncSqlAlchemyCarListingRepository(AsyncCarListingRepository):
+    connection: AsyncConnection = Inject()
+
+    async def get_active_paged(
         self,
         page_number: int = 1,
         page_size: int = 20,
@@ -50,47 +234,48 @@ class SqlAlchemyCarRepository(CarRepository):
         price_max: Optional[int] = None,
         mileage_min: Optional[int] = None,
         mileage_max: Optional[int] = None,
-    ) -> List[Car]:
-        active_cars_q = (
-            self.session.query(Car)
-            .filter(is_(Car.active, True))
-            .order_by(desc(Car.updated_at))
+        columns: Optional[Sequence[str]] = None,
+    ) -> List[CarListing]:
+        query = listing_page_query(
+            listing_columns_query(columns),
+            page_number,
+            page_size,
+            price_min,
+            price_max,
+            mileage_min,
+            mileage_max,
         )
+        rows = await self.connection.fetch_all(query.statement)
+        return [listing_from_row(row) for row in rows]
 
-        filter_spec = self._prepare_filters(
-            price_min, price_max, mileage_min, mileage_max
-        )
-        filtered_q = apply_filters(active_cars_q, filter_spec, do_auto_join=False)
-
-        query, pagination = apply_pagination(
-            filtered_q, page_number=page_number, page_size=page_size
-        )
-        return cast(List[Car], query.all())
-
-    def _prepare_filters(
+    async def get_active_after(
         self,
-        price_min: Optional[int],
-        price_max: Optional[int],
-        mileage_min: Optional[int],
-        mileage_max: Optional[int],
-    ) -> List[Dict[Any, Any]]:
-        filter_spec = []
-        if price_min is not None:
-            filter_spec.append({"field": "price", "op": ">=", "value": price_min})
-        if price_max is not None:
-            filter_spec.append({"field": "price", "op": "<=", "value": price_max})
-        if mileage_min is not None:
-            filter_spec.append({"field": "mileage", "op": ">=", "value": mileage_min})
-        if mileage_max is not None:
-            filter_spec.append({"field": "mileage", "op": "<=", "value": mileage_max})
-        return filter_spec
-
-    def add(self, car: Car) -> None:
-        self.session.add(car)
-        self.session.flush()
+        cursor: Optional[CarCursor] = None,
+        page_size: int = 20,
+        price_min: Optional[int] = None,
+        price_max: Optional[int] = None,
+        mileage_min: Optional[int] = None,
+        mileage_max: Optional[int] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> List[CarListing]:
+        query = listing_after_query(
+            listing_columns_query(columns),
+            cursor,
+            page_size,
+            price_min,
+            price_max,
+            mileage_min,
+            mileage_max,
+        )
+        rows = await self.connection.fetch_all(query.statement)
+        return [listing_from_row(row) for row in rows]
 
-    def add_batch(self, cars: List[Car]) -> None:
-        self.session.bulk_save_objects(cars)
+    async def stream_active(
+        self, batch_size: int = 1000
+    ) -> AsyncIterator[List[CarListing]]:
+        query = listing_query(Query(CarListing), None, None, None, None)
+        async for rows in self.connection.stream(query.statement, batch_size):
+            yield [listing_from_row(row) for row in rows]
 
 
 @egg
@@ -115,6 +300,16 @@ class SqlAlchemyMakeRepository(MakeRepository):
             .one()
         )
 
+    def get_by_names(self, names: List[MakeName]) -> List[Make]:
+        if not names:
+            return []
+        lower_names = {name.lower() for name in names}
+        return list(
+            self.session.query(Make)
+            .filter(func.lower(Make.name).in_(list(lower_names)))
+            .all()
+        )
+
     def add(self, make: Make) -> None:
         self.session.add(make)
         self.session.flush()
@@ -122,6 +317,18 @@ class SqlAlchemyMakeRepository(MakeRepository):
     def add_batch(self, makes: List[Make]) -> None:
         self.session.bulk_save_objects(makes)
 
+    def copy_batch(self, rows: Iterable[Dict[str, Any]], staging: bool = False) -> None:
+        copy_rows(self.session, MAKE_TABLE, rows, staging)
+
+    def merge_batch(self, rows: Iterable[Dict[str, Any]]) -> MergeResult:
+        return merge_rows(self.session, MAKE_TABLE, rows)
+
+    def get_pks_by_source_id(self) -> Dict[SourceId, MakePk]:
+        pks = self.session.query(Make.source_id, Make.pk).filter(
+            isnot(Make.source_id, None)
+        )
+        return dict(pks.all())
+
 
 @egg
 class SqlAlchemyModelRepository(ModelRepository):
@@ -146,6 +353,18 @@ class SqlAlchemyModelRepository(ModelRepository):
             .first()
         )
 
+    def get_by_names_and_make_pks(
+        self, keys: List[Tuple[ModelName, MakePk]]
+    ) -> List[Model]:
+        if not keys:
+            return []
+        lower_keys = {(make_pk, name.lower()) for name, make_pk in keys}
+        return list(
+            self.session.query(Model)
+            .filter(tuple_(Model.make_pk, func.lower(Model.name)).in_(list(lower_keys)))
+            .all()
+        )
+
     def add(self, model: Model) -> None:
         self.session.add(model)
         self.session.flush()
@@ -153,6 +372,18 @@ class SqlAlchemyModelRepository(ModelRepository):
     def add_batch(self, models: List[Model]) -> None:
         self.session.bulk_save_objects(models)
 
+    def copy_batch(self, rows: Iterable[Dict[str, Any]], staging: bool = False) -> None:
+        copy_rows(self.session, MODEL_TABLE, rows, staging)
+
+    def merge_batch(self, rows: Iterable[Dict[str, Any]]) -> MergeResult:
+        return merge_rows(self.session, MODEL_TABLE, rows)
+
+    def get_pks_by_source_id(self) -> Dict[SourceId, ModelPk]:
+        pks = self.session.query(Model.source_id, Model.pk).filter(
+            isnot(Model.source_id, None)
+        )
+        return dict(pks.all())
+
 
 @egg
 class SqlAlchemySubModelRepository(SubModelRepository):
@@ -181,9 +412,88 @@ class SqlAlchemySubModelRepository(SubModelRepository):
             .first()
         )
 
+    def get_by_names_and_model_pks(
+        self, keys: List[Tuple[SubModelName, ModelPk]]
+    ) -> List[SubModel]:
+        if not keys:
+            return []
+        lower_keys = {(model_pk, name.lower()) for name, model_pk in keys}
+        return list(
+            self.session.query(SubModel)
+            .filter(
+                tuple_(SubModel.model_pk, func.lower(SubModel.name)).in_(list(lower_keys))
+            )
+            .all()
+        )
+
     def add(self, submodel: SubModel) -> None:
         self.session.add(submodel)
         self.session.flush()
 
     def add_batch(self, submodels: List[SubModel]) -> None:
         self.session.bulk_save_objects(submodels)
+
+    def copy_batch(self, rows: Iterable[Dict[str, Any]], staging: bool = False) -> None:
+        copy_rows(self.session, SUBMODEL_TABLE, rows, staging)
+
+    def merge_batch(self, rows: Iterable[Dict[str, Any]]) -> MergeResult:
+        return merge_rows(self.session, SUBMODEL_TABLE, rows)
+
+    def get_pks_by_source_id(self) -> Dict[SourceId, SubModelPk]:
+        pks = self.session.query(SubModel.source_id, SubModel.pk).filter(
+            isnot(SubModel.source_id, None)
+        )
+        return dict(pks.all())
+
+
+@egg
+class SqlAlchemyCatalogVersionRepository(CatalogVersionRepository):
+    session: Session = Inject()
+
+    def get(self) -> int:
+        version = self.session.execute(
+            select([CATALOG_VERSION_TABLE.c.version]).where(
+                CATALOG_VERSION_TABLE.c.pk == 1
+            )
+        ).scalar()
+        return version or 0
+
+    def bump(self) -> None:
+        self.session.execute(
+            insert(CATALOG_VERSION_TABLE)
+            .values(pk=1, version=1)
+            .on_conflict_do_update(
+                index_elements=[CATALOG_VERSION_TABLE.c.pk],
+                set_={"version": CATALOG_VERSION_TABLE.c.version + 1},
+            )
+        )
+
+
+@egg
+class SqlAlchemyImportCheckpointRepository(ImportCheckpointRepository):
+    session: Session = Inject()
+
+    def get(self, file_name: str) -> Optional[ImportCheckpoint]:
+        row = self.session.execute(
+            select(
+                [
+                    IMPORT_CHECKPOINT_TABLE.c.file_name,
+                    IMPORT_CHECKPOINT_TABLE.c.byte_offset,
+                    IMPORT_CHECKPOINT_TABLE.c.row_number,
+                ]
+            ).where(IMPORT_CHECKPOINT_TABLE.c.file_name == file_name)
+        ).first()
+        return ImportCheckpoint(*row) if row is not None else None
+
+    def save(self, checkpoint: ImportCheckpoint) -> None:
+        values = {**checkpoint._asdict(), "updated_at": datetime.utcnow()}
+        self.session.execute(
+            insert(IMPORT_CHECKPOINT_TABLE)
+            .values(**values)
+            .on_conflict_do_update(
+                index_elements=[IMPORT_CHECKPOINT_TABLE.c.file_name], set_=values
+            )
+        )
+
+    def clear(self) -> None:
+        self.session.execute(IMPORT_CHECKPOINT_TABLE.delete())
@@ -1,5 +1,15 @@
-from abc import abstractmethod
-from typing import Any, Dict, List, Optional, Type
+from abc import ABC, abstractmethod
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+)
 
 from haps import base
 from sqlalchemy.orm.exc import NoResultFound
@@ -10,12 +20,18 @@ from seez.aliases import (
     MakePk,
     ModelName,
     ModelPk,
+    SourceId,
     SubModelName,
     SubModelPk,
 )
-from seez.domain.models import Car, Make, Model, SubModel
+from seez.domain.cursors import CarCursor
+from seez.domain.models import Car, CarListing, Make, Model, SubModel
 from seez.infrastructure.exceptions import DoesNotExistError
-from seez.infrastructure.repositories import Repository
+from seez.infrastructure.repositories import (
+    ImportCheckpoint,
+    MergeResult,
+    Repository,
+)
 
 
 def does_not_exist_error(exc: Optional[Type[Exception]] = None) -> Any:
@@ -50,23 +66,78 @@ class CarRepository(Repository):
         pass
 
     @abstractmethod
-    def get_active_paged(
+    def add(self, car: Car) -> None:
+        pass
+
+    @abstractmethod
+    def add_batch(self, cars: List[Car]) -> None:
+        pass
+
+    @abstractmethod
+    def copy_batch(self, rows: Iterable[Dict[str, Any]], staging: bool) -> None:
+        """Loads rows keyed by column names with COPY, without building entities"""
+        pass
+
+    @abstractmethod
+    def merge_batch(self, rows: Iterable[Dict[str, Any]]) -> MergeResult:
+        """
+        Upserts rows keyed by column names by their source ids and deactivates
+        imported cars missing from them
+        """
+        pass
+
+
+@base
+class CarListingRepository(ABC):
+    """Active cars listing, denormalized so that it is read from a single table"""
+
+    @abstractmethod
+    def refresh(self, pks: Optional[List[CarPk]] = None) -> None:
+        """
+        Brings listed cars in line with the cars and catalog tables, either only
+        for the given car pks or for all of them
+        """
+        pass
+
+
+@base
+class AsyncCarListingRepository(ABC):
+    """
+    Reads of the listing kept by `CarListingRepository`, for async endpoints. Pages
+    can be read with only some `columns`, named like listing attributes; the others
+    are left unset.
+    """
+
+    @abstractmethod
+    async def get_active_paged(
         self,
         page_number: int,
         page_size: int,
-        price_min: int,
-        price_max: int,
-        mileage_min: int,
-        mileage_max: int,
-    ) -> List[Car]:
+        price_min: Optional[int],
+        price_max: Optional[int],
+        mileage_min: Optional[int],
+        mileage_max: Optional[int],
+        columns: Optional[Sequence[str]],
+    ) -> List[CarListing]:
         pass
 
     @abstractmethod
-    def add(self, car: Car) -> None:
+    async def get_active_after(
+        self,
+        cursor: Optional[CarCursor],
+        page_size: int,
+        price_min: Optional[int],
+        price_max: Optional[int],
+        mileage_min: Optional[int],
+        mileage_max: Optional[int],
+        columns: Optional[Sequence[str]],
+    ) -> List[CarListing]:
+        """Returns the page of active cars which directly follows the cursor"""
         pass
 
     @abstractmethod
-    def add_batch(self, cars: List[Car]) -> None:
+    def stream_active(self, batch_size: int) -> AsyncIterator[List[CarListing]]:
+        """Returns all active cars in batches, which are read as they are consumed"""
         pass
 
 
@@ -88,6 +159,11 @@ class MakeRepository(Repository):
     def get_by_name(self, name: MakeName) -> Make:
         pass
 
+    @abstractmethod
+    def get_by_names(self, names: List[MakeName]) -> List[Make]:
+        """Returns makes matching any of the names, case insensitive"""
+        pass
+
     @abstractmethod
     def add(self, make: Make) -> None:
         pass
@@ -96,6 +172,23 @@ class MakeRepository(Repository):
     def add_batch(self, makes: List[Make]) -> None:
         pass
 
+    @abstractmethod
+    def copy_batch(self, rows: Iterable[Dict[str, Any]], staging: bool) -> None:
+        """Loads rows keyed by column names with COPY, without building entities"""
+        pass
+
+    @abstractmethod
+    def merge_batch(self, rows: Iterable[Dict[str, Any]]) -> MergeResult:
+        """
+        Upserts rows keyed by column names by their source ids and deactivates
+        imported makes missing from them
+        """
+        pass
+
+    @abstractmethod
+    def get_pks_by_source_id(self) -> Dict[SourceId, MakePk]:
+        pass
+
 
 @base
 class ModelRepository(Repository):
@@ -115,6 +208,13 @@ class ModelRepository(Repository):
     def get_by_name_and_make(self, name: ModelName, make: MakeName) -> Model:
         pass
 
+    @abstractmethod
+    def get_by_names_and_make_pks(
+        self, keys: List[Tuple[ModelName, MakePk]]
+    ) -> List[Model]:
+        """Returns models matching any of the (name, make pk) pairs, case insensitive"""
+        pass
+
     @abstractmethod
     def add(self, model: Model) -> None:
         pass
@@ -123,6 +223,23 @@ class ModelRepository(Repository):
     def add_batch(self, models: List[Model]) -> None:
         pass
 
+    @abstractmethod
+    def copy_batch(self, rows: Iterable[Dict[str, Any]], staging: bool) -> None:
+        """Loads rows keyed by column names with COPY, without building entities"""
+        pass
+
+    @abstractmethod
+    def merge_batch(self, rows: Iterable[Dict[str, Any]]) -> MergeResult:
+        """
+        Upserts rows keyed by column names by their source ids and deactivates
+        imported models missing from them
+        """
+        pass
+
+    @abstractmethod
+    def get_pks_by_source_id(self) -> Dict[SourceId, ModelPk]:
+        pass
+
 
 @base
 class SubModelRepository(Repository):
@@ -144,6 +261,13 @@ class SubModelRepository(Repository):
     ) -> SubModel:
         pass
 
+    @abstractmethod
+    def get_by_names_and_model_pks(
+        self, keys: List[Tuple[SubModelName, ModelPk]]
+    ) -> List[SubModel]:
+        """Returns submodels matching any of the (name, model pk) pairs, case insensitive"""
+        pass
+
     @abstractmethod
     def add(self, submodel: SubModel) -> None:
         pass
@@ -151,3 +275,50 @@ class SubModelRepository(Repository):
     @abstractmethod
     def add_batch(self, submodels: List[SubModel]) -> None:
         pass
+
+    @abstractmethod
+    def copy_batch(self, rows: Iterable[Dict[str, Any]], staging: bool) -> None:
+        """Loads rows keyed by column names with COPY, without building entities"""
+        pass
+
+    @abstractmethod
+    def merge_batch(self, rows: Iterable[Dict[str, Any]]) -> MergeResult:
+        """
+        Upserts rows keyed by column names by their source ids and deactivates
+        imported submodels missing from them
+        """
+        pass
+
+    @abstractmethod
+    def get_pks_by_source_id(self) -> Dict[SourceId, SubModelPk]:
+        pass
+
+
+@base
+class CatalogVersionRepository(ABC):
+    """Version counter of makes, models and submodels, used to invalidate caches"""
+
+    @abstractmethod
+    def get(self) -> int:
+        pass
+
+    @abstractmethod
+    def bump(self) -> None:
+        pass
+
+
+@base
+class ImportCheckpointRepository(ABC):
+    """Progress of import_data, which lets an interrupted import resume"""
+
+    @abstractmethod
+    def get(self, file_name: str) -> Optional[ImportCheckpoint]:
+        pass
+
+    @abstractmethod
+    def save(self, checkpoint: ImportCheckpoint) -> None:
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
@@ -6,4 +6,30 @@ env = envparse.Env()
 
 
 DATABASE_URL = environ["DATABASE_URL"]
+# Read only transactions go to the replica when it is set. Mind the replication lag.
+DATABASE_REPLICA_URL = env("DATABASE_REPLICA_URL", default=None)
 DEBUG = env("DEBUG", cast=bool, default=False)
+
+DATABASE_POOL_SIZE = env("DATABASE_POOL_SIZE", cast=int, default=5)
+DATABASE_MAX_OVERFLOW = env("DATABASE_MAX_OVERFLOW", cast=int, default=10)
+DATABASE_POOL_TIMEOUT = env("DATABASE_POOL_TIMEOUT", cast=int, default=30)
+DATABASE_POOL_RECYCLE = env("DATABASE_POOL_RECYCLE", cast=int, default=1800)
+DATABASE_POOL_PRE_PING = env("DATABASE_POOL_PRE_PING", cast=bool, default=True)
+# Connections of each worker's asyncio pool, used by async endpoints. Requests above
+# it wait for a free connection rather than for a thread.
+ASYNC_DATABASE_POOL_SIZE = env("ASYNC_DATABASE_POOL_SIZE", cast=int, default=20)
+# Milliseconds, 0 disables the timeout
+DATABASE_STATEMENT_TIMEOUT = env("DATABASE_STATEMENT_TIMEOUT", cast=int, default=0)
+
+# Seconds after which workers notice that the catalog has changed
+CATALOG_CACHE_TTL = env("CATALOG_CACHE_TTL", cast=float, default=5.0)
+# Seconds for which clients may reuse catalog responses; after that they revalidate them
+# with If-None-Match, which is answered from the catalog version
+CATALOG_MAX_AGE = env("CATALOG_MAX_AGE", cast=int, default=0)
+SUBMODEL_PK_CACHE_SIZE = env("SUBMODEL_PK_CACHE_SIZE", cast=int, default=10000)
+
+# Responses of at least this many bytes are compressed, with brotli or gzip as the client
+# accepts. Quality and level trade CPU time of every request for bytes on the wire.
+COMPRESSION_MINIMUM_SIZE = env("COMPRESSION_MINIMUM_SIZE", cast=int, default=1024)
+COMPRESSION_BROTLI_QUALITY = env("COMPRESSION_BROTLI_QUALITY", cast=int, default=4)
+COMPRESSION_GZIP_LEVEL = env("COMPRESSION_GZIP_LEVEL", cast=int, default=6)
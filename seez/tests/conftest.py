@@ -7,6 +7,7 @@ from pytest_factoryboy import register
 
 from seez.infrastructure.scopes import TestTransactionalScope
 from seez.main import configure_haps
+from seez.tests.fixtures.cache import *  # noqa
 from seez.tests.fixtures.database import *  # noqa
 from seez.tests.fixtures.repositories import *  # noqa
 
@@ -2,8 +2,10 @@ from datetime import datetime
 from random import randint
 
 import factory
+from haps import Container
 
-from seez.domain.models import Car, Make, Model, SubModel
+from seez.domain.models import Car, CarListing, Make, Model, SubModel
+from seez.ports.repositories import CarListingRepository
 from seez.tests.factories import SQLAlchemyBase
 
 
@@ -70,3 +72,29 @@ class CarFactory(SQLAlchemyBase):
     class Meta:
         model = Car
         exclude = ("submodel",)
+
+    @classmethod
+    def _create(cls, model_class, *args, **kwargs):
+        car = super()._create(model_class, *args, **kwargs)
+        # Listed like cars added by commands
+        Container().get_object(CarListingRepository).refresh([car.pk])
+        return car
+
+
+class CarListingFactory(factory.Factory):
+    pk = factory.LazyFunction(Car.next_pk)
+    year = factory.LazyFunction(lambda: randint(1920, 2020))
+    mileage = factory.LazyFunction(lambda: randint(0, 500000))
+    price = factory.LazyFunction(lambda: randint(1000, 9000000))
+    exterior_color = factory.Sequence(lambda n: f"Color {n}")
+    created_at = factory.LazyFunction(datetime.utcnow)
+    updated_at = factory.LazyFunction(datetime.utcnow)
+    body_type = Car.BodyType.SEDAN
+    transmission = Car.Transmission.AUTOMATIC
+    fuel_type = Car.FuelType.PETROL
+    submodel_name = factory.Sequence(lambda n: f"Sub model {n}")
+    model_name = factory.Sequence(lambda n: f"Car model {n}")
+    make_name = factory.Sequence(lambda n: f"Make {n}")
+
+    class Meta:
+        model = CarListing
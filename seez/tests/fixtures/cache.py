@@ -0,0 +1,24 @@
+import pytest
+from haps import Container
+
+from seez.infrastructure.cache import CatalogCache, SubModelPkCache
+
+
+@pytest.fixture(autouse=True)
+def catalog_cache():
+    """Catalog cache is a singleton, so it's emptied after each test"""
+    cache = Container().get_object(CatalogCache)
+
+    yield cache
+
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def submodel_pk_cache():
+    """Pks of submodels created in a test must not leak into the next one"""
+    cache = Container().get_object(SubModelPkCache)
+
+    yield cache
+
+    cache.clear()
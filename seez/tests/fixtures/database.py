@@ -1,15 +1,18 @@
-from typing import Any, cast
+from contextlib import asynccontextmanager
+from typing import Any, Optional, cast
 
 import pytest
 from alembic import command as alembic_command
 from alembic import config as alembic_config
 from haps import Container, Egg, egg, scope
-from sqlalchemy.engine import create_engine
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, create_engine
 from sqlalchemy.exc import ProgrammingError
 from sqlalchemy.orm.scoping import scoped_session
 from sqlalchemy.orm.session import sessionmaker
 
 from seez import settings
+from seez.infrastructure.async_session import AsyncConnection, AsyncEngine
 from seez.infrastructure.postgres import METADATA
 from seez.infrastructure.scopes import TRANSACTIONAL_SCOPE
 from seez.infrastructure.session import Session
@@ -37,6 +40,42 @@ class CommonSessionMaker(Singleton):
     common_session_maker = None
 
 
+class TestAsyncConnection(AsyncConnection):
+    """
+    Runs statements of async transactions on the test connection, so they see
+    and roll back with everything else done in the test.
+    """
+
+    def __init__(self, connection: Optional[Connection]) -> None:
+        self._connection = connection
+
+    async def fetch_all(self, statement):
+        return list(self._get_connection().execute(statement).fetchall())
+
+    async def fetch_val(self, statement):
+        return self._get_connection().execute(statement).scalar()
+
+    async def execute(self, statement):
+        self._get_connection().execute(statement)
+
+    def _get_connection(self) -> Connection:
+        if self._connection is None:
+            raise AssertionError("You cannot use DB in tests not marked by postgres_db")
+        return self._connection
+
+
+class TestAsyncEngine(AsyncEngine):
+    def __init__(self, connection: Optional[Connection]) -> None:
+        self.connection = connection
+
+    @asynccontextmanager
+    async def transaction(self, readonly):
+        yield TestAsyncConnection(self.connection)
+
+    async def close(self):
+        pass
+
+
 @pytest.fixture(scope="session")
 def setup_test_db() -> None:
     """
@@ -93,6 +132,16 @@ def postgres_db(request: Any, setup_test_db: Any) -> None:
     else:
         request.getfixturevalue("recreate_db_from_metadata")
 
+    # Tests roll their rows back, so autovacuum would analyze tables at random moments
+    # and the plans checked by `query_plans` would depend on the timing
+    engine = create_engine(TEST_DB_URL)
+    with engine.connect() as connection:
+        for table in METADATA.sorted_tables:
+            connection.execute(
+                f"ALTER TABLE {table.name} SET (autovacuum_enabled = false)"
+            )
+    engine.dispose()
+
 
 @pytest.fixture(scope="session")
 def postgres_connection(postgres_db):
@@ -163,12 +212,17 @@ def postgres_db_marker(request) -> None:
 
                 return cast(Session, session_maker())
 
+            async_engine = TestAsyncEngine(connection)
+            Container().config.insert(
+                0, Egg(AsyncEngine, None, None, lambda: async_engine)
+            )
             Container().config.insert(
                 0, Egg(Session, None, None, sql_alchemy_session_factory)
             )
 
             yield
 
+            Container().config.pop(0)
             Container().config.pop(0)
             transaction.rollback()
             connection.close()
@@ -188,13 +242,62 @@ def postgres_db_marker(request) -> None:
 
             return AssertionSession()
 
+        async_engine = TestAsyncEngine(None)
+        Container().config.insert(0, Egg(AsyncEngine, None, None, lambda: async_engine))
         Container().config.insert(0, Egg(Session, None, None, assertion_session_factory))
 
         yield
 
         Container().config.pop(0)
+        Container().config.pop(0)
 
 
 @pytest.fixture
 def db_session():
     return Container().get_object(Session)
+
+
+@pytest.fixture
+def executed_statements(db_session):
+    """
+    Collects SQL statements sent through the test connection after the fixture
+    was requested. Useful for asserting how many queries a code path needs.
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    connection = db_session.bind
+    event.listen(connection, "before_cursor_execute", before_cursor_execute)
+
+    yield statements
+
+    event.remove(connection, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture
+def query_plans(db_session):
+    """
+    Collects plans of SELECT statements sent through the test connection after
+    the fixture was requested. Sequential scans are disabled, so the plans show
+    whether a suitable index exists even though test tables are tiny. Joins are
+    limited to nested loops, so that plans don't depend on table statistics.
+    """
+    plans = []
+
+    def after_cursor_execute(conn, cursor, statement, parameters, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            explain_cursor = cursor.connection.cursor()
+            explain_cursor.execute("EXPLAIN " + statement, parameters)
+            plans.append("\n".join(row[0] for row in explain_cursor.fetchall()))
+            explain_cursor.close()
+
+    connection = db_session.connection()
+    for setting in ("enable_seqscan", "enable_hashjoin", "enable_mergejoin"):
+        connection.execute(f"SET LOCAL {setting} = off")
+    event.listen(connection, "after_cursor_execute", after_cursor_execute)
+
+    yield plans
+
+    event.remove(connection, "after_cursor_execute", after_cursor_execute)
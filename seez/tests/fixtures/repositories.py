@@ -1,7 +1,11 @@
 import pytest
 
 from seez.ports.adapters.repositories import (
+    AsyncSqlAlchemyCarListingRepository,
+    SqlAlchemyCarListingRepository,
     SqlAlchemyCarRepository,
+    SqlAlchemyCatalogVersionRepository,
+    SqlAlchemyImportCheckpointRepository,
     SqlAlchemyMakeRepository,
     SqlAlchemyModelRepository,
     SqlAlchemySubModelRepository,
@@ -13,6 +17,16 @@ def car_repository():
     return SqlAlchemyCarRepository()
 
 
+@pytest.fixture()
+def car_listing_repository():
+    return SqlAlchemyCarListingRepository()
+
+
+@pytest.fixture()
+def async_car_listing_repository():
+    return AsyncSqlAlchemyCarListingRepository()
+
+
 @pytest.fixture()
 def model_repository():
     return SqlAlchemyModelRepository()
@@ -26,3 +40,13 @@ def submodel_repository():
 @pytest.fixture()
 def make_repository():
     return SqlAlchemyMakeRepository()
+
+
+@pytest.fixture()
+def catalog_version_repository():
+    return SqlAlchemyCatalogVersionRepository()
+
+
+@pytest.fixture()
+def import_checkpoint_repository():
+    return SqlAlchemyImportCheckpointRepository()
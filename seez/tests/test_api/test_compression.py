@@ -0,0 +1,154 @@
+import asyncio
+import gzip
+import zlib
+
+import brotli
+import pytest
+from assertpy import assert_that
+from starlette.datastructures import Headers
+from starlette.responses import Response, StreamingResponse
+
+from seez.api.compression import CompressionMiddleware, choose_encoding
+from seez.api.responses import etag_matches
+
+BODY = b'{"name": "Mercedes"}' * 100
+
+
+def respond(response, accept_encoding=None, if_none_match=None):
+    """Runs the response through the middleware, returning headers and body chunks"""
+    headers = [] if accept_encoding is None else [(b"accept-encoding", accept_encoding)]
+    if if_none_match is not None:
+        headers.append((b"if-none-match", if_none_match))
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": headers}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        messages.append(message)
+
+    middleware = CompressionMiddleware(response, minimum_size=500)
+    asyncio.run(middleware(scope, receive, send))
+    headers = {name.decode(): value.decode() for name, value in messages[0]["headers"]}
+    return headers, [message.get("body", b"") for message in messages[1:]]
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, encoding",
+    [
+        ("", None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("gzip, deflate, br", "br"),
+        ("br;q=0.5, gzip", "gzip"),
+        ("br;q=0, gzip;q=0", None),
+        ("*", "br"),
+        ("*, br;q=0", "gzip"),
+        ("GZIP;q=invalid, gzip", "gzip"),
+    ],
+)
+def test_choose_encoding(accept_encoding, encoding):
+    encodings = CompressionMiddleware(None).encodings
+    assert_that(choose_encoding(accept_encoding, encodings)).is_equal_to(encoding)
+
+
+def test_gzip():
+    headers, chunks = respond(Response(BODY, headers={"ETag": '"makes-1"'}), b"gzip")
+
+    assert_that(headers).contains_entry(
+        {"content-encoding": "gzip"},
+        {"vary": "Accept-Encoding"},
+        {"etag": '"makes-1-gzip"'},
+        {"content-length": str(len(b"".join(chunks)))},
+    )
+    assert_that(gzip.decompress(b"".join(chunks))).is_equal_to(BODY)
+
+
+def test_brotli():
+    headers, chunks = respond(Response(BODY), b"gzip, br")
+
+    assert_that(headers).contains_entry({"content-encoding": "br"})
+    assert_that(brotli.decompress(b"".join(chunks))).is_equal_to(BODY)
+    assert_that(len(b"".join(chunks))).is_less_than(len(BODY) // 10)
+
+
+@pytest.mark.parametrize(
+    "response, accept_encoding",
+    [
+        (Response(BODY[:499]), b"gzip"),
+        (Response(BODY), None),
+        (Response(BODY), b"gzip;q=0"),
+        (Response(BODY, headers={"Content-Encoding": "zstd"}), b"gzip"),
+    ],
+)
+def test_not_compressed(response, accept_encoding):
+    headers, chunks = respond(response, accept_encoding)
+
+    assert_that(headers.get("content-encoding")).is_equal_to(
+        response.headers.get("content-encoding")
+    )
+    assert_that(b"".join(chunks)).is_equal_to(response.body)
+
+
+async def catalog(scope, receive, send):
+    """Answers like the catalog endpoints, with a 304 when the tag is revalidated"""
+    etag = '"makes-1"'
+    if etag_matches(etag, Headers(scope=scope).get("If-None-Match")):
+        response = Response(status_code=304, headers={"ETag": etag})
+    else:
+        response = Response(BODY, headers={"ETag": etag})
+    await response(scope, receive, send)
+
+
+@pytest.mark.parametrize(
+    "if_none_match", [b'"makes-1-gzip"', b'"makes-1-br", W/"makes-1-gzip"']
+)
+def test_not_modified_tagged_like_revalidated(if_none_match):
+    headers, chunks = respond(catalog, b"gzip", if_none_match)
+
+    assert_that(headers).contains_entry(
+        {"etag": '"makes-1-gzip"'}, {"vary": "Accept-Encoding"}
+    )
+    assert_that(b"".join(chunks)).is_empty()
+
+
+@pytest.mark.parametrize(
+    "app, accept_encoding, if_none_match",
+    [
+        (Response(BODY[:499], headers={"ETag": '"makes-1"'}), b"gzip", None),
+        (catalog, b"gzip", b'"makes-1"'),
+        (catalog, None, b'"makes-1"'),
+    ],
+)
+def test_not_compressed_responses_untagged(app, accept_encoding, if_none_match):
+    headers, _ = respond(app, accept_encoding, if_none_match)
+
+    assert_that(headers).contains_entry({"etag": '"makes-1"'})
+    assert_that(headers).does_not_contain_key("vary")
+
+
+def test_other_encoding_not_revalidated():
+    headers, chunks = respond(catalog, b"gzip", b'"makes-1-br"')
+
+    assert_that(headers).contains_entry({"etag": '"makes-1-gzip"'})
+    assert_that(gzip.decompress(b"".join(chunks))).is_equal_to(BODY)
+
+
+def test_streaming_chunks_are_flushed():
+    lines = [b'{"name": "Mercedes %d"}\n' % i for i in range(5)]
+
+    async def body():
+        for line in lines:
+            yield line
+
+    headers, chunks = respond(StreamingResponse(body()), b"gzip")
+
+    assert_that(headers).contains_entry({"content-encoding": "gzip"})
+    assert_that(headers).does_not_contain_key("content-length")
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    # Every chunk decodes to its line without waiting for the following ones
+    for line, chunk in zip(lines, chunks):
+        assert_that(decompressor.decompress(chunk)).is_equal_to(line)
+    assert_that(decompressor.decompress(b"".join(chunks[len(lines) :]))).is_empty()
+    assert_that(decompressor.eof).is_true()
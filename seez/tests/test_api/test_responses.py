@@ -0,0 +1,105 @@
+from datetime import datetime
+
+import pytest
+from assertpy.assertpy import assert_that
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from seez.api.responses import DTOResponse, compact_listing, etag_matches
+from seez.domain.dto import CarDTO, CarListDTO, SparseCarListDTO, SubModelListDTO
+from seez.infrastructure.dto import DTO
+
+
+def test_same_body_as_json_response(car_listing_factory):
+    cars = [
+        car_listing_factory(
+            created_at=datetime(2020, 6, 1, 20, 0), updated_at=datetime(2020, 6, 2)
+        ),
+        car_listing_factory(
+            mileage=None,
+            price=None,
+            exterior_color='Bleu céruléen "métallisé"',
+            created_at=datetime(2020, 6, 1, 20, 0, 0, 1234),
+            updated_at=datetime(2020, 6, 1, 20, 0, 0, 999999),
+            body_type=None,
+            transmission=None,
+            fuel_type=None,
+        ),
+    ]
+    dto = CarListDTO(values=[CarDTO.from_model(car) for car in cars], next_cursor="abc==")
+
+    assert_that(DTOResponse(dto).body).is_equal_to(
+        JSONResponse(jsonable_encoder(dto)).body
+    )
+
+
+def test_unknown_type():
+    class UnknownDTO(DTO):
+        value: object
+
+    with pytest.raises(TypeError):
+        DTOResponse(UnknownDTO(value=object()))
+
+
+def test_compact_listing(car_listing_factory):
+    cars = [
+        car_listing_factory(
+            make_name="Mercedes", model_name="CLS", submodel_name="CLS200"
+        ),
+        car_listing_factory(make_name="BMW", model_name="X5", submodel_name="X5 40i"),
+        car_listing_factory(
+            make_name="Mercedes", model_name="CLS", submodel_name="CLS300"
+        ),
+    ]
+    dto = CarListDTO(values=[CarDTO.from_model(car) for car in cars], next_cursor="abc==")
+
+    compact = compact_listing(dto)
+
+    assert_that(compact["names"]).is_equal_to(
+        {
+            "make": ["Mercedes", "BMW"],
+            "model": ["CLS", "X5"],
+            "submodel": ["CLS200", "X5 40i", "CLS300"],
+        }
+    )
+    assert_that(compact["next_cursor"]).is_equal_to("abc==")
+    indexes = [(0, 0, 0), (1, 1, 1), (0, 0, 2)]
+    for value, car, (make, model, submodel) in zip(
+        compact["values"], dto.values, indexes
+    ):
+        expected = {**car.dict(), "make": make, "model": model, "submodel": submodel}
+        assert_that(value).is_equal_to(expected)
+
+
+def test_compact_sparse_listing(car_listing_factory):
+    cars = car_listing_factory.build_batch(2, make_name="Mercedes")
+    dto = SparseCarListDTO.from_model(cars, ("pk", "make"))
+
+    compact = compact_listing(dto)
+
+    assert_that(compact["names"]).is_equal_to({"make": ["Mercedes"]})
+    assert_that(compact["values"]).is_equal_to(
+        [{"pk": car.pk, "make": 0} for car in cars]
+    )
+
+
+def test_compact_listing_only_existing_fields():
+    compact = compact_listing(SubModelListDTO(values=[]))
+
+    assert_that(compact).is_equal_to({"values": [], "names": {"make": [], "model": []}})
+
+
+@pytest.mark.parametrize(
+    "if_none_match, matches",
+    [
+        (None, False),
+        ("", False),
+        ('"makes-1"', True),
+        ('"makes-2"', False),
+        ('W/"makes-1"', True),
+        ('"makes-2", "makes-1"', True),
+        ("*", True),
+    ],
+)
+def test_etag_matches(if_none_match, matches):
+    assert_that(etag_matches('"makes-1"', if_none_match)).is_equal_to(matches)
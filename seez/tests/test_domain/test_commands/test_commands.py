@@ -1,38 +1,81 @@
+import asyncio
 from unittest.mock import Mock
 
 import pytest
 
 from seez.domain.commands.add_car import AddCar
+from seez.domain.commands.add_cars_batch import AddCarsBatch
+from seez.domain.commands.export_cars import ExportCars
 from seez.domain.commands.get_cars_paged import GetCarsPaged
+from seez.domain.commands.get_catalog_version import GetCatalogVersion
 from seez.domain.commands.get_makes import GetAllMakes
 from seez.domain.commands.get_models import GetAllModels
 from seez.domain.commands.get_submodels import GetAllSubModels
+from seez.domain.cursors import CarCursor
 from seez.domain.dto import (
     AddCarDTO,
+    AddCarResultDTO,
+    CarDTO,
     CarListDTO,
     MakeListDTO,
     ModelListDTO,
+    SparseCarListDTO,
     SubModelListDTO,
 )
-from seez.domain.exceptions import MakeDoesNotExist
+from seez.domain.exceptions import InvalidCursor, InvalidFields, MakeDoesNotExist
 from seez.domain.models import Car
 
 
+def returns(value):
+    """Side effect of a mocked coroutine function"""
+
+    async def coroutine(*args, **kwargs):
+        return value
+
+    return coroutine
+
+
+class TestGetCatalogVersionCommand:
+    def test_handle(self):
+        cmd = GetCatalogVersion()
+        cmd.catalog_version_repository = Mock()
+        cmd.catalog_version_repository.get.return_value = 7
+
+        assert cmd.handle() == 7
+        assert cmd.handle() == 7
+        assert cmd.catalog_version_repository.get.call_count == 1
+
+
 class TestGetAllMakesCommand:
     def test_handle(self, make_factory):
         cmd = GetAllMakes()
         cmd.make_repository = Mock()
+        cmd.catalog_version_repository = Mock()
 
         makes = make_factory.build_batch(3)
         cmd.make_repository.get_all_active.return_value = makes
         result = cmd.handle()
         assert result == MakeListDTO.from_model(makes)
 
+    def test_handle_cached(self, make_factory):
+        cmd = GetAllMakes()
+        cmd.make_repository = Mock()
+        cmd.catalog_version_repository = Mock()
+        cmd.catalog_version_repository.get.return_value = 1
+
+        makes = make_factory.build_batch(3)
+        cmd.make_repository.get_all_active.return_value = makes
+        cmd.handle()
+        result = cmd.handle()
+        assert result == MakeListDTO.from_model(makes)
+        assert cmd.make_repository.get_all_active.call_count == 1
+
 
 class TestGetAllModelsCommand:
     def test_handle(self, model_factory, make_factory):
         cmd = GetAllModels()
         cmd.model_repository = Mock()
+        cmd.catalog_version_repository = Mock()
 
         make = make_factory.build()
         models = model_factory.build_batch(3)
@@ -47,6 +90,7 @@ class TestGetAllSubModelsCommand:
     def test_handle(self, submodel_factory, model_factory, make_factory):
         cmd = GetAllSubModels()
         cmd.submodel_repository = Mock()
+        cmd.catalog_version_repository = Mock()
         make = make_factory.build()
         model = model_factory.build()
         model._make = make
@@ -60,22 +104,84 @@ class TestGetAllSubModelsCommand:
 
 
 class TestGetAllCarsPagedCommand:
-    def test_handle(self, submodel_factory, model_factory, make_factory, car_factory):
+    def test_handle(self, car_listing_factory):
         cmd = GetCarsPaged()
-        cmd.car_repository = Mock()
-        make = make_factory.build()
-        model = model_factory.build()
-        model._make = make
-        submodel = submodel_factory.build()
-        submodel._model = model
+        cmd.car_listing_repository = Mock()
+        listings = car_listing_factory.build_batch(3)
 
-        cars = car_factory.build_batch(3)
-        for car in cars:
-            car._submodel = submodel
+        cmd.car_listing_repository.get_active_paged.side_effect = returns(listings)
+        result = asyncio.run(cmd.handle())
+        assert result == CarListDTO.from_model(listings)
 
-        cmd.car_repository.get_active_paged.return_value = cars
-        result = cmd.handle()
-        assert result == CarListDTO.from_model(cars)
+    def test_handle_full_page_has_next_cursor(self, car_listing_factory):
+        cmd = GetCarsPaged(page_size=3)
+        cmd.car_listing_repository = Mock()
+        listings = car_listing_factory.build_batch(3)
+
+        cmd.car_listing_repository.get_active_paged.side_effect = returns(listings)
+        result = asyncio.run(cmd.handle())
+        assert result.next_cursor == CarCursor.from_car(listings[-1]).encode()
+
+    def test_handle_cursor(self, car_listing_factory):
+        cursor = CarCursor.from_car(car_listing_factory.build())
+        cmd = GetCarsPaged(page_size=3, cursor=cursor.encode())
+        cmd.car_listing_repository = Mock()
+        listings = car_listing_factory.build_batch(2)
+
+        cmd.car_listing_repository.get_active_after.side_effect = returns(listings)
+        result = asyncio.run(cmd.handle())
+        assert result == CarListDTO.from_model(listings)
+        assert not cmd.car_listing_repository.get_active_paged.called
+        call_kwargs = cmd.car_listing_repository.get_active_after.call_args[1]
+        assert call_kwargs["cursor"] == cursor
+
+    def test_handle_fields(self, car_listing_factory):
+        cmd = GetCarsPaged(page_size=3, fields=["make", "price", "pk"])
+        cmd.car_listing_repository = Mock()
+        listings = car_listing_factory.build_batch(3)
+
+        cmd.car_listing_repository.get_active_paged.side_effect = returns(listings)
+        result = asyncio.run(cmd.handle())
+        assert result == SparseCarListDTO.from_model(
+            listings,
+            ("pk", "price", "make"),
+            next_cursor=CarCursor.from_car(listings[-1]).encode(),
+        )
+        call_kwargs = cmd.car_listing_repository.get_active_paged.call_args[1]
+        assert call_kwargs["columns"] == ["pk", "updated_at", "price", "make_name"]
+
+    def test_handle_invalid_fields(self):
+        cmd = GetCarsPaged(fields=["pk", "colour"])
+        cmd.car_listing_repository = Mock()
+        with pytest.raises(InvalidFields):
+            asyncio.run(cmd.handle())
+
+    def test_handle_invalid_cursor(self):
+        cmd = GetCarsPaged(cursor="invalid")
+        cmd.car_listing_repository = Mock()
+        with pytest.raises(InvalidCursor):
+            asyncio.run(cmd.handle())
+
+
+class TestExportCarsCommand:
+    def test_handle(self, car_listing_factory):
+        cmd = ExportCars(batch_size=2)
+        cmd.car_listing_repository = Mock()
+        listings = car_listing_factory.build_batch(3)
+
+        async def stream_active(batch_size):
+            for offset in range(0, len(listings), batch_size):
+                yield listings[offset : offset + batch_size]
+
+        async def export():
+            return [batch async for batch in cmd.handle()]
+
+        cmd.car_listing_repository.stream_active.side_effect = stream_active
+        result = asyncio.run(export())
+        assert result == [
+            [CarDTO.from_model(listings[0]), CarDTO.from_model(listings[1])],
+            [CarDTO.from_model(listings[2])],
+        ]
 
 
 @pytest.fixture()
@@ -98,6 +204,7 @@ class TestAddCarCommand:
     def test_handle_make_doesnt_exist(self, add_car_dto):
         cmd = AddCar(add_car_dto=add_car_dto)
         cmd.make_repository = Mock()
+        cmd.catalog_version_repository = Mock()
         cmd.make_repository.get_by_name.side_effect = MakeDoesNotExist
         with pytest.raises(MakeDoesNotExist):
             cmd.handle()
@@ -114,6 +221,8 @@ class TestAddCarCommand:
         cmd.model_repository = Mock()
         cmd.submodel_repository = Mock()
         cmd.car_repository = Mock()
+        cmd.car_listing_repository = Mock()
+        cmd.catalog_version_repository = Mock()
 
         cmd.make_repository.get_by_name.return_value = make
         cmd.submodel_repository.get_by_name_model_and_make.return_value = None
@@ -122,6 +231,7 @@ class TestAddCarCommand:
         cmd.handle()
         assert cmd.model_repository.add.called
         assert cmd.submodel_repository.add.called
+        assert cmd.catalog_version_repository.bump.called
         assert cmd.car_repository.add.called
 
     def test_handle_submodel_does_not_exist_model_does(
@@ -136,6 +246,8 @@ class TestAddCarCommand:
         cmd.model_repository = Mock()
         cmd.submodel_repository = Mock()
         cmd.car_repository = Mock()
+        cmd.car_listing_repository = Mock()
+        cmd.catalog_version_repository = Mock()
 
         cmd.make_repository.get_by_name.return_value = make
         cmd.submodel_repository.get_by_name_model_and_make.return_value = None
@@ -160,12 +272,132 @@ class TestAddCarCommand:
         cmd.model_repository = Mock()
         cmd.submodel_repository = Mock()
         cmd.car_repository = Mock()
+        cmd.car_listing_repository = Mock()
+        cmd.catalog_version_repository = Mock()
 
         cmd.make_repository.get_by_name.return_value = make
         cmd.model_repository.get_by_name_and_make.return_value = model
         cmd.submodel_repository.get_by_name_model_and_make.return_value = submodel
+        cmd.catalog_version_repository.get.return_value = 1
 
         cmd.handle()
         assert not cmd.model_repository.add.called
         assert not cmd.submodel_repository.add.called
+        assert not cmd.catalog_version_repository.bump.called
         assert cmd.car_repository.add.called
+        key = ("mercedes", "cls", "csl200")
+        assert cmd.submodel_pk_cache.get_pk(key, 1) == submodel.pk
+
+    def test_handle_submodel_cached(self, add_car_dto, submodel_factory):
+        submodel = submodel_factory.build(name=add_car_dto.submodel)
+
+        cmd = AddCar(add_car_dto=add_car_dto)
+        cmd.make_repository = Mock()
+        cmd.submodel_repository = Mock()
+        cmd.car_repository = Mock()
+        cmd.car_listing_repository = Mock()
+        cmd.catalog_version_repository = Mock()
+        cmd.catalog_version_repository.get.return_value = 1
+        cmd.submodel_pk_cache.set_pk(("mercedes", "cls", "csl200"), 1, submodel.pk)
+
+        cmd.handle()
+        assert not cmd.make_repository.get_by_name.called
+        assert not cmd.submodel_repository.get_by_name_model_and_make.called
+        car = cmd.car_repository.add.call_args[0][0]
+        assert car.submodel_pk == submodel.pk
+        cmd.car_listing_repository.refresh.assert_called_once_with([car.pk])
+
+    def test_handle_submodel_cached_at_previous_version(
+        self, add_car_dto, make_factory, submodel_factory
+    ):
+        moved_submodel = submodel_factory.build(name=add_car_dto.submodel)
+        submodel = submodel_factory.build(name=add_car_dto.submodel)
+
+        cmd = AddCar(add_car_dto=add_car_dto)
+        cmd.make_repository = Mock()
+        cmd.submodel_repository = Mock()
+        cmd.car_repository = Mock()
+        cmd.car_listing_repository = Mock()
+        cmd.catalog_version_repository = Mock()
+        cmd.make_repository.get_by_name.return_value = make_factory.build()
+        cmd.submodel_repository.get_by_name_model_and_make.return_value = submodel
+        # An import moved the cached submodel away and bumped the version
+        cmd.catalog_version_repository.get.return_value = 2
+        key = ("mercedes", "cls", "csl200")
+        cmd.submodel_pk_cache.set_pk(key, 1, moved_submodel.pk)
+
+        cmd.handle()
+        assert cmd.submodel_repository.get_by_name_model_and_make.called
+        car = cmd.car_repository.add.call_args[0][0]
+        assert car.submodel_pk == submodel.pk
+        assert cmd.submodel_pk_cache.get_pk(key, 2) == submodel.pk
+
+
+class TestAddCarsBatchCommand:
+    def test_handle_make_doesnt_exist(self, add_car_dto):
+        cmd = AddCarsBatch(add_car_dtos=[add_car_dto])
+        cmd.make_repository = Mock()
+        cmd.model_repository = Mock()
+        cmd.submodel_repository = Mock()
+        cmd.car_repository = Mock()
+        cmd.car_listing_repository = Mock()
+        cmd.catalog_version_repository = Mock()
+
+        cmd.make_repository.get_by_names.return_value = []
+        cmd.model_repository.get_by_names_and_make_pks.return_value = []
+        cmd.submodel_repository.get_by_names_and_model_pks.return_value = []
+
+        result = cmd.handle()
+        assert result.values == [AddCarResultDTO(error="Make does not exist")]
+        assert not cmd.model_repository.add_batch.called
+        assert not cmd.submodel_repository.add_batch.called
+        assert not cmd.car_repository.add_batch.called
+        assert not cmd.car_listing_repository.refresh.called
+
+    def test_handle_submodel_cached(self, add_car_dto, submodel_factory):
+        submodel = submodel_factory.build(name=add_car_dto.submodel)
+
+        cmd = AddCarsBatch(add_car_dtos=[add_car_dto, add_car_dto])
+        cmd.make_repository = Mock()
+        cmd.car_repository = Mock()
+        cmd.car_listing_repository = Mock()
+        cmd.catalog_version_repository = Mock()
+        cmd.catalog_version_repository.get.return_value = 1
+        cmd.submodel_pk_cache.set_pk(("mercedes", "cls", "csl200"), 1, submodel.pk)
+
+        result = cmd.handle()
+        assert [value.error for value in result.values] == [None, None]
+        assert not cmd.make_repository.get_by_names.called
+        cars = cmd.car_repository.add_batch.call_args[0][0]
+        assert [car.submodel_pk for car in cars] == [submodel.pk, submodel.pk]
+        cmd.car_listing_repository.refresh.assert_called_once_with(
+            [car.pk for car in cars]
+        )
+
+    def test_handle_submodel_cached_at_previous_version(
+        self, add_car_dto, make_factory, model_factory, submodel_factory
+    ):
+        make = make_factory.build(name=add_car_dto.make)
+        model = model_factory.build(name=add_car_dto.model, make=make)
+        moved_submodel = submodel_factory.build(name=add_car_dto.submodel)
+        submodel = submodel_factory.build(name=add_car_dto.submodel, model=model)
+
+        cmd = AddCarsBatch(add_car_dtos=[add_car_dto])
+        cmd.make_repository = Mock()
+        cmd.model_repository = Mock()
+        cmd.submodel_repository = Mock()
+        cmd.car_repository = Mock()
+        cmd.car_listing_repository = Mock()
+        cmd.catalog_version_repository = Mock()
+        cmd.make_repository.get_by_names.return_value = [make]
+        cmd.model_repository.get_by_names_and_make_pks.return_value = [model]
+        cmd.submodel_repository.get_by_names_and_model_pks.return_value = [submodel]
+        # An import moved the cached submodel away and bumped the version
+        cmd.catalog_version_repository.get.return_value = 2
+        key = ("mercedes", "cls", "csl200")
+        cmd.submodel_pk_cache.set_pk(key, 1, moved_submodel.pk)
+
+        cmd.handle()
+        cars = cmd.car_repository.add_batch.call_args[0][0]
+        assert [car.submodel_pk for car in cars] == [submodel.pk]
+        assert cmd.submodel_pk_cache.get_pk(key, 2) == submodel.pk
@@ -1,14 +1,98 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+
 import pytest
 from assertpy.assertpy import assert_that
 
-from seez.domain.models import Car
-from seez.management.commands.import_data import Command
+from seez.domain.models import Car, CarListing
+from seez.infrastructure.repositories import ImportCheckpoint
+from seez.management.commands import import_data
+from seez.management.commands.import_data import Command, ImportMode, chunked
+from seez.management.exceptions import (
+    FeedAlreadyImported,
+    FeedNotFound,
+    ResumeNotSupported,
+)
+
+CONTENTS_QUERY = """
+SELECT make.name, make.active, make.created_at, make.updated_at,
+       model.name, model.active, model.created_at, model.updated_at,
+       submodel.name, submodel.active, submodel.created_at, submodel.updated_at,
+       car.active, car.year, car.mileage, car.price, car.exterior_color,
+       car.body_type, car.transmission, car.fuel_type, car.created_at, car.updated_at
+FROM car
+JOIN submodel ON submodel.pk = car.submodel_pk
+JOIN model ON model.pk = submodel.model_pk
+JOIN make ON make.pk = model.make_pk
+ORDER BY car.created_at
+"""
+
+FILES_PATH = "/app/seez/tests/files/"
+FILE_NAMES = ("makes.csv", "models.csv", "submodels.csv", "cars.csv")
+NISSAN_CAR = "f3444125ea1c170719a0667a11eff46e"
+HONDA_CAR = "cf5526c705a534282a973f0d2d018885"
+
+
+def write_feed(path, replace_cars=None):
+    """Copies test files to `path`, replacing or dropping (None) lines of cars.csv"""
+    for file_name in ("makes.csv", "models.csv", "submodels.csv"):
+        shutil.copy(FILES_PATH + file_name, path / file_name)
+    with open(FILES_PATH + "cars.csv") as f:
+        lines = f.read().splitlines()
+    replace_cars = replace_cars or {}
+    cars = [lines[0]]
+    for line in lines[1:]:
+        source_id = line.split(",")[0]
+        line = replace_cars.get(source_id, line)
+        if line is not None:
+            cars.append(line)
+    (path / "cars.csv").write_text("\n".join(cars) + "\n")
+    return f"{path}/"
+
+
+def write_ndjson_feed(path):
+    """Writes test files as NDJSON, with nulls for empty values"""
+    for file_name in FILE_NAMES:
+        with open(FILES_PATH + file_name, newline="") as f:
+            rows = [{k: v or None for k, v in row.items()} for row in csv.DictReader(f)]
+        name = file_name.replace(".csv", ".ndjson")
+        (path / name).write_text("".join(json.dumps(row) + "\n" for row in rows))
+    return f"{path}/"
+
+
+def write_gzip_feed(path):
+    for file_name in FILE_NAMES:
+        with open(FILES_PATH + file_name, "rb") as f:
+            (path / f"{file_name}.gz").write_bytes(gzip.compress(f.read()))
+    return f"{path}/"
+
+
+def merge(path):
+    cmd = Command()
+    cmd.path = path
+    cmd.mode = ImportMode.MERGE
+    cmd.handle()
 
 
 @pytest.mark.postgres_db
 class TestImportDataCommand:
+    @pytest.mark.parametrize(
+        "mode, staging",
+        [(ImportMode.ORM, False), (ImportMode.COPY, False), (ImportMode.COPY, True)],
+    )
     def test_import(
-        self, make_repository, model_repository, car_repository, submodel_repository
+        self,
+        mode,
+        staging,
+        make_repository,
+        model_repository,
+        car_repository,
+        submodel_repository,
+        catalog_version_repository,
+        db_session,
     ):
         assert_that(make_repository.get_all()).is_length(0)
         assert_that(model_repository.get_all()).is_length(0)
@@ -17,8 +101,12 @@ class TestImportDataCommand:
 
         cmd = Command()
         cmd.path = "/app/seez/tests/files/"
+        cmd.mode = mode
+        cmd.staging = staging
         cmd.handle()
 
+        assert_that(catalog_version_repository.get()).is_equal_to(1)
+
         makes = make_repository.get_all()
         make_names = {make.name for make in makes}
         assert_that(make_names).is_equal_to({"Honda", "Nissan"})
@@ -61,3 +149,288 @@ class TestImportDataCommand:
         assert_that(honda.transmission).is_equal_to(Car.Transmission.MANUAL)
         assert_that(honda.fuel_type).is_none()
         assert_that(honda.exterior_color).is_equal_to("White")
+
+        listings = db_session.query(CarListing).all()
+        assert_that([listing.pk for listing in listings]).is_equal_to([nissan.pk])
+        assert_that(listings[0].make_name).is_equal_to("Nissan")
+
+    @pytest.mark.parametrize("staging", [False, True])
+    def test_import_copy_same_contents_as_orm(self, db_session, staging):
+        cmd = Command()
+        cmd.path = "/app/seez/tests/files/"
+        cmd.handle()
+        orm_contents = db_session.execute(CONTENTS_QUERY).fetchall()
+        for table in ("car_listing", "car", "submodel", "model", "make"):
+            db_session.execute(f"DELETE FROM {table}")
+
+        cmd = Command()
+        cmd.path = "/app/seez/tests/files/"
+        cmd.mode = ImportMode.COPY
+        cmd.staging = staging
+        cmd.handle()
+        copy_contents = db_session.execute(CONTENTS_QUERY).fetchall()
+
+        assert_that(copy_contents).is_length(2)
+        assert_that(copy_contents).is_equal_to(orm_contents)
+
+    def test_import_in_chunks(self, mocker, car_repository):
+        add_batch = mocker.spy(car_repository, "add_batch")
+        cmd = Command()
+        cmd.path = "/app/seez/tests/files/"
+        cmd.car_repository = car_repository
+        cmd.chunk_size = 1
+        cmd.handle()
+
+        assert_that(add_batch.call_count).is_equal_to(2)
+        assert_that(car_repository.get_all()).is_length(2)
+
+    def test_merge_twice_keeps_rows(
+        self, tmp_path, db_session, make_repository, car_repository
+    ):
+        path = write_feed(tmp_path)
+        merge(path)
+        contents = db_session.execute(CONTENTS_QUERY).fetchall()
+        make_pks = make_repository.get_pks_by_source_id()
+        car_pks = {car.source_id: car.pk for car in car_repository.get_all()}
+
+        merge(path)
+
+        assert_that(db_session.execute(CONTENTS_QUERY).fetchall()).is_equal_to(contents)
+        assert_that(make_repository.get_pks_by_source_id()).is_equal_to(make_pks)
+        assert_that(make_pks).contains_key("nissan", "honda")
+        assert_that(
+            {car.source_id: car.pk for car in car_repository.get_all()}
+        ).is_equal_to(car_pks)
+
+    def test_merge_same_contents_as_orm(self, tmp_path, db_session):
+        cmd = Command()
+        cmd.path = FILES_PATH
+        cmd.handle()
+        orm_contents = db_session.execute(CONTENTS_QUERY).fetchall()
+        for table in ("car_listing", "car", "submodel", "model", "make"):
+            db_session.execute(f"DELETE FROM {table}")
+
+        merge(write_feed(tmp_path))
+
+        assert_that(db_session.execute(CONTENTS_QUERY).fetchall()).is_equal_to(
+            orm_contents
+        )
+
+    def test_merge_updates_only_newer_rows(self, tmp_path, car_repository):
+        merge(write_feed(tmp_path))
+        merge(
+            write_feed(
+                tmp_path,
+                {
+                    NISSAN_CAR: (
+                        f"{NISSAN_CAR},t,2016,60000,30000,nissan,697,35,Hatchback,"
+                        "Automatic,Petrol,White,2018-11-28 00:07:55.609081+01,"
+                        "2019-09-01 10:00:00+02"
+                    ),
+                    HONDA_CAR: (
+                        f"{HONDA_CAR},f,2015,1,1,honda,342,128,Sedan,Manual,,White,"
+                        "2018-06-30 11:16:59+02,2019-08-15 02:02:41.012484+02"
+                    ),
+                },
+            )
+        )
+
+        cars = {car.source_id: car for car in car_repository.get_all()}
+        assert_that(cars[NISSAN_CAR].mileage).is_equal_to(60000)
+        assert_that(cars[NISSAN_CAR].price).is_equal_to(30000)
+        assert_that(cars[HONDA_CAR].mileage).is_equal_to(76000)
+        assert_that(cars[HONDA_CAR].price).is_equal_to(55000)
+
+    def test_merge_deactivates_missing_rows(self, tmp_path, db_session, car_repository):
+        merge(write_feed(tmp_path))
+        merge(write_feed(tmp_path, {NISSAN_CAR: None}))
+
+        cars = {car.source_id: car for car in car_repository.get_all()}
+        assert_that(cars).is_length(2)
+        assert_that(cars[NISSAN_CAR].active).is_false()
+        assert_that(db_session.query(CarListing).all()).is_empty()
+
+        merge(write_feed(tmp_path))
+        db_session.expire_all()
+
+        cars = {car.source_id: car for car in car_repository.get_all()}
+        assert_that(cars[NISSAN_CAR].active).is_true()
+        listings = db_session.query(CarListing).all()
+        assert_that([listing.pk for listing in listings]).is_equal_to(
+            [cars[NISSAN_CAR].pk]
+        )
+
+    def test_import_saves_checkpoints(self, import_checkpoint_repository):
+        cmd = Command()
+        cmd.path = FILES_PATH
+        cmd.chunk_size = 1
+        cmd.handle()
+
+        assert_that(import_checkpoint_repository.get("cars.csv")).is_equal_to(
+            ImportCheckpoint("cars.csv", os.path.getsize(FILES_PATH + "cars.csv"), 2)
+        )
+
+    @pytest.mark.parametrize(
+        "mode, write", [(ImportMode.ORM, "add_batch"), (ImportMode.COPY, "copy_batch")]
+    )
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_resume(
+        self,
+        monkeypatch,
+        mocker,
+        db_session,
+        mode,
+        write,
+        workers,
+        make_repository,
+        car_repository,
+    ):
+        monkeypatch.setattr(import_data, "RANGE_SIZE", 1)
+        cmd = Command()
+        cmd.path = FILES_PATH
+        cmd.handle()
+        contents = db_session.execute(CONTENTS_QUERY).fetchall()
+        for table in ("car_listing", "car", "submodel", "model", "make"):
+            db_session.execute(f"DELETE FROM {table}")
+
+        written = []
+        write_batch = getattr(car_repository, write)
+
+        def fail_second_batch(rows, *args, **kwargs):
+            written.append(rows)
+            if len(written) == 2:
+                raise RuntimeError
+            write_batch(rows, *args, **kwargs)
+
+        mocker.patch.object(car_repository, write, side_effect=fail_second_batch)
+        cmd = Command()
+        cmd.path = FILES_PATH
+        cmd.mode = mode
+        cmd.workers = workers
+        cmd.chunk_size = 1
+        cmd.car_repository = car_repository
+        with pytest.raises(RuntimeError):
+            cmd.handle()
+        assert_that(db_session.execute(CONTENTS_QUERY).fetchall()).is_length(1)
+        # The committed (active) car is listed already
+        listings = db_session.query(CarListing).all()
+        assert_that([listing.make_name for listing in listings]).is_equal_to(["Nissan"])
+
+        cmd.resume = True
+        cmd.handle()
+
+        assert_that(written).is_length(3)
+        assert_that(make_repository.get_all()).is_length(2)
+        assert_that(db_session.execute(CONTENTS_QUERY).fetchall()).is_equal_to(contents)
+
+    @pytest.mark.parametrize(
+        "mode, staging",
+        [(ImportMode.ORM, False), (ImportMode.COPY, False), (ImportMode.COPY, True)],
+    )
+    @pytest.mark.parametrize("renamed", [False, True])
+    def test_import_again_raises_error(self, db_session, mode, staging, renamed):
+        cmd = Command()
+        cmd.path = FILES_PATH
+        cmd.handle()
+        if renamed:
+            # Makes then conflict on their source ids only
+            db_session.execute("UPDATE make SET name = name || ' (old)'")
+
+        cmd = Command()
+        cmd.path = FILES_PATH
+        cmd.mode = mode
+        cmd.staging = staging
+        # Rows are kept by their source ids, so they can't be inserted again
+        with pytest.raises(FeedAlreadyImported) as error:
+            cmd.handle()
+        assert_that(error.value.args).is_equal_to(("makes.csv",))
+
+    @pytest.mark.parametrize("mode", [ImportMode.ORM, ImportMode.COPY])
+    def test_import_in_workers_same_contents(self, monkeypatch, db_session, mode):
+        cmd = Command()
+        cmd.path = FILES_PATH
+        cmd.handle()
+        contents = db_session.execute(CONTENTS_QUERY).fetchall()
+        for table in ("car_listing", "car", "submodel", "model", "make"):
+            db_session.execute(f"DELETE FROM {table}")
+
+        # A range per line
+        monkeypatch.setattr(import_data, "RANGE_SIZE", 1)
+        cmd = Command()
+        cmd.path = FILES_PATH
+        cmd.mode = mode
+        cmd.workers = 2
+        cmd.handle()
+
+        assert_that(db_session.execute(CONTENTS_QUERY).fetchall()).is_equal_to(contents)
+
+    @pytest.mark.parametrize("mode", [ImportMode.ORM, ImportMode.COPY, ImportMode.MERGE])
+    @pytest.mark.parametrize(
+        "write, format",
+        [(write_gzip_feed, "csv"), (write_ndjson_feed, "ndjson")],
+    )
+    def test_import_formats_same_contents(
+        self, tmp_path, db_session, mode, write, format
+    ):
+        cmd = Command()
+        cmd.path = FILES_PATH
+        cmd.handle()
+        contents = db_session.execute(CONTENTS_QUERY).fetchall()
+        for table in ("car_listing", "car", "submodel", "model", "make"):
+            db_session.execute(f"DELETE FROM {table}")
+
+        cmd = Command()
+        cmd.path = write(tmp_path)
+        cmd.format = format
+        cmd.mode = mode
+        cmd.handle()
+
+        assert_that(db_session.execute(CONTENTS_QUERY).fetchall()).is_equal_to(contents)
+
+    def test_import_compressed_in_one_process(self, tmp_path, mocker, car_repository):
+        cmd = Command()
+        cmd.path = write_gzip_feed(tmp_path)
+        cmd.workers = 2
+        cmd.stdout = mocker.Mock()
+        cmd.handle()
+
+        cmd.stdout.write.assert_any_call(
+            "Parsing in one process, workers need a local plain file"
+        )
+        assert_that(car_repository.get_all()).is_length(2)
+
+    def test_import_missing_file(self, tmp_path):
+        cmd = Command()
+        cmd.path = f"{tmp_path}/"
+        with pytest.raises(FeedNotFound):
+            cmd.handle()
+
+    def test_init_args(self):
+        cmd = Command()
+        cmd.init(
+            ["--mode", "copy", "--staging", "--chunk-size", "500", "--workers", "4"]
+            + ["--resume", "--path", "https://feeds/", "--format", "ndjson"]
+        )
+        assert_that(cmd.mode).is_equal_to(ImportMode.COPY)
+        assert_that(cmd.staging).is_true()
+        assert_that(cmd.chunk_size).is_equal_to(500)
+        assert_that(cmd.workers).is_equal_to(4)
+        assert_that(cmd.resume).is_true()
+        assert_that(cmd.path).is_equal_to("https://feeds/")
+        assert_that(cmd.format).is_equal_to("ndjson")
+
+    def test_init_resume_in_merge_mode(self):
+        with pytest.raises(ResumeNotSupported):
+            Command().init(["--mode", "merge", "--resume"])
+
+
+@pytest.mark.parametrize(
+    "items, size, chunks",
+    [
+        ([], 2, []),
+        ([1, 2, 3], 2, [[1, 2], [3]]),
+        ([1, 2, 3, 4], 2, [[1, 2], [3, 4]]),
+    ],
+)
+def test_chunked(items, size, chunks):
+    assert_that(list(chunked(iter(items), size))).is_equal_to(chunks)
@@ -0,0 +1,23 @@
+from datetime import datetime
+from uuid import UUID
+
+import pytest
+from assertpy import assert_that
+
+from seez.aliases import CarPk
+from seez.domain.cursors import CarCursor
+from seez.domain.exceptions import InvalidCursor
+
+
+class TestCarCursor:
+    def test_encode_decode(self):
+        cursor = CarCursor(
+            updated_at=datetime(2020, 6, 1, 20, 0, 0, 123456),
+            pk=CarPk(UUID("b69e3c8c-0ea7-40f9-8141-9f5496523a85")),
+        )
+        assert_that(CarCursor.decode(cursor.encode())).is_equal_to(cursor)
+
+    @pytest.mark.parametrize("value", ["", "invalid", "MjAyMC0wNi0wMQ", "w6k"])
+    def test_decode_invalid(self, value):
+        with pytest.raises(InvalidCursor):
+            CarCursor.decode(value)
@@ -5,18 +5,23 @@ from uuid import UUID
 import pytest
 from assertpy.assertpy import assert_that
 from freezegun import freeze_time
+from pydantic import ValidationError
 
 from seez.aliases import CarPk, MakePk, ModelPk, SubModelPk
 from seez.domain.dto import (
+    AddCarDTO,
     CarDTO,
     CarListDTO,
     MakeDTO,
     MakeListDTO,
     ModelDTO,
     ModelListDTO,
+    SparseCarListDTO,
     SubModelDTO,
     SubModelListDTO,
+    car_fields,
 )
+from seez.domain.exceptions import InvalidFields
 from seez.domain.models import Car
 
 
@@ -135,11 +140,54 @@ class TestCarListDTO:
                     "model": "CLS",
                     "make": "Mercedes",
                 },
-            ]
+            ],
+            "next_cursor": None,
         }
 
         assert_that(dto.json()).is_equal_to(json.dumps(expected))
 
+    def test_from_model_same_as_validated(self, car_listing_factory):
+        cars = [
+            car_listing_factory(),
+            car_listing_factory(
+                mileage=None, price=None, body_type=None, transmission=None
+            ),
+        ]
+
+        dto = CarListDTO.from_model(cars, next_cursor="abc==")
+
+        validated = CarListDTO(
+            values=[CarDTO(**car_dto.dict()) for car_dto in dto.values],
+            next_cursor="abc==",
+        )
+        assert_that(dto).is_equal_to(validated)
+        assert_that(dto.json()).is_equal_to(validated.json())
+        for car_dto, validated_car_dto in zip(dto.values, validated.values):
+            assert_that(car_dto.dict()).is_equal_to(validated_car_dto.dict())
+            assert_that(car_dto.body_type).is_type_of(type(validated_car_dto.body_type))
+
+
+class TestSparseCarListDTO:
+    def test_from_model_same_as_car_list_dto(self, car_listing_factory):
+        cars = [car_listing_factory(), car_listing_factory(mileage=None, price=None)]
+        fields = car_fields(["make", "price", "pk", "mileage"])
+
+        dto = SparseCarListDTO.from_model(cars, fields, next_cursor="abc==")
+
+        full = CarListDTO.from_model(cars, next_cursor="abc==")
+        assert_that(dto.next_cursor).is_equal_to("abc==")
+        assert_that([car_dto.dict() for car_dto in dto.values]).is_equal_to(
+            [car_dto.dict(include=set(fields)) for car_dto in full.values]
+        )
+        assert_that(list(dto.values[0].__fields__)).is_equal_to(
+            ["pk", "mileage", "price", "make"]
+        )
+
+    @pytest.mark.parametrize("fields", [[], ["pk", "colour"]])
+    def test_invalid_fields(self, fields):
+        with pytest.raises(InvalidFields):
+            car_fields(fields)
+
 
 @pytest.mark.postgres_db
 class TestMakeDTO:
@@ -386,3 +434,37 @@ class TestSubModelListDTO:
             ]
         }
         assert_that(dto.json()).is_equal_to(json.dumps(expected))
+
+
+class TestAddCarDTO:
+    def test_normalizes_enums(self):
+        dto = AddCarDTO(
+            year=2020,
+            mileage=2000,
+            price=100000,
+            exterior_color="White",
+            body_type=" sedan",
+            transmission="Automatic",
+            fuel_type=Car.FuelType.PETROL,
+            submodel="CLS200",
+            model="CLS",
+            make="Mercedes",
+        )
+        assert_that(dto.body_type).is_equal_to(Car.BodyType.SEDAN)
+        assert_that(dto.transmission).is_equal_to(Car.Transmission.AUTOMATIC)
+        assert_that(dto.fuel_type).is_equal_to(Car.FuelType.PETROL)
+
+    def test_unknown_enum_value(self):
+        with pytest.raises(ValidationError):
+            AddCarDTO(
+                year=2020,
+                mileage=2000,
+                price=100000,
+                exterior_color="White",
+                body_type="spaceship",
+                transmission="AUTOMATIC",
+                fuel_type="PETROL",
+                submodel="CLS200",
+                model="CLS",
+                make="Mercedes",
+            )
@@ -0,0 +1,35 @@
+import pytest
+from assertpy.assertpy import assert_that
+
+from seez.domain.models import Car
+from seez.domain.normalization import (
+    BODY_TYPES,
+    FUEL_TYPES,
+    TRANSMISSIONS,
+    lookup_table,
+    normalize,
+)
+
+
+@pytest.mark.parametrize(
+    "table, value, expected",
+    [
+        (BODY_TYPES, "Hatchback", Car.BodyType.HATCHBACK),
+        (BODY_TYPES, "SUV", Car.BodyType.SUV),
+        (BODY_TYPES, " sedan\t", Car.BodyType.SEDAN),
+        (BODY_TYPES, "sPoRtS", Car.BodyType.SPORTS),
+        (TRANSMISSIONS, "Automatic", Car.Transmission.AUTOMATIC),
+        (TRANSMISSIONS, " MANUAL ", Car.Transmission.MANUAL),
+        (FUEL_TYPES, "Electricity", Car.FuelType.ELECTRICITY),
+        (FUEL_TYPES, "diesel ", Car.FuelType.DIESEL),
+        (FUEL_TYPES, "", None),
+        (FUEL_TYPES, "steam", None),
+    ],
+)
+def test_normalize(table, value, expected):
+    assert_that(normalize(table, value)).is_equal_to(expected)
+
+
+def test_lookup_table_covers_all_members():
+    for enum in (Car.BodyType, Car.Transmission, Car.FuelType):
+        assert_that(set(lookup_table(enum).values())).is_equal_to(set(enum))
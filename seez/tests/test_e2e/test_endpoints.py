@@ -1,3 +1,8 @@
+import asyncio
+import csv
+import io
+import json
+from contextlib import asynccontextmanager
 from datetime import datetime
 from uuid import UUID
 
@@ -5,10 +10,13 @@ import pytest
 from assertpy.assertpy import assert_that
 from fastapi.testclient import TestClient
 from freezegun import freeze_time
+from haps import Container, Egg
 
 from seez.aliases import CarPk, MakePk, ModelPk, SubModelPk
 from seez.api.app import app
+from seez.domain.commands.export_cars import ExportCars
 from seez.domain.models import Car
+from seez.infrastructure.async_session import AsyncEngine
 
 
 @pytest.fixture
@@ -206,14 +214,15 @@ def test_get_cars(api_client, make_factory, model_factory, submodel_factory, car
     )
     response = api_client.get("/car/")
     assert_that(response.status_code).is_equal_to(200)
+    # Cars updated at the same time are listed by pk descending
     expected = {
         "values": [
             {
-                "pk": "b69e3c8c-0ea7-40f9-8141-9f5496523a85",
-                "year": 2020,
-                "mileage": 2000,
-                "price": 100000,
-                "exterior_color": "White",
+                "pk": "bb04a84d-e3c2-4c63-8dd3-9b1401eae8ae",
+                "year": 2010,
+                "mileage": 30000,
+                "price": 30000,
+                "exterior_color": "Black",
                 "created_at": "2020-06-02T10:00:00",
                 "updated_at": "2020-06-02T10:00:00",
                 "body_type": "SUV",
@@ -224,11 +233,11 @@ def test_get_cars(api_client, make_factory, model_factory, submodel_factory, car
                 "make": "Mercedes",
             },
             {
-                "pk": "bb04a84d-e3c2-4c63-8dd3-9b1401eae8ae",
-                "year": 2010,
-                "mileage": 30000,
-                "price": 30000,
-                "exterior_color": "Black",
+                "pk": "b69e3c8c-0ea7-40f9-8141-9f5496523a85",
+                "year": 2020,
+                "mileage": 2000,
+                "price": 100000,
+                "exterior_color": "White",
                 "created_at": "2020-06-02T10:00:00",
                 "updated_at": "2020-06-02T10:00:00",
                 "body_type": "SUV",
@@ -238,11 +247,284 @@ def test_get_cars(api_client, make_factory, model_factory, submodel_factory, car
                 "model": "CLS",
                 "make": "Mercedes",
             },
-        ]
+        ],
+        "next_cursor": None,
     }
     assert_that(response.json()).is_equal_to(expected)
 
 
+@pytest.mark.postgres_db
+def test_get_cars_compact(
+    api_client, make_factory, model_factory, submodel_factory, car_factory
+):
+    make = make_factory(name="Mercedes")
+    model = model_factory(name="CLS", make=make)
+    car_factory.create_batch(
+        2, active=True, submodel=submodel_factory(name="CLS200", model=model)
+    )
+    car_factory(active=True, submodel=submodel_factory(name="CLS300", model=model))
+
+    cars = api_client.get("/car/").json()
+    response = api_client.get("/car/", params={"compact": True})
+    assert_that(response.status_code).is_equal_to(200)
+
+    compact = response.json()
+    assert_that(compact["names"]["make"]).is_equal_to(["Mercedes"])
+    assert_that(compact["names"]["submodel"]).contains_only("CLS200", "CLS300")
+    expanded = [
+        {
+            **value,
+            **{
+                field: compact["names"][field][value[field]] for field in compact["names"]
+            },
+        }
+        for value in compact["values"]
+    ]
+    assert_that(expanded).is_equal_to(cars["values"])
+
+
+@pytest.mark.postgres_db
+def test_get_submodels_compact(api_client, make_factory, model_factory, submodel_factory):
+    model = model_factory(name="CLS", make=make_factory(name="Mercedes"))
+    submodel_factory.create_batch(3, model=model)
+
+    response = api_client.get("/submodel/")
+    compact_response = api_client.get("/submodel/", params={"compact": True})
+    assert_that(compact_response.status_code).is_equal_to(200)
+    assert_that(compact_response.json()["names"]).is_equal_to(
+        {"make": ["Mercedes"], "model": ["CLS"]}
+    )
+    assert_that(compact_response.json()["values"]).is_length(3)
+    assert_that(compact_response.headers["etag"]).is_not_equal_to(
+        response.headers["etag"]
+    )
+
+
+@pytest.mark.postgres_db
+def test_get_catalog_not_modified_compressed(
+    api_client, submodel_factory, catalog_version_repository
+):
+    submodel_factory.create_batch(20)
+    headers = {"Accept-Encoding": "gzip"}
+    response = api_client.get("/submodel/", headers=headers)
+    assert_that(response.headers).contains_entry({"content-encoding": "gzip"})
+
+    # Strong, and tied to the encoding of the body
+    version = catalog_version_repository.get()
+    assert_that(response.headers).contains_entry(
+        {"etag": f'"submodels-{version}-gzip"'}, {"vary": "Accept-Encoding"}
+    )
+
+    not_modified = api_client.get(
+        "/submodel/", headers={**headers, "If-None-Match": response.headers["etag"]}
+    )
+    assert_that(not_modified.status_code).is_equal_to(304)
+    assert_that(not_modified.headers).contains_entry(
+        {"etag": response.headers["etag"]}, {"vary": response.headers["vary"]}
+    )
+
+
+@pytest.mark.postgres_db
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+def test_get_cars_compressed(api_client, car_factory, encoding):
+    car_factory.create_batch(10, active=True)
+
+    plain = api_client.get("/car/", headers={"Accept-Encoding": "identity"})
+    response = api_client.get("/car/", headers={"Accept-Encoding": encoding})
+    assert_that(plain.headers).does_not_contain_key("content-encoding")
+    assert_that(response.headers).contains_entry({"content-encoding": encoding})
+    assert_that(response.json()).is_equal_to(plain.json())
+
+
+@pytest.mark.postgres_db
+def test_get_cars_fields(api_client, car_factory):
+    car_factory.create_batch(5, active=True)
+    cars = api_client.get("/car/", params={"page_size": 5}).json()["values"]
+
+    listed = []
+    params = {"page_size": 2, "fields": "price,make,mileage"}
+    response = api_client.get("/car/", params=params)
+    while True:
+        assert_that(response.status_code).is_equal_to(200)
+        listed += response.json()["values"]
+        next_cursor = response.json()["next_cursor"]
+        if next_cursor is None:
+            break
+        response = api_client.get("/car/", params={**params, "cursor": next_cursor})
+
+    assert_that(listed).is_equal_to(
+        [
+            {"mileage": car["mileage"], "price": car["price"], "make": car["make"]}
+            for car in cars
+        ]
+    )
+
+
+@pytest.mark.postgres_db
+@pytest.mark.parametrize("fields", ["pk,colour", ","])
+def test_get_cars_invalid_fields(api_client, fields):
+    response = api_client.get("/car/", params={"fields": fields})
+    assert_that(response.status_code).is_equal_to(400)
+
+
+@pytest.mark.postgres_db
+def test_get_cars_cursor(api_client, car_factory):
+    cars = car_factory.create_batch(5, active=True)
+
+    response = api_client.get("/car/", params={"page_size": 2})
+    listed = [value["pk"] for value in response.json()["values"]]
+    next_cursor = response.json()["next_cursor"]
+    while next_cursor is not None:
+        response = api_client.get("/car/", params={"page_size": 2, "cursor": next_cursor})
+        assert_that(response.status_code).is_equal_to(200)
+        listed += [value["pk"] for value in response.json()["values"]]
+        next_cursor = response.json()["next_cursor"]
+
+    assert_that(listed).is_length(5)
+    assert_that(set(listed)).is_equal_to({str(car.pk) for car in cars})
+
+
+@pytest.mark.postgres_db
+@pytest.mark.parametrize("params", [{}, {"fields": "pk,make,model,submodel"}])
+def test_get_cars_single_query_per_page(
+    api_client, car_factory, executed_statements, params
+):
+    # Every car has its own submodel, model and make
+    car_factory.create_batch(41, active=True)
+    executed_statements.clear()
+
+    response = api_client.get("/car/", params={"page_size": 20, **params})
+    next_cursor = response.json()["next_cursor"]
+    response = api_client.get(
+        "/car/", params={"page_size": 20, "page_number": 2, **params}
+    )
+    response = api_client.get(
+        "/car/", params={"page_size": 20, "cursor": next_cursor, **params}
+    )
+
+    # The names are read along with the cars, whatever the page or cursor
+    assert_that(executed_statements).is_length(3)
+    for statement in executed_statements:
+        assert_that(statement).contains("FROM car_listing")
+        assert_that(statement).does_not_contain("JOIN")
+    values = response.json()["values"]
+    assert_that(values).is_length(20)
+    assert_that({value["make"] for value in values}).is_length(20)
+
+
+@pytest.mark.postgres_db
+def test_get_cars_invalid_cursor(api_client):
+    response = api_client.get("/car/", params={"cursor": "not a cursor"})
+    assert_that(response.status_code).is_equal_to(400)
+
+
+@pytest.mark.postgres_db
+def test_export_cars_ndjson(api_client, car_factory):
+    cars = car_factory.create_batch(3, active=True)
+    car_factory(active=False)
+
+    response = api_client.get("/car/export/")
+    assert_that(response.status_code).is_equal_to(200)
+    assert_that(response.headers["content-type"]).is_equal_to("application/x-ndjson")
+    lines = response.text.splitlines()
+    assert_that(lines).is_length(3)
+    assert_that({json.loads(line)["pk"] for line in lines}).is_equal_to(
+        {str(car.pk) for car in cars}
+    )
+    listed = api_client.get("/car/").json()["values"]
+    assert_that([json.loads(line) for line in lines]).is_equal_to(listed)
+
+
+@pytest.mark.postgres_db
+def test_export_cars_disconnect_releases_transaction(car_factory, monkeypatch):
+    car_factory.create_batch(5, active=True)
+    monkeypatch.setattr(ExportCars, "batch_size", 1)
+    engine = Container().get_object(AsyncEngine)
+    open_transactions = []
+
+    class TrackingEngine(AsyncEngine):
+        @asynccontextmanager
+        async def transaction(self, readonly):
+            async with engine.transaction(readonly) as connection:
+                open_transactions.append(connection)
+                try:
+                    yield connection
+                finally:
+                    open_transactions.remove(connection)
+
+        async def close(self):
+            pass
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/car/export/",
+        "query_string": b"",
+        "headers": [],
+    }
+    sent = []
+
+    async def export():
+        first_chunk_sent = asyncio.Event()
+
+        async def receive():
+            if not sent:
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await first_chunk_sent.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+            if message["type"] == "http.response.body":
+                first_chunk_sent.set()
+                # Lets the disconnect come in, as a socket write would
+                await asyncio.sleep(0)
+
+        await app(scope, receive, send)
+        return list(open_transactions)
+
+    Container().config.insert(0, Egg(AsyncEngine, None, None, TrackingEngine))
+    try:
+        open_after_disconnect = asyncio.run(export())
+    finally:
+        Container().config.pop(0)
+
+    assert_that(open_after_disconnect).is_empty()
+    bodies = [message for message in sent if message["type"] == "http.response.body"]
+    # One car was sent, the following one was read before the disconnect was noticed
+    assert_that(bodies).is_length(1)
+    assert_that(bodies[0]["more_body"]).is_true()
+
+
+@pytest.mark.postgres_db
+def test_export_cars_csv(api_client, car_factory):
+    car_factory(
+        active=True,
+        mileage=None,
+        exterior_color="Black, metallic",
+        created_at=datetime(2020, 6, 2, 10, 0, 0, 5000),
+        body_type=Car.BodyType.SUV,
+    )
+
+    response = api_client.get("/car/export/", params={"format": "csv"})
+    assert_that(response.status_code).is_equal_to(200)
+    assert_that(response.headers["content-type"]).starts_with("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert_that(rows).is_length(1)
+    assert_that(rows[0]).contains_entry(
+        {"mileage": ""},
+        {"exterior_color": "Black, metallic"},
+        {"created_at": "2020-06-02T10:00:00.005000"},
+        {"body_type": "SUV"},
+    )
+
+
+@pytest.mark.postgres_db
+def test_export_cars_invalid_format(api_client):
+    response = api_client.get("/car/export/", params={"format": "xml"})
+    assert_that(response.status_code).is_equal_to(422)
+
+
 @pytest.mark.postgres_db
 @freeze_time("2020-06-02 10:00")
 @pytest.mark.parametrize(
@@ -327,6 +609,177 @@ def test_add_car_success(api_client, make_factory, car_repository):
     assert_that(car_repository.get_all()).is_length(1)
 
 
+@pytest.mark.postgres_db
+def test_add_car_known_submodel_single_insert(
+    api_client, make_factory, car_repository, executed_statements
+):
+    make_factory(name="Mercedes")
+    data = {
+        "year": 2020,
+        "mileage": 2000,
+        "price": 10000,
+        "exterior_color": "Red",
+        "body_type": "SEDAN",
+        "transmission": "MANUAL",
+        "fuel_type": "PETROL",
+        "submodel": "GLS200",
+        "model": "GLS",
+        "make": "Mercedes",
+    }
+    api_client.post("/car/", json=data)
+    api_client.post("/car/", json=data)
+
+    executed_statements.clear()
+    response = api_client.post("/car/", json=data)
+    assert_that(response.status_code).is_equal_to(200)
+    # The car insert followed by the listing refresh
+    assert_that(executed_statements).is_length(3)
+    assert_that(executed_statements[0]).starts_with("INSERT INTO car (")
+    assert_that(executed_statements[1]).starts_with("INSERT INTO car_listing")
+    assert_that(executed_statements[2]).starts_with("DELETE FROM car_listing")
+    assert_that(car_repository.get_all()).is_length(3)
+
+
+@pytest.mark.postgres_db
+def test_add_car_new_submodel_invalidates_catalog_cache(api_client, make_factory):
+    make_factory(name="Mercedes")
+    response = api_client.get("/submodel/")
+    assert_that(response.json()["values"]).is_length(0)
+
+    data = {
+        "year": 2020,
+        "mileage": 2000,
+        "price": 10000,
+        "exterior_color": "Red",
+        "body_type": "SEDAN",
+        "transmission": "MANUAL",
+        "fuel_type": "PETROL",
+        "submodel": "GLS200",
+        "model": "GLS",
+        "make": "Mercedes",
+    }
+    api_client.post("/car/", json=data)
+
+    response = api_client.get("/submodel/")
+    assert_that(response.json()["values"]).extracting("name").is_equal_to(["GLS200"])
+    api_client.get("/submodel/")
+
+    response = api_client.get("/catalog/cache/")
+    assert_that(response.status_code).is_equal_to(200)
+    assert_that(response.json()).is_equal_to({"hits": 1, "misses": 2})
+
+
+@pytest.mark.postgres_db
+@pytest.mark.parametrize("path", ["/make/", "/model/", "/submodel/"])
+def test_get_catalog_not_modified(api_client, make_factory, catalog_cache, path):
+    make_factory(name="Mercedes")
+    response = api_client.get(path)
+    assert_that(response.status_code).is_equal_to(200)
+    assert_that(response.headers).contains_entry({"cache-control": "max-age=0"})
+    etag = response.headers["etag"]
+
+    response = api_client.get(path, headers={"If-None-Match": etag})
+    assert_that(response.status_code).is_equal_to(304)
+    assert_that(response.content).is_empty()
+    assert_that(response.headers).contains_entry({"etag": etag})
+    # The catalog wasn't loaded, not even from the cache
+    assert_that(catalog_cache.hits + catalog_cache.misses).is_equal_to(1)
+
+    data = {
+        "year": 2020,
+        "mileage": 2000,
+        "price": 10000,
+        "exterior_color": "Red",
+        "body_type": "SEDAN",
+        "transmission": "MANUAL",
+        "fuel_type": "PETROL",
+        "submodel": "GLS200",
+        "model": "GLS",
+        "make": "Mercedes",
+    }
+    api_client.post("/car/", json=data)
+
+    response = api_client.get(path, headers={"If-None-Match": etag})
+    assert_that(response.status_code).is_equal_to(200)
+    assert_that(response.headers["etag"]).is_not_equal_to(etag)
+
+
+@pytest.mark.postgres_db
+def test_add_cars_batch(
+    api_client,
+    make_factory,
+    model_factory,
+    submodel_factory,
+    car_repository,
+    submodel_repository,
+):
+    mercedes = make_factory(name="Mercedes")
+    make_factory(name="Audi")
+    gls = model_factory(name="GLS", make=mercedes)
+    gls200 = submodel_factory(name="GLS200", model=gls)
+    car = {
+        "year": 2020,
+        "mileage": 2000,
+        "price": 10000,
+        "exterior_color": "Red",
+        "body_type": "SEDAN",
+        "transmission": "MANUAL",
+        "fuel_type": "PETROL",
+    }
+    data = [
+        {**car, "submodel": "gls200", "model": "GLS", "make": "mercedes"},
+        {**car, "submodel": "GLS500", "model": "GLS", "make": "Mercedes"},
+        {**car, "submodel": "A4 TFSI", "model": "A4", "make": "Audi"},
+        {**car, "submodel": "Golf GTI", "model": "Golf", "make": "VW"},
+        {**car, "submodel": "A4 TFSI", "model": "a4", "make": "AUDI"},
+    ]
+    response = api_client.post("/car/batch/", json=data)
+    assert_that(response.status_code).is_equal_to(200)
+
+    results = response.json()["values"]
+    assert_that(results).is_length(5)
+    assert_that(results[3]).is_equal_to({"pk": None, "error": "Make does not exist"})
+    added = [result for i, result in enumerate(results) if i != 3]
+    assert_that(added).extracting("error").contains_only(None)
+
+    cars = {str(car.pk): car for car in car_repository.get_all()}
+    assert_that(cars).contains_only(*[result["pk"] for result in added])
+    assert_that(cars[results[0]["pk"]].submodel_pk).is_equal_to(gls200.pk)
+    assert_that(cars[results[2]["pk"]].submodel_pk).is_equal_to(
+        cars[results[4]["pk"]].submodel_pk
+    )
+    assert_that(submodel_repository.get_all()).is_length(3)
+
+
+@pytest.mark.postgres_db
+def test_add_cars_batch_queries_do_not_grow_with_batch(
+    api_client, make_factory, executed_statements
+):
+    make_factory(name="Mercedes")
+    data = [
+        {
+            "year": 2020,
+            "mileage": 2000,
+            "price": 10000,
+            "exterior_color": "Red",
+            "body_type": "SEDAN",
+            "transmission": "MANUAL",
+            "fuel_type": "PETROL",
+            "submodel": f"GLS{i}",
+            "model": f"GLS{i % 3}",
+            "make": "Mercedes",
+        }
+        for i in range(30)
+    ]
+    executed_statements.clear()
+    response = api_client.post("/car/batch/", json=data)
+    assert_that(response.status_code).is_equal_to(200)
+
+    # The version read, make, model and submodel lookups, three bulk inserts, the
+    # version bump and the listing refresh
+    assert_that(len(executed_statements)).is_less_than_or_equal_to(10)
+
+
 @pytest.mark.postgres_db
 def test_add_car_make_doesnt_exist(
     api_client, make_factory, submodel_factory, car_repository, make_repository
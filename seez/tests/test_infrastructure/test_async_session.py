@@ -0,0 +1,141 @@
+import asyncio
+from time import monotonic
+
+import pytest
+from assertpy import assert_that
+from haps import Container, Egg
+from psycopg2.errors import ReadOnlySqlTransaction
+from sqlalchemy import func, select
+
+from seez.infrastructure.async_session import (
+    AiopgEngine,
+    AsyncConnection,
+    AsyncEngine,
+    async_transactional,
+)
+from seez.ports.adapters.models import IMPORT_CHECKPOINT_TABLE
+from seez.tests.fixtures.database import TEST_DB_URL
+
+CHECKPOINT = IMPORT_CHECKPOINT_TABLE.c
+
+
+def run_with_engine(coroutine_function):
+    async def main():
+        engine = AiopgEngine(TEST_DB_URL)
+        try:
+            return await coroutine_function(engine)
+        finally:
+            await engine.close()
+
+    return asyncio.run(main())
+
+
+@pytest.mark.postgres_db
+def test_concurrent_transactions_wait_for_database_together():
+    async def sleep(engine):
+        async with engine.transaction(readonly=True) as connection:
+            return await connection.fetch_val(select([func.pg_sleep(0.2)]))
+
+    async def sleep_concurrently(engine):
+        start = monotonic()
+        await asyncio.gather(*[sleep(engine) for _ in range(10)])
+        return monotonic() - start
+
+    # One after another they would take at least 2 seconds
+    assert_that(run_with_engine(sleep_concurrently)).is_less_than(1.0)
+
+
+@pytest.mark.postgres_db
+def test_readonly_transaction_rejects_writes():
+    async def write(engine):
+        async with engine.transaction(readonly=True) as connection:
+            await connection.execute(IMPORT_CHECKPOINT_TABLE.delete())
+
+    with pytest.raises(ReadOnlySqlTransaction):
+        run_with_engine(write)
+
+
+@pytest.mark.postgres_db
+def test_transaction_commits_or_rolls_back_on_error():
+    checkpoint = {"file_name": "async.csv", "byte_offset": 1, "row_number": 1}
+    saved = select([func.count()]).where(CHECKPOINT.file_name == "async.csv")
+
+    async def save_and_fail(engine):
+        async with engine.transaction(readonly=False) as connection:
+            await connection.execute(
+                IMPORT_CHECKPOINT_TABLE.insert().values(**checkpoint)
+            )
+            raise ValueError
+
+    async def save(engine):
+        async with engine.transaction(readonly=False) as connection:
+            await connection.execute(
+                IMPORT_CHECKPOINT_TABLE.insert().values(**checkpoint)
+            )
+        async with engine.transaction(readonly=True) as connection:
+            return await connection.fetch_val(saved)
+
+    async def delete(engine):
+        async with engine.transaction(readonly=False) as connection:
+            await connection.execute(
+                IMPORT_CHECKPOINT_TABLE.delete().where(
+                    CHECKPOINT.file_name == "async.csv"
+                )
+            )
+            return await connection.fetch_val(saved)
+
+    with pytest.raises(ValueError):
+        run_with_engine(save_and_fail)
+    try:
+        assert_that(run_with_engine(save)).is_equal_to(1)
+    finally:
+        assert_that(run_with_engine(delete)).is_equal_to(0)
+
+
+@pytest.mark.postgres_db
+@pytest.mark.parametrize(
+    "count, batch_sizes", [(25, [10, 10, 5]), (20, [10, 10]), (0, [])]
+)
+def test_stream_reads_batches_through_cursor(count, batch_sizes):
+    numbers = select([func.generate_series(1, count).label("number")])
+
+    async def read(engine):
+        async with engine.transaction(readonly=True) as connection:
+            return [batch async for batch in connection.stream(numbers, 10)]
+
+    batches = run_with_engine(read)
+    assert_that([len(batch) for batch in batches]).is_equal_to(batch_sizes)
+    assert_that([row["number"] for batch in batches for row in batch]).is_equal_to(
+        list(range(1, count + 1))
+    )
+
+
+@pytest.mark.postgres_db
+def test_closed_stream_releases_connection():
+    numbers = select([func.generate_series(1, 100).label("number")])
+
+    @async_transactional(readonly=True)
+    async def stream():
+        connection = Container().get_object(AsyncConnection)
+        async for batch in connection.stream(numbers, 10):
+            yield batch
+
+    async def read_first_batches(engine):
+        for _ in range(3):
+            batches = stream()
+            await batches.__anext__()
+            await batches.aclose()
+        pool = await engine._get_engine(TEST_DB_URL)
+        return pool.size, pool.freesize
+
+    async def main():
+        engine = AiopgEngine(TEST_DB_URL)
+        Container().config.insert(0, Egg(AsyncEngine, None, None, lambda: engine))
+        try:
+            return await read_first_batches(engine)
+        finally:
+            Container().config.pop(0)
+            await engine.close()
+
+    size, freesize = asyncio.run(main())
+    assert_that(freesize).is_equal_to(size)
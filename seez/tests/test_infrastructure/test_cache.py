@@ -0,0 +1,91 @@
+from unittest.mock import Mock
+
+from assertpy import assert_that
+
+from seez.infrastructure.cache import LRUCache, SubModelPkCache, VersionedCache
+
+
+def test_get_or_load_caches_value_for_version():
+    cache = VersionedCache(ttl=0)
+    load = Mock(return_value="value")
+
+    assert_that(cache.get_or_load("key", lambda: 1, load)).is_equal_to("value")
+    assert_that(cache.get_or_load("key", lambda: 1, load)).is_equal_to("value")
+
+    assert_that(load.call_count).is_equal_to(1)
+    assert_that(cache.hits).is_equal_to(1)
+    assert_that(cache.misses).is_equal_to(1)
+
+
+def test_get_or_load_reloads_value_when_version_changes():
+    cache = VersionedCache(ttl=0)
+    load = Mock(side_effect=["old", "new"])
+
+    cache.get_or_load("key", lambda: 1, load)
+    result = cache.get_or_load("key", lambda: 2, load)
+
+    assert_that(result).is_equal_to("new")
+    assert_that(cache.misses).is_equal_to(2)
+
+
+def test_get_or_load_checks_version_once_per_ttl():
+    cache = VersionedCache(ttl=60)
+    load_version = Mock(side_effect=[1, 2])
+
+    cache.get_or_load("key", load_version, lambda: "old")
+    result = cache.get_or_load("key", load_version, lambda: "new")
+
+    assert_that(result).is_equal_to("old")
+    assert_that(load_version.call_count).is_equal_to(1)
+
+
+def test_expire_checks_version_before_ttl_passes():
+    cache = VersionedCache(ttl=60)
+    load_version = Mock(side_effect=[1, 2])
+
+    cache.get_or_load("key", load_version, lambda: "old")
+    cache.expire()
+    result = cache.get_or_load("key", load_version, lambda: "new")
+
+    assert_that(result).is_equal_to("new")
+    assert_that(load_version.call_count).is_equal_to(2)
+
+
+def test_clear():
+    cache = VersionedCache(ttl=60)
+    cache.get_or_load("key", lambda: 1, lambda: "value")
+
+    cache.clear()
+
+    load = Mock(return_value="value")
+    cache.get_or_load("key", lambda: 1, load)
+    assert_that(load.called).is_true()
+    assert_that(cache.hits).is_equal_to(0)
+    assert_that(cache.misses).is_equal_to(1)
+
+
+def test_lru_cache_get_missing_key():
+    cache = LRUCache(maxsize=2)
+    assert_that(cache.get("key")).is_none()
+
+
+def test_lru_cache_forgets_least_recently_used_key():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+
+    cache.set("c", 3)
+
+    assert_that(cache.get("a")).is_equal_to(1)
+    assert_that(cache.get("b")).is_none()
+    assert_that(cache.get("c")).is_equal_to(3)
+
+
+def test_submodel_pk_cache_misses_other_versions():
+    cache = SubModelPkCache(maxsize=2)
+    cache.set_pk(("mercedes", "cls", "cls200"), 1, "pk")
+
+    assert_that(cache.get_pk(("mercedes", "cls", "cls200"), 1)).is_equal_to("pk")
+    assert_that(cache.get_pk(("mercedes", "cls", "cls200"), 2)).is_none()
+    assert_that(cache.get_pk(("mercedes", "cls", "cls300"), 1)).is_none()
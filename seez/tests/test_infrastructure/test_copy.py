@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta, timezone
+
+from assertpy import assert_that
+from dateutil import tz
+
+from seez.domain.models import Car
+from seez.infrastructure.postgres.copy import CopyReader, format_row
+
+
+def test_format_row():
+    row = format_row(
+        [
+            None,
+            True,
+            Car.BodyType.SEDAN,
+            datetime(2020, 6, 2, 10, 0, tzinfo=timezone(timedelta(hours=2))),
+            datetime(2020, 6, 2, 10, 0, 0, 500),
+            "tab\tnew\nline\\",
+            12,
+        ],
+        tz.UTC,
+    )
+    assert_that(row).is_equal_to(
+        "\\N\tt\tSEDAN\t2020-06-02 08:00:00\t2020-06-02 10:00:00.000500"
+        "\ttab\\tnew\\nline\\\\\t12\n"
+    )
+
+
+def test_copy_reader_reads_lines_in_chunks():
+    reader = CopyReader(iter(["abc\n", "de\n", "fghij\n"]))
+    chunks = []
+    while True:
+        chunk = reader.read(4)
+        if not chunk:
+            break
+        chunks.append(chunk)
+
+    assert_that(chunks).is_equal_to(["abc\n", "de\nf", "ghij", "\n"])
+
+
+def test_copy_reader_read_all():
+    reader = CopyReader(iter(["abc\n", "de\n"]))
+    assert_that(reader.read(2)).is_equal_to("ab")
+    assert_that(reader.read()).is_equal_to("c\nde\n")
@@ -0,0 +1,33 @@
+from typing import List, Optional
+
+from assertpy import assert_that
+
+from seez.infrastructure.dto import DTO
+
+
+class ExampleDTO(DTO):
+    name: str
+    tags: List[str] = []
+    note: Optional[str] = None
+
+
+def test_trusted_same_as_validated():
+    dto = ExampleDTO.trusted(note="note", name="name")
+
+    assert_that(dto).is_equal_to(ExampleDTO(name="name", note="note"))
+    assert_that(list(dto.dict())).is_equal_to(["name", "tags", "note"])
+    assert_that(dto.json()).is_equal_to(ExampleDTO(name="name", note="note").json())
+    assert_that(dto.__fields_set__).is_equal_to({"name", "note"})
+
+
+def test_trusted_copies_defaults():
+    dto = ExampleDTO.trusted(name="name")
+    dto.tags.append("tag")
+
+    assert_that(ExampleDTO.trusted(name="name").tags).is_empty()
+
+
+def test_trusted_does_not_validate():
+    dto = ExampleDTO.trusted(name=1)
+
+    assert_that(dto.name).is_equal_to(1)
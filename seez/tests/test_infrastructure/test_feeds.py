@@ -0,0 +1,150 @@
+import gzip
+import threading
+from functools import partial
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+
+import pytest
+import zstandard
+from assertpy import assert_that
+
+from seez.infrastructure.feeds import (
+    READERS,
+    byte_ranges,
+    is_plain_file,
+    locate_feed,
+    open_feed,
+    read_feed,
+)
+
+CSV = 'id,name\n1,"a, b"\n2,żółw\n3,x'.encode()
+NDJSON = b'{"id": 1, "name": "a, b", "active": true}\n\n{"id": 2, "name": null}\n'
+
+COMPRESS = {
+    "": lambda data: data,
+    ".gz": gzip.compress,
+    ".zst": zstandard.ZstdCompressor().compress,
+}
+
+
+@pytest.fixture
+def http_server(tmp_path):
+    handler = partial(SimpleHTTPRequestHandler, directory=str(tmp_path))
+    server = HTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{server.server_port}/"
+
+    server.shutdown()
+    server.server_close()
+
+
+def read_all(location, format, offset=0):
+    with open_feed(location) as f:
+        return list(read_feed(f, READERS[format], offset))
+
+
+def test_read_csv(tmp_path):
+    path = tmp_path / "cars.csv"
+    path.write_bytes(CSV)
+
+    assert_that(read_all(str(path), "csv")).is_equal_to(
+        [
+            ({"id": "1", "name": "a, b"}, 17),
+            ({"id": "2", "name": "żółw"}, 27),
+            ({"id": "3", "name": "x"}, 30),
+        ]
+    )
+    assert_that(read_all(str(path), "csv", offset=27)).is_equal_to(
+        [({"id": "3", "name": "x"}, 30)]
+    )
+
+
+def test_read_ndjson(tmp_path):
+    path = tmp_path / "cars.ndjson"
+    path.write_bytes(NDJSON)
+
+    assert_that(read_all(str(path), "ndjson")).is_equal_to(
+        [
+            ({"id": "1", "name": "a, b", "active": "t"}, 42),
+            ({"id": "2", "name": ""}, 67),
+        ]
+    )
+    assert_that(read_all(str(path), "ndjson", offset=42)).is_equal_to(
+        [({"id": "2", "name": ""}, 67)]
+    )
+
+
+@pytest.mark.parametrize(
+    "format, fieldnames", [("csv", ["id", "name, full"]), ("ndjson", None)]
+)
+def test_parse_header(format, fieldnames):
+    line = 'id,"name, full"\n' if format == "csv" else '{"id": 1}\n'
+    assert_that(READERS[format].parse_header(line)).is_equal_to(fieldnames)
+
+
+@pytest.mark.parametrize("suffix", COMPRESS)
+def test_read_compressed(tmp_path, suffix):
+    path = tmp_path / f"cars.csv{suffix}"
+    path.write_bytes(COMPRESS[suffix](CSV))
+
+    assert_that(locate_feed(str(tmp_path), "cars.csv")).is_equal_to(str(path))
+    assert_that(read_all(str(path), "csv", offset=17)).is_equal_to(
+        [({"id": "2", "name": "żółw"}, 27), ({"id": "3", "name": "x"}, 30)]
+    )
+    assert_that(is_plain_file(str(path))).is_equal_to(suffix == "")
+
+
+def test_locate_feed(tmp_path):
+    (tmp_path / "cars.csv.gz").write_bytes(gzip.compress(CSV))
+
+    assert_that(locate_feed(f"file://{tmp_path}/", "cars.csv")).is_equal_to(
+        f"{tmp_path}/cars.csv.gz"
+    )
+    assert_that(locate_feed(str(tmp_path), "makes.csv")).is_none()
+
+
+@pytest.mark.parametrize("suffix", [".gz", ".zst"])
+def test_read_over_http(tmp_path, http_server, suffix):
+    (tmp_path / f"cars.csv{suffix}").write_bytes(COMPRESS[suffix](CSV))
+
+    location = locate_feed(http_server, "cars.csv")
+
+    assert_that(location).is_equal_to(f"{http_server}cars.csv{suffix}")
+    assert_that(read_all(location, "csv", offset=17)).is_length(2)
+    assert_that(is_plain_file(location)).is_false()
+    assert_that(locate_feed(http_server, "makes.csv")).is_none()
+
+
+@pytest.mark.parametrize(
+    "size, ranges",
+    [
+        (1, [(8, 16), (16, 26), (26, 29)]),
+        (9, [(8, 26), (26, 29)]),
+        (100, [(8, 29)]),
+    ],
+)
+def test_byte_ranges(tmp_path, size, ranges):
+    path = tmp_path / "cars.csv"
+    path.write_text("id,name\n1,first\n2,żółw\n3,x", encoding="utf-8")
+    assert_that(list(byte_ranges(str(path), size))).is_equal_to(ranges)
+
+
+def test_byte_ranges_from_start(tmp_path):
+    path = tmp_path / "cars.csv"
+    path.write_text("id,name\n1,first\n2,second\n")
+    assert_that(list(byte_ranges(str(path), 1, start=16))).is_equal_to([(16, 25)])
+
+
+def test_byte_ranges_without_header(tmp_path):
+    path = tmp_path / "cars.ndjson"
+    path.write_bytes(NDJSON)
+    assert_that(list(byte_ranges(str(path), 1, header=False))).is_equal_to(
+        [(0, 42), (42, 67)]
+    )
+
+
+def test_byte_ranges_of_header_only(tmp_path):
+    path = tmp_path / "cars.csv"
+    path.write_text("id,name\n")
+    assert_that(list(byte_ranges(str(path), 1))).is_empty()
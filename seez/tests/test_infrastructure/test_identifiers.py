@@ -0,0 +1,39 @@
+from uuid import RFC_4122
+
+from assertpy import assert_that
+
+from seez.infrastructure import identifiers
+from seez.infrastructure.identifiers import uuid7
+
+
+def test_uuid7_version_and_time():
+    before = identifiers.time.time_ns() // 1_000_000
+    pk = uuid7()
+    after = identifiers.time.time_ns() // 1_000_000
+
+    assert_that(pk.version).is_equal_to(7)
+    assert_that(pk.variant).is_equal_to(RFC_4122)
+    assert_that(pk.int >> 80).is_between(before, after + 1)
+
+
+def test_uuid7_increasing():
+    pks = [uuid7() for _ in range(10000)]
+    assert_that(pks).is_equal_to(sorted(pks))
+    assert_that(set(pks)).is_length(len(pks))
+
+
+def test_uuid7_counter_overflow_moves_time_forward(mocker, monkeypatch):
+    monkeypatch.setattr(identifiers, "_last_ms", 0)
+    mocker.patch.object(identifiers.time, "time_ns", return_value=10 ** 15)
+    pks = [uuid7() for _ in range(identifiers._COUNTER_MAX + 2)]
+
+    assert_that(pks).is_equal_to(sorted(pks))
+    assert_that(pks[-1].int >> 80).is_equal_to(10 ** 9 + 1)
+
+
+def test_uuid7_clock_going_back_keeps_order(mocker, monkeypatch):
+    monkeypatch.setattr(identifiers, "_last_ms", 0)
+    time_ns = mocker.patch.object(identifiers.time, "time_ns", return_value=10 ** 15)
+    first = uuid7()
+    time_ns.return_value = 10 ** 15 - 10 ** 9
+    assert_that(uuid7().int).is_greater_than(first.int)
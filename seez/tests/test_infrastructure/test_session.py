@@ -0,0 +1,115 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from assertpy import assert_that
+from haps import Container
+from sqlalchemy.orm import Session as SqlSession
+from sqlalchemy.orm import sessionmaker
+
+from seez import settings
+from seez.infrastructure.scopes import TRANSACTIONAL_SCOPE
+from seez.infrastructure.session import (
+    READ_ONLY,
+    Session,
+    SessionMaker,
+    create_database_engine,
+    reset_engines_after_fork,
+    sql_alchemy_read_only_session_maker,
+    sql_alchemy_session_factory,
+    transactional,
+)
+from seez.tests.fixtures.database import TEST_DB_URL
+
+
+def test_session_maker_is_shared_between_threads():
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        session_makers = list(
+            executor.map(lambda _: Container().get_object(SessionMaker), range(2))
+        )
+
+    assert_that(session_makers[0]).is_same_as(session_makers[1])
+    assert_that(session_makers[0].kw["bind"]).is_same_as(session_makers[1].kw["bind"])
+
+
+def test_create_database_engine_pool_settings(monkeypatch):
+    monkeypatch.setattr(settings, "DATABASE_POOL_SIZE", 3)
+    monkeypatch.setattr(settings, "DATABASE_MAX_OVERFLOW", 7)
+    monkeypatch.setattr(settings, "DATABASE_POOL_RECYCLE", 60)
+
+    engine = create_database_engine(TEST_DB_URL)
+
+    assert_that(engine.pool.size()).is_equal_to(3)
+    assert_that(engine.pool._max_overflow).is_equal_to(7)
+    assert_that(engine.pool._recycle).is_equal_to(60)
+
+
+@pytest.mark.postgres_db
+def test_create_database_engine_statement_timeout(monkeypatch):
+    monkeypatch.setattr(settings, "DATABASE_STATEMENT_TIMEOUT", 1500)
+
+    engine = create_database_engine(TEST_DB_URL)
+
+    assert_that(engine.scalar("SHOW statement_timeout")).is_equal_to("1500ms")
+    engine.dispose()
+
+
+def test_reset_engines_after_fork():
+    engine = create_database_engine(TEST_DB_URL)
+    pool = engine.pool
+
+    reset_engines_after_fork()
+
+    assert_that(engine.pool).is_not_same_as(pool)
+    assert_that(engine.pool.size()).is_equal_to(pool.size())
+
+
+@pytest.mark.postgres_db
+@pytest.mark.parametrize("readonly, committed", [(False, True), (True, False)])
+def test_transactional_commit(mocker, readonly, committed):
+    commit = mocker.patch.object(SqlSession, "commit")
+
+    @transactional(readonly=readonly)
+    def handle():
+        return Container().get_object(Session).autoflush
+
+    autoflush = handle()
+
+    assert_that(commit.called).is_equal_to(committed)
+    assert_that(autoflush).is_equal_to(not readonly)
+
+
+@pytest.mark.postgres_db
+@pytest.mark.parametrize("readonly, expected", [(False, "off"), (True, "on")])
+def test_session_factory_transaction_read_only(readonly, expected):
+    engine = create_database_engine(TEST_DB_URL)
+    session_maker = sessionmaker(bind=engine)
+    read_only_session_maker = sessionmaker(bind=engine, autoflush=False)
+    transactional_scope = Container().scopes[TRANSACTIONAL_SCOPE]
+
+    with transactional_scope.scope:
+        transactional_scope.scope[READ_ONLY] = readonly
+        session = sql_alchemy_session_factory(
+            session_maker=session_maker, read_only_session_maker=read_only_session_maker
+        )
+        result = session.scalar("SHOW transaction_read_only")
+        session.close()
+
+    assert_that(result).is_equal_to(expected)
+    engine.dispose()
+
+
+def test_read_only_session_maker_uses_replica(monkeypatch):
+    session_maker = sessionmaker(bind=create_database_engine(TEST_DB_URL))
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_URL", None)
+    read_only_session_maker = sql_alchemy_read_only_session_maker(
+        session_maker=session_maker
+    )
+    assert_that(read_only_session_maker.kw["bind"]).is_same_as(session_maker.kw["bind"])
+
+    replica_url = TEST_DB_URL.replace("localhost", "replica")
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_URL", replica_url)
+    read_only_session_maker = sql_alchemy_read_only_session_maker(
+        session_maker=session_maker
+    )
+    assert_that(str(read_only_session_maker.kw["bind"].url)).is_equal_to(replica_url)
+    assert_that(read_only_session_maker.kw["autoflush"]).is_false()
@@ -0,0 +1,49 @@
+from datetime import datetime
+
+import pytest
+from assertpy import assert_that
+
+from seez.infrastructure.timestamps import parse_timestamp
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("2018-11-28 00:07:55.609081+01", datetime(2018, 11, 28, 0, 7, 55, 609081)),
+        ("2018-06-30 11:16:59+02", datetime(2018, 6, 30, 11, 16, 59)),
+        ("2018-01-29 12:57:44.944+01", datetime(2018, 1, 29, 12, 57, 44, 944000)),
+        ("2018-01-29 12:57:44-03", datetime(2018, 1, 29, 12, 57, 44)),
+        ("2018-01-29 12:57:44+05:30", datetime(2018, 1, 29, 12, 57, 44)),
+        ("2018-01-29 12:57:44", datetime(2018, 1, 29, 12, 57, 44)),
+        ("2018-01-29T12:57:44.5Z", datetime(2018, 1, 29, 12, 57, 44, 500000)),
+        ("29 Jan 2018 12:57:44 +0100", datetime(2018, 1, 29, 12, 57, 44)),
+    ],
+)
+def test_parse_timestamp(value, expected):
+    assert_that(parse_timestamp(value)).is_equal_to(expected)
+
+
+@pytest.mark.postgres_db
+@pytest.mark.parametrize(
+    "value",
+    [
+        "2018-11-28 00:07:55.609081+01",
+        "2018-01-29 12:57:44-03",
+        "2018-01-29 12:57:44+05:30",
+        "2018-01-29T12:57:44.5Z",
+    ],
+)
+def test_parse_timestamp_stores_like_postgres(db_session, value):
+    # Feed timestamps used to be handed to Postgres as text, which drops the offset
+    stored = db_session.execute(
+        "SELECT CAST(:value AS timestamp)", {"value": value}
+    ).scalar()
+    assert_that(parse_timestamp(value)).is_equal_to(stored)
+
+
+@pytest.mark.parametrize(
+    "value", ["", "2018-13-29 12:57:44+01", "2018-01-29 12:57:44+0x", "yesterday-ish"]
+)
+def test_parse_timestamp_invalid(value):
+    with pytest.raises(ValueError):
+        parse_timestamp(value)
@@ -1,13 +1,19 @@
+import asyncio
+from datetime import datetime, timedelta
+
 import pytest
 from assertpy import assert_that
 
+from seez.domain.cursors import CarCursor
 from seez.domain.exceptions import (
     CarDoesNotExist,
     MakeDoesNotExist,
     ModelDoesNotExist,
     SubModelDoesNotExist,
 )
-from seez.domain.models import Car, Make, Model, SubModel
+from seez.domain.models import Car, CarListing, Make, Model, SubModel
+from seez.infrastructure.async_session import async_transactional
+from seez.infrastructure.repositories import ImportCheckpoint
 
 
 @pytest.mark.postgres_db
@@ -29,59 +35,6 @@ class TestCarRepository:
         result = car_repository.get_all()
         assert_that(result).contains_only(*cars)
 
-    def test_get_active_paged(self, car_factory, car_repository):
-        car_factory.create_batch(2, active=False)
-        car_factory.create_batch(12, active=True)
-        result_1 = car_repository.get_active_paged(page_number=1, page_size=5)
-        assert_that(result_1).is_length(5)
-        result_2 = car_repository.get_active_paged(page_number=2, page_size=5)
-        assert_that(result_2).is_length(5)
-        result_3 = car_repository.get_active_paged(page_number=3, page_size=5)
-        assert_that(result_3).is_length(2)
-        result_3 = car_repository.get_active_paged(page_number=4, page_size=5)
-        assert_that(result_3).is_length(0)
-
-    @pytest.mark.parametrize(
-        "mileage, price, q_mileage_min, q_mileage_max, q_price_min, q_price_max, result",
-        [
-            (1000, 1000, None, None, None, None, True),
-            (1000, 1000, 1000, None, None, None, True),
-            (1000, 1000, 1001, None, None, None, False),
-            (1000, 1000, 1000, 1000, None, None, True),
-            (1000, 1000, None, None, 1000, None, True),
-            (1000, 1000, None, None, 1000, 1000, True),
-            (1000, 1000, None, None, 900, 999, False),
-            (1000, 1000, None, None, None, 999, False),
-            (1000, 1000, None, None, None, 1001, True),
-            (1000, 1000, 1000, 1000, 1000, 1000, True),
-        ],
-    )
-    def test_get_active_paged_filter(
-        self,
-        car_factory,
-        car_repository,
-        mileage,
-        price,
-        q_mileage_min,
-        q_mileage_max,
-        q_price_min,
-        q_price_max,
-        result,
-    ):
-        car = car_factory(active=True, price=price, mileage=mileage)
-        r = car_repository.get_active_paged(
-            page_number=1,
-            page_size=5,
-            price_min=q_price_min,
-            price_max=q_price_max,
-            mileage_min=q_mileage_min,
-            mileage_max=q_mileage_max,
-        )
-        if result:
-            assert_that(r).contains_only(car)
-        else:
-            assert_that(r).is_empty()
-
     def test_add(self, car_factory, car_repository, submodel_factory):
         submodel = submodel_factory()
         car_1, car_2 = car_factory.build_batch(2, submodel_pk=submodel.pk)
@@ -101,6 +54,244 @@ class TestCarRepository:
         assert_that(car_repository.get_all()).contains_only(*cars)
 
 
+@pytest.mark.postgres_db
+class TestCarListingRepository:
+    def test_refresh_lists_active_cars_with_names(
+        self, car_factory, car_listing_repository, db_session
+    ):
+        car = car_factory(active=True)
+        car_factory(active=False)
+        db_session.execute("TRUNCATE car_listing")
+
+        car_listing_repository.refresh()
+
+        result = db_session.query(CarListing).all()
+        assert_that(result).is_equal_to(
+            [
+                CarListing(
+                    pk=car.pk,
+                    year=car.year,
+                    mileage=car.mileage,
+                    price=car.price,
+                    exterior_color=car.exterior_color,
+                    created_at=car.created_at,
+                    updated_at=car.updated_at,
+                    body_type=car.body_type,
+                    transmission=car.transmission,
+                    fuel_type=car.fuel_type,
+                    submodel_name=car.submodel_name,
+                    model_name=car.model_name,
+                    make_name=car.make_name,
+                )
+            ]
+        )
+
+    def test_refresh_pks(self, car_factory, car_listing_repository, db_session):
+        deactivated, repriced, untouched = car_factory.create_batch(3, price=1000)
+        deactivated.active = False
+        repriced.price = 2000
+        untouched.price = 3000
+        db_session.flush()
+
+        car_listing_repository.refresh([deactivated.pk, repriced.pk])
+
+        result = db_session.query(CarListing).all()
+        prices = {listing.pk: listing.price for listing in result}
+        assert_that(prices).is_equal_to({repriced.pk: 2000, untouched.pk: 1000})
+
+    def test_refresh_picks_up_renamed_make(
+        self, car_factory, car_listing_repository, db_session
+    ):
+        car = car_factory()
+        car._submodel.model.make.name = "Renamed"
+        db_session.flush()
+
+        car_listing_repository.refresh()
+
+        result = db_session.query(CarListing).all()
+        assert_that([listing.make_name for listing in result]).is_equal_to(["Renamed"])
+
+    def test_refresh_empty_pks(self, car_listing_repository, executed_statements):
+        car_listing_repository.refresh([])
+        assert_that(executed_statements).is_empty()
+
+
+@pytest.mark.postgres_db
+class TestAsyncCarListingRepository:
+    def test_get_active_after(self, car_factory, async_car_listing_repository):
+        updated_at = datetime.utcnow()
+        car_factory.create_batch(2, active=False, updated_at=updated_at)
+        # Cars updated at the same time are split over pages by pk
+        cars = car_factory.create_batch(5, active=True, updated_at=updated_at)
+        cars += car_factory.create_batch(
+            2, active=True, updated_at=updated_at - timedelta(days=1)
+        )
+
+        @async_transactional(readonly=True)
+        async def read_pages():
+            listed = []
+            page = await async_car_listing_repository.get_active_after(
+                cursor=None, page_size=3
+            )
+            while page:
+                listed += page
+                page = await async_car_listing_repository.get_active_after(
+                    cursor=CarCursor.from_car(page[-1]), page_size=3
+                )
+            return listed
+
+        listed = asyncio.run(read_pages())
+        assert_that([listing.pk for listing in listed]).is_equal_to(
+            [car.pk for car in sorted(cars, key=lambda car: (car.updated_at, car.pk))][
+                ::-1
+            ]
+        )
+
+    @pytest.mark.parametrize(
+        "filters", [{}, {"price_min": 2000}, {"price_max": 2000, "mileage_min": 2000}]
+    )
+    def test_get_active_after_matches_get_active_paged(
+        self, car_factory, async_car_listing_repository, filters
+    ):
+        for price in (1000, 2000, 3000):
+            for mileage in (1000, 2000, 3000):
+                car_factory(price=price, mileage=mileage)
+
+        @async_transactional(readonly=True)
+        async def read_pages():
+            first_page = await async_car_listing_repository.get_active_paged(
+                page_size=2, **filters
+            )
+            return (
+                await async_car_listing_repository.get_active_paged(
+                    page_number=2, page_size=2, **filters
+                ),
+                await async_car_listing_repository.get_active_after(
+                    cursor=CarCursor.from_car(first_page[-1]), page_size=2, **filters
+                ),
+            )
+
+        paged, after = asyncio.run(read_pages())
+        assert_that(paged).is_length(2)
+        assert_that(after).is_equal_to(paged)
+
+    def test_get_active_paged_filter(self, car_factory, async_car_listing_repository):
+        car = car_factory(price=1000, mileage=1000)
+        car_factory(price=2000, mileage=1000)
+        car_factory(price=1000, mileage=2000)
+
+        @async_transactional(readonly=True)
+        async def read_page():
+            return await async_car_listing_repository.get_active_paged(
+                price_max=1500, mileage_max=1500
+            )
+
+        result = asyncio.run(read_page())
+        assert_that([listing.pk for listing in result]).is_equal_to([car.pk])
+
+    def test_get_active_reads_single_table_without_sort(
+        self, car_factory, async_car_listing_repository, query_plans
+    ):
+        cars = car_factory.create_batch(3)
+        del query_plans[:]
+
+        @async_transactional(readonly=True)
+        async def read_pages():
+            await async_car_listing_repository.get_active_paged(
+                page_number=2, page_size=2
+            )
+            await async_car_listing_repository.get_active_after(
+                CarCursor.from_car(cars[0])
+            )
+
+        asyncio.run(read_pages())
+
+        assert_that(query_plans).is_length(2)
+        for plan in query_plans:
+            assert_that(plan).contains("Index Scan using ix_car_listing_updated_at_pk")
+            assert_that(plan).does_not_contain("Sort")
+            assert_that(plan).does_not_contain("Join")
+            assert_that(plan).does_not_contain("Nested Loop")
+
+    @pytest.mark.parametrize(
+        "filters, index",
+        [
+            ({"price_min": 10, "price_max": 20}, "ix_car_listing_price"),
+            ({"mileage_min": 10, "mileage_max": 20}, "ix_car_listing_mileage"),
+        ],
+    )
+    def test_get_active_paged_narrow_range_uses_index(
+        self, car_factory, async_car_listing_repository, query_plans, filters, index
+    ):
+        car_factory.create_batch(3, price=1000, mileage=1000)
+
+        @async_transactional(readonly=True)
+        async def read_page():
+            await async_car_listing_repository.get_active_paged(**filters)
+
+        asyncio.run(read_page())
+
+        assert_that(query_plans[-1]).contains(index)
+
+    def test_get_active_paged_columns(self, car_factory, async_car_listing_repository):
+        car_factory.create_batch(3, price=1000)
+        car_factory(price=2000)
+        columns = ["pk", "price", "make_name"]
+
+        @async_transactional(readonly=True)
+        async def read_pages():
+            return (
+                await async_car_listing_repository.get_active_paged(
+                    page_size=2, price_max=1500
+                ),
+                await async_car_listing_repository.get_active_paged(
+                    page_size=2, price_max=1500, columns=columns
+                ),
+                await async_car_listing_repository.get_active_after(
+                    cursor=None, page_size=2, price_max=1500, columns=columns
+                ),
+            )
+
+        full_page, *pages = asyncio.run(read_pages())
+        expected = [
+            {column: getattr(car, column) for column in columns} for car in full_page
+        ]
+        for page in pages:
+            assert_that(
+                [
+                    {
+                        name: value
+                        for name, value in car.__dict__.items()
+                        if name[0] != "_"
+                    }
+                    for car in page
+                ]
+            ).is_equal_to(expected)
+
+    @pytest.mark.parametrize("batch_size", [2, 5, 10])
+    def test_stream_active(self, car_factory, async_car_listing_repository, batch_size):
+        car_factory.create_batch(5)
+        car_factory(active=False)
+
+        @async_transactional(readonly=True)
+        async def read_batches():
+            return (
+                [
+                    batch
+                    async for batch in async_car_listing_repository.stream_active(
+                        batch_size
+                    )
+                ],
+                await async_car_listing_repository.get_active_paged(page_size=10),
+            )
+
+        batches, listed = asyncio.run(read_batches())
+        assert_that([len(batch) for batch in batches]).is_equal_to(
+            [min(batch_size, 5 - offset) for offset in range(0, 5, batch_size)]
+        )
+        assert_that([car for batch in batches for car in batch]).is_equal_to(listed)
+
+
 @pytest.mark.postgres_db
 class TestModelsRepository:
     def test_get_by_pk_does_not_exist(self, model_repository):
@@ -135,6 +326,32 @@ class TestModelsRepository:
         result = model_repository.get_by_name_and_make(name=model.name, make=make.name)
         assert_that(result).is_equal_to(model)
 
+    def test_get_by_name_and_make_uses_lower_name_indexes(
+        self, model_factory, make_factory, model_repository, query_plans
+    ):
+        make = make_factory(name="Mercedes")
+        model_factory(name="CLS", make=make)
+
+        model_repository.get_by_name_and_make(name="cls", make="mercedes")
+
+        # Makes are found by either index, see the make repository tests
+        assert_that(query_plans[-1]).contains("ix_model_make_pk_lower_name")
+
+    def test_get_by_names_and_make_pks(
+        self, model_factory, make_factory, model_repository
+    ):
+        mercedes = make_factory(name="Mercedes")
+        audi = make_factory(name="Audi")
+        cls = model_factory(name="CLS", make=mercedes)
+        a4 = model_factory(name="A4", make=audi)
+        model_factory(name="CLA", make=mercedes)
+        model_factory(name="A4", make=mercedes)
+
+        result = model_repository.get_by_names_and_make_pks(
+            [("cls", mercedes.pk), ("A4", audi.pk), ("A6", audi.pk)]
+        )
+        assert_that(result).contains_only(cls, a4)
+
     def test_get_by_name_and_make_none(
         self, model_factory, make_factory, model_repository
     ):
@@ -201,6 +418,39 @@ class TestSubModelsRepository:
         )
         assert_that(result).is_equal_to(submodel)
 
+    def test_get_by_name_model_and_make_uses_lower_name_indexes(
+        self,
+        make_factory,
+        model_factory,
+        submodel_factory,
+        submodel_repository,
+        query_plans,
+    ):
+        make = make_factory(name="Mercedes")
+        model = model_factory(name="CLS", make=make)
+        submodel_factory(name="CLS200", model=model)
+
+        submodel_repository.get_by_name_model_and_make("cls200", "mercedes", "cls")
+
+        # Makes are found by either index, see the make repository tests
+        assert_that(query_plans[-1]).contains(
+            "ix_model_make_pk_lower_name", "ix_submodel_model_pk_lower_name"
+        )
+
+    def test_get_by_names_and_model_pks(
+        self, make_factory, model_factory, submodel_factory, submodel_repository
+    ):
+        make = make_factory(name="Mercedes")
+        cls = model_factory(name="CLS", make=make)
+        cla = model_factory(name="CLA", make=make)
+        cls200 = submodel_factory(name="CLS200", model=cls)
+        submodel_factory(name="CLS200", model=cla)
+
+        result = submodel_repository.get_by_names_and_model_pks(
+            [("cls200", cls.pk), ("CLA500", cla.pk)]
+        )
+        assert_that(result).contains_only(cls200)
+
     def test_get_by_name_model_and_make_error(
         self, make_factory, model_factory, submodel_factory, submodel_repository
     ):
@@ -295,3 +545,60 @@ class TestMakeRepository:
 
         make_repository.add_batch(makes)
         assert_that(make_repository.get_all()).contains_only(*makes)
+
+    def test_get_by_names(self, make_repository, make_factory):
+        mercedes = make_factory(name="Mercedes")
+        audi = make_factory(name="Audi")
+        make_factory(name="Nissan")
+
+        result = make_repository.get_by_names(["mercedes", "AUDI", "Honda"])
+        assert_that(result).contains_only(mercedes, audi)
+
+    def test_get_by_names_empty(self, make_repository, executed_statements):
+        assert_that(make_repository.get_by_names([])).is_empty()
+        assert_that(executed_statements).is_empty()
+
+    def test_get_by_name_uses_lower_name_index(
+        self, make_repository, make_factory, query_plans
+    ):
+        make_factory(name="Mercedes")
+
+        make_repository.get_by_name(name="mercedes")
+
+        assert_that(query_plans[-1]).contains("ix_make_lower_name")
+
+
+@pytest.mark.postgres_db
+class TestCatalogVersionRepository:
+    def test_get_without_row(self, catalog_version_repository):
+        assert_that(catalog_version_repository.get()).is_equal_to(0)
+
+    def test_bump(self, catalog_version_repository):
+        catalog_version_repository.bump()
+        assert_that(catalog_version_repository.get()).is_equal_to(1)
+
+        catalog_version_repository.bump()
+        assert_that(catalog_version_repository.get()).is_equal_to(2)
+
+
+@pytest.mark.postgres_db
+class TestImportCheckpointRepository:
+    def test_get_without_row(self, import_checkpoint_repository):
+        assert_that(import_checkpoint_repository.get("cars.csv")).is_none()
+
+    def test_save(self, import_checkpoint_repository):
+        import_checkpoint_repository.save(ImportCheckpoint("cars.csv", 100, 2))
+        import_checkpoint_repository.save(ImportCheckpoint("makes.csv", 50, 1))
+        import_checkpoint_repository.save(ImportCheckpoint("cars.csv", 200, 4))
+
+        assert_that(import_checkpoint_repository.get("cars.csv")).is_equal_to(
+            ImportCheckpoint("cars.csv", 200, 4)
+        )
+        assert_that(import_checkpoint_repository.get("makes.csv")).is_equal_to(
+            ImportCheckpoint("makes.csv", 50, 1)
+        )
+
+    def test_clear(self, import_checkpoint_repository):
+        import_checkpoint_repository.save(ImportCheckpoint("cars.csv", 100, 2))
+        import_checkpoint_repository.clear()
+        assert_that(import_checkpoint_repository.get("cars.csv")).is_none()
@@ -50,3 +50,9 @@ def precommit(c, check=False):
 
     pprint("FORMAT CODE:")
     format_code(c, check)
+
+
+@task
+def benchmark(c, name):
+    """Runs one of the benchmarks from seez/benchmarks, e.g. `inv benchmark timestamps`"""
+    c.run(f"python -m seez.benchmarks.{name}")